@@ -0,0 +1,201 @@
+"""
+Decode throughput of account creation events, with the previous transformer
+and pydantic field validator and with the compiled event decoder.
+
+    python -m benchmarks.event_decoding --events 50000 --members 5
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from collections import namedtuple
+from typing import Any, List, get_args, get_origin
+
+from pydantic import BaseModel, ValidationInfo, field_validator
+
+from spherre.indexer.service.decoders import EventDecoder
+
+try:
+    from apibara.starknet.proto.starknet_pb2 import Event
+    from apibara.starknet.proto.types_pb2 import FieldElement
+except ImportError:
+    # the same fields as the apibara protobufs
+    FieldElement = namedtuple("FieldElement", "lo_lo lo_hi hi_lo hi_hi")
+    Event = namedtuple("Event", "data")
+
+MASK = (1 << 64) - 1
+
+
+def felt(value: int) -> FieldElement:
+    return FieldElement(
+        lo_lo=value >> 192 & MASK,
+        lo_hi=value >> 128 & MASK,
+        hi_lo=value >> 64 & MASK,
+        hi_hi=value & MASK,
+    )
+
+
+def to_int(felt: FieldElement) -> int:
+    # apibara.starknet.felt.to_int
+    return (felt.lo_lo << 192) + (felt.lo_hi << 128) + (felt.hi_lo << 64) + felt.hi_hi
+
+
+def to_hex(felt: FieldElement) -> str:
+    # apibara.starknet.felt.to_hex
+    return "0x" + hex(to_int(felt)).replace("0x", "").rjust(64, "0")
+
+
+class LegacyEventModel(BaseModel):
+    # the field validator BaseEventModel used to run on every field
+    @field_validator("*", mode="before")
+    @classmethod
+    def restructure_data_before_parsing(cls, v: Any, info: ValidationInfo):
+        field_info = cls.model_fields[info.field_name]
+        field_type = field_info.annotation
+
+        print(f"\n{info.field_name}:")
+        print(f"  Annotation: {field_type}")
+
+        new_value = v
+        if isinstance(field_type, str):
+            return to_hex(v)
+        elif isinstance(field_type, int):
+            new_value = to_int(v)
+        elif get_origin(field_type):
+            args = get_args(field_type)
+            if isinstance(args, str):
+                new_value = [to_hex(val) for val in v]
+            elif isinstance(args, int):
+                new_value = [to_int(val) for val in v]
+        return new_value
+
+
+class LegacyAccountCreationEvent(LegacyEventModel):
+    account_address: str
+    owner: str
+    name: str
+    description: str
+    members: List[str]
+    threshold: int
+    deployer: int
+    date_deployed: int
+
+
+class AccountCreationEvent(BaseModel):
+    # spherre.indexer.service.types.AccountCreationEvent, whose module
+    # needs apibara
+    account_address: str
+    owner: str
+    name: str
+    description: str
+    members: List[str]
+    threshold: int
+    deployer: int
+    date_deployed: int
+
+
+def legacy_transform(event: Event) -> LegacyAccountCreationEvent:
+    # the previous DataTransformer.transform_account_creation_event
+    account_address = to_hex(event.data[0])
+    owner = to_hex(event.data[1])
+    name = to_hex(event.data[2])
+    description = to_hex(event.data[3])
+    members_array_length = to_int(event.data[4])
+    members = []
+    for i in range(5, members_array_length + 1 + 4):
+        members.append(to_hex(event.data[i]))
+    threshold = to_int(event.data[i + 1])
+    deployer = to_int(event.data[i + 2])
+    date_deployed = to_int(event.data[i + 3])
+    print("Account Deployed")
+    print("Account Address:", account_address)
+    print("Owner:", owner)
+    print("Name:", name)
+    print("Description:", description)
+    print("Members:", members)
+    print("Threshold:", threshold)
+    print("Deployer:", deployer)
+    print("Date Deployed:", date_deployed)
+    return LegacyAccountCreationEvent(
+        account_address=account_address,
+        owner=owner,
+        name=name,
+        description=description,
+        members=members,
+        threshold=threshold,
+        deployer=deployer,
+        date_deployed=date_deployed,
+    )
+
+
+def synthetic_events(count: int, members: int) -> list:
+    base = 0x49D36570D4E46F48E99674BD3FCC84644DDD6B96F7C741B1562B82F9E004DC7
+    return [
+        Event(
+            data=[
+                felt(value)
+                for value in (
+                    base + i,
+                    base - i,
+                    0x5370686572726520416363,
+                    0x4465736372697074696F6E,
+                    members,
+                    *(base + i * members + m for m in range(members)),
+                    min(2, members),
+                    base,
+                    1_700_000_000 + i,
+                )
+            ]
+        )
+        for i in range(count)
+    ]
+
+
+def throughput(decode, events: list) -> float:
+    """
+    Events decoded per second. The output of the prints of the previous
+    transformer is discarded, only writing it is counted
+    """
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        started = time.perf_counter()
+        for i, event in enumerate(events):
+            decode(event)
+            if i % 1000 == 0:
+                output.seek(0)
+                output.truncate()
+        return len(events) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--members", type=int, default=5)
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events, args.members)
+    decoder = EventDecoder(AccountCreationEvent)
+
+    # both paths decode the same values
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy = legacy_transform(events[0])
+    assert legacy.model_dump() == decoder(events[0]).model_dump()
+
+    print(
+        f"{args.events} account creation events of {args.members} members, "
+        f"{len(events[0].data)} felts each, {Event.__module__}.Event"
+    )
+    results = {
+        "previous transformer": throughput(legacy_transform, events),
+        "compiled decoder": throughput(decoder, events),
+    }
+    baseline = results["previous transformer"]
+    for name, rate in results.items():
+        print(
+            f"  {name:22} {rate:10.0f} events/s {1e6 / rate:8.2f} us/event "
+            f"{rate / baseline:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
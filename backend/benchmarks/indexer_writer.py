@@ -0,0 +1,210 @@
+"""
+Stream consumer lag of the indexer while blocks are persisted inline, by the
+thread writer and by the asyncio writer, on a database with a slow commit.
+
+    python -m benchmarks.indexer_writer --blocks 200 --accounts 5 --latency 0.01
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from spherre.app import create_app
+from spherre.app.config import TestingConfig
+from spherre.app.extensions import db
+from spherre.app.models import Account, transactional
+from spherre.app.models.indexer import IndexerCursor
+from spherre.app.service.account import AccountService
+from spherre.app.service.indexer import IndexerService
+from spherre.indexer.service.persistence import (
+    AsyncBlockWriter,
+    ThreadBlockWriter,
+    create_accounts,
+    save_cursor,
+)
+
+INDEXER_ID = "benchmark"
+
+
+def synthetic_blocks(blocks: int, accounts: int) -> list:
+    """
+    Blocks of `accounts` account creations of 3 members each
+    """
+    return [
+        (
+            block,
+            {
+                "accounts": [
+                    {
+                        "address": f"0x{block:06x}{i:04x}",
+                        "name": f"Account {i}",
+                        "threshold": 2,
+                        "members": [f"0x{block % 50 + m:04x}" for m in range(3)],
+                    }
+                    for i in range(accounts)
+                ]
+            },
+        )
+        for block in range(1, blocks + 1)
+    ]
+
+
+async def consume(blocks: list, handle, transform: float) -> dict:
+    """
+    Feed the blocks like the stream does, measuring how long each block
+    holds the consumer and how late a 1ms ticker on the loop fires
+    """
+    ticks = []
+    running = True
+
+    async def ticker():
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            ticks.append(time.perf_counter() - started - 0.001)
+
+    ticker_task = asyncio.create_task(ticker())
+    lags = []
+    started = time.perf_counter()
+    for block_number, events in blocks:
+        # the stream yields to the loop while receiving the next block
+        await asyncio.sleep(0)
+        # the transformation of the block events, CPU bound on the loop
+        deadline = time.perf_counter() + transform
+        while time.perf_counter() < deadline:
+            pass
+        handled = time.perf_counter()
+        await handle(block_number, events)
+        lags.append(time.perf_counter() - handled)
+    consumed = time.perf_counter() - started
+    running = False
+    await ticker_task
+    return {
+        "consumed": consumed,
+        "lag_p50": statistics.median(lags),
+        "lag_max": max(lags),
+        "loop_late_max": max(ticks) if ticks else 0.0,
+    }
+
+
+def run_inline(app, blocks, latency, transform) -> dict:
+    def persist(block_number, events):
+        time.sleep(latency)
+        with transactional():
+            AccountService.create_accounts(events["accounts"])
+            IndexerService.save_cursor(INDEXER_ID, block_number)
+
+    async def handle(block_number, events):
+        # the write blocks the event loop
+        persist(block_number, events)
+
+    async def main():
+        result = await consume(blocks, handle, transform)
+        result["total"] = result["consumed"]
+        return result
+
+    with app.app_context():
+        return asyncio.run(main())
+
+
+def run_thread(app, blocks, latency, transform, max_in_flight) -> dict:
+    def persist(block_number, events):
+        time.sleep(latency)
+        with transactional():
+            AccountService.create_accounts(events["accounts"])
+            IndexerService.save_cursor(INDEXER_ID, block_number)
+
+    writer = ThreadBlockWriter(app, persist, max_in_flight=max_in_flight)
+    return asyncio.run(run_writer(writer, blocks, transform))
+
+
+def run_async(url, blocks, latency, transform, max_in_flight) -> dict:
+    async def persist(connection, block_number, events):
+        await asyncio.sleep(latency)
+        members = await create_accounts(connection, events["accounts"])
+        await save_cursor(connection, INDEXER_ID, block_number)
+        return members
+
+    writer = AsyncBlockWriter(url, persist, max_in_flight=max_in_flight)
+    return asyncio.run(run_writer(writer, blocks, transform))
+
+
+async def run_writer(writer, blocks, transform) -> dict:
+    started = time.perf_counter()
+    result = await consume(blocks, writer.submit, transform)
+    await writer.close()
+    result["total"] = time.perf_counter() - started
+    return result
+
+
+def reset(app):
+    with app.app_context():
+        for model in (Account, IndexerCursor):
+            model.query.delete()
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--blocks", type=int, default=200)
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument(
+        "--latency", type=float, default=0.01, help="commit latency in seconds"
+    )
+    parser.add_argument(
+        "--transform", type=float, default=0.005, help="CPU time per block in seconds"
+    )
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        # the writer thread and the asyncio engine must share the database
+        url = f"sqlite:///{tmpdir.name}/indexer_writer.sqlite3"
+        TestingConfig.SQLALCHEMY_DATABASE_URI = url
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+
+    blocks = synthetic_blocks(args.blocks, args.accounts)
+    runs = {
+        "inline": lambda: run_inline(app, blocks, args.latency, args.transform),
+        "thread writer": lambda: run_thread(
+            app, blocks, args.latency, args.transform, args.max_in_flight
+        ),
+        "async writer": lambda: run_async(
+            url, blocks, args.latency, args.transform, args.max_in_flight
+        ),
+    }
+    print(
+        f"{args.blocks} blocks of {args.accounts} accounts, "
+        f"{args.latency * 1000:.0f}ms commit latency, "
+        f"{args.transform * 1000:.0f}ms transform, "
+        f"{args.max_in_flight} blocks in flight"
+    )
+    print(
+        f"{'':14} {'total':>8} {'consumed':>9} {'lag p50':>9} {'lag max':>9} "
+        f"{'loop late':>10}"
+    )
+    try:
+        for name, run in runs.items():
+            reset(app)
+            result = run()
+            with app.app_context():
+                assert Account.query.count() == args.blocks * args.accounts
+                assert IndexerService.get_cursor(INDEXER_ID) == args.blocks
+            print(
+                f"{name:14} {result['total']:7.2f}s {result['consumed']:8.2f}s "
+                f"{result['lag_p50'] * 1000:7.2f}ms {result['lag_max'] * 1000:7.2f}ms "
+                f"{result['loop_late_max'] * 1000:8.2f}ms"
+            )
+    finally:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Issue and consume rates, memory and bound behavior of the sign in
+nonce stores.
+
+    python -m benchmarks.nonce_store --nonces 200000 --max-entries 100000
+    python -m benchmarks.nonce_store --redis-url redis://localhost:6379/0
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import tracemalloc
+
+from spherre.app.utils.nonce_store import (
+    MemoryNonceStore,
+    NonceStoreFull,
+    RedisNonceStore,
+)
+
+
+def rate(operation, items) -> float:
+    """
+    Operations per second
+    """
+    started = time.perf_counter()
+    for item in items:
+        operation(item)
+    return len(items) / (time.perf_counter() - started)
+
+
+def threaded_rate(store, nonces: int, threads: int, ttl: int) -> float:
+    """
+    Issue and consume rate of `threads` threads sharing the store
+    """
+
+    def worker():
+        for _ in range(nonces // threads):
+            store.consume(store.issue(ttl))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return nonces // threads * threads / (time.perf_counter() - started)
+
+
+def memory_per_nonce(max_entries: int) -> float:
+    """
+    Bytes held by the memory store per nonce when it is full
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = MemoryNonceStore(max_entries=max_entries)
+    for _ in range(max_entries):
+        store.issue(ttl=3600)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / max_entries
+
+
+def steady_state(max_entries: int, issue_rate: int, ttl: int, seconds: int) -> dict:
+    """
+    Issue nonces at `issue_rate` per second of a simulated clock, half of
+    them consumed right away and the others left to expire.
+    """
+    now = [0.0]
+    store = MemoryNonceStore(max_entries=max_entries, clock=lambda: now[0])
+    latencies = []
+    peak = 0
+    for i in range(issue_rate * seconds):
+        now[0] = i / issue_rate
+        started = time.perf_counter()
+        try:
+            nonce = store.issue(ttl)
+        except NonceStoreFull:
+            nonce = None
+        latencies.append((time.perf_counter() - started) * 1e6)
+        if i % 2 and nonce is not None:
+            store.consume(nonce)
+        peak = max(peak, len(store))
+    return {
+        **store.stats(),
+        "peak": peak,
+        "p50": statistics.median(latencies),
+        "p99": statistics.quantiles(latencies, n=100)[98],
+        "max": max(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nonces", type=int, default=200000)
+    parser.add_argument("--max-entries", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ttl", type=int, default=300)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    # unbounded here, the bound is measured in the steady states below
+    store = MemoryNonceStore(max_entries=args.nonces)
+    issued = []
+    issue = rate(lambda _: issued.append(store.issue(args.ttl)), range(args.nonces))
+    consume = rate(store.consume, issued)
+    print(f"memory store, {args.nonces} nonces")
+    print(f"  issue:   {issue:12.0f} /s")
+    print(f"  consume: {consume:12.0f} /s")
+    print(
+        f"  issue + consume, {args.threads} threads: "
+        f"{threaded_rate(store, args.nonces, args.threads, args.ttl):12.0f} /s"
+    )
+    print(f"  memory when full: {memory_per_nonce(args.max_entries):.0f} bytes/nonce")
+
+    for issue_rate, label in (
+        (args.max_entries // args.ttl, "below the bound"),
+        (args.max_entries // args.ttl * 4, "4x above the bound"),
+    ):
+        result = steady_state(args.max_entries, issue_rate, args.ttl, args.ttl * 2)
+        print(
+            f"steady state {label} of {args.max_entries} entries, {issue_rate} "
+            f"issued/s for {args.ttl * 2}s, half consumed:"
+        )
+        print(
+            f"  peak size {result['peak']}, expired {result['expired']}, "
+            f"refused {result['rejected']}"
+        )
+        print(
+            f"  issue latency p50 / p99 / max: {result['p50']:.1f} / "
+            f"{result['p99']:.1f} / {result['max']:.1f} us"
+        )
+
+    if args.redis_url:
+        store = RedisNonceStore.from_url(args.redis_url)
+        count = min(args.nonces, 20000)
+        issued = []
+        issue = rate(lambda _: issued.append(store.issue(args.ttl)), range(count))
+        consume = rate(store.consume, issued)
+        print(f"redis store, {count} nonces")
+        print(f"  issue:   {issue:12.0f} /s")
+        print(f"  consume: {consume:12.0f} /s")
+
+
+if __name__ == "__main__":
+    main()
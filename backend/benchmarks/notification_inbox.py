@@ -0,0 +1,120 @@
+"""
+Compare the two unread notification read paths: the notification_readers
+anti-join and the per-member inbox.
+
+Runs on the testing database, in-memory SQLite unless TEST_DATABASE_URL
+points to another database (the tables are dropped afterwards):
+
+    python -m benchmarks.notification_inbox --notifications 20000 --members 20
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from spherre.app import create_app
+from spherre.app.extensions import db
+from spherre.app.models import Account, Member, Notification, NotificationType
+from spherre.app.models.account import account_members
+from spherre.app.models.notification import notification_readers
+from spherre.app.service.notification import NotificationService
+
+
+def seed(notifications: int, members: int, read_ratio: float) -> Account:
+    account = Account(id=str(uuid4()), address="0x" + "b" * 64, name="Benchmark")
+    db.session.add(account)
+    member_ids = [str(uuid4()) for _ in range(members)]
+    db.session.add_all(
+        Member(id=member_id, address=f"0x{i:064x}")
+        for i, member_id in enumerate(member_ids)
+    )
+    db.session.flush()
+    db.session.execute(
+        account_members.insert(),
+        [{"account_id": account.id, "member_id": m} for m in member_ids],
+    )
+    start = datetime.now() - timedelta(days=365)
+    rows = [
+        {
+            "id": str(uuid4()),
+            "account_id": account.id,
+            "notification_type": NotificationType.TRANSACTION,
+            "message": f"Notification {i}",
+            "created_at": start + timedelta(minutes=i),
+        }
+        for i in range(notifications)
+    ]
+    db.session.execute(db.insert(Notification), rows)
+    db.session.execute(
+        notification_readers.insert(),
+        [
+            {"notification_id": row["id"], "member_id": member_id}
+            for row in rows
+            for member_id in member_ids
+            if random.random() < read_ratio
+        ],
+    )
+    db.session.commit()
+    return account
+
+
+def measure(account: Account, member_ids: list[str], repeat: int) -> float:
+    """
+    Average milliseconds of an unread listing, first page with its total
+    """
+    elapsed = 0.0
+    for i in range(repeat):
+        member_id = member_ids[i % len(member_ids)]
+        started = time.perf_counter()
+        NotificationService.list_notifications_by_account(
+            account.id, unread_only=True, member_id=member_id
+        )
+        elapsed += time.perf_counter() - started
+        db.session.expunge_all()
+    return elapsed / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--notifications", type=int, default=20000)
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--read-ratio", type=float, default=0.95)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        try:
+            random.seed(0)
+            account = seed(args.notifications, args.members, args.read_ratio)
+            address = account.address
+            member_ids = [
+                member_id
+                for (member_id,) in db.session.query(account_members.c.member_id)
+            ]
+
+            anti_join = measure(account, member_ids, args.repeat)
+            started = time.perf_counter()
+            backfilled = NotificationService.set_inbox_enabled(address, True)
+            backfill_seconds = time.perf_counter() - started
+            account = Account.query.filter_by(address=address).one()
+            inbox = measure(account, member_ids, args.repeat)
+
+            print(
+                f"{args.notifications} notifications, {args.members} members, "
+                f"{args.read_ratio:.0%} read, {db.engine.dialect.name}"
+            )
+            print(f"anti-join read path: {anti_join:8.2f} ms/listing")
+            print(f"inbox read path:     {inbox:8.2f} ms/listing")
+            print(f"speedup:             {anti_join / inbox:8.1f}x")
+            print(f"backfill: {backfilled} rows in {backfill_seconds:.2f}s")
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
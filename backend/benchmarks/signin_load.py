@@ -0,0 +1,205 @@
+"""
+Load test of /auth/signin with the signatures verified in the request
+workers and in the verification pool, measuring the latency of the sign
+ins and of another endpoint served during the burst.
+
+Serves the app with the threaded development server on the testing
+database, a temporary SQLite file unless TEST_DATABASE_URL is set:
+
+    python -m benchmarks.signin_load --clients 16 --signins 20 --workers 4
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from starknet_py.hash.utils import message_signature
+from starknet_py.net.signer.stark_curve_signer import KeyPair
+from werkzeug.serving import make_server
+
+from spherre.app import create_app
+from spherre.app.config import TestingConfig
+from spherre.app.extensions import db
+from spherre.app.models import Member
+from spherre.app.service.auth import AuthService
+from spherre.app.utils.signature import SignatureUtils
+from spherre.app.utils.verification_pool import VerificationPool
+
+MEMBER_ADDRESS = "0x" + "1" * 64
+MEMBER_PATH = f"/api/v1/accounts/member/{MEMBER_ADDRESS}"
+
+
+def signin_payloads(count: int) -> list[bytes]:
+    """
+    Sign a fresh challenge for each sign in, the sign ins consume them
+    """
+    login_message = SignatureUtils.login_message()
+    payloads = []
+    for i in range(count):
+        key_pair = KeyPair.from_private_key(i + 1)
+        nonce = AuthService.create_signin_challenge()["nonce"]
+        message_hash = login_message.message_hash(key_pair.public_key, int(nonce, 16))
+        signatures = list(message_signature(message_hash, key_pair.private_key))
+        payloads.append(
+            json.dumps(
+                {
+                    "signatures": signatures,
+                    "public_key": hex(key_pair.public_key),
+                    "nonce": nonce,
+                }
+            ).encode()
+        )
+    return payloads
+
+
+def request(port: int, method: str, path: str, body: bytes = None) -> float:
+    """
+    Send a request and return its latency in milliseconds
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    started = time.perf_counter()
+    connection.request(
+        method, path, body=body, headers={"Content-Type": "application/json"}
+    )
+    response = connection.getresponse()
+    response.read()
+    elapsed = (time.perf_counter() - started) * 1000
+    connection.close()
+    if response.status not in (200, 503):
+        raise RuntimeError(f"{method} {path}: {response.status}")
+    return elapsed
+
+
+def percentile(latencies: list[float], p: float) -> float:
+    if len(latencies) < 2:
+        return latencies[0] if latencies else 0.0
+    return statistics.quantiles(latencies, n=100, method="inclusive")[int(p) - 1]
+
+
+def run(app, port: int, payloads: list[bytes], clients: int, signins: int) -> dict:
+    signin_latencies: list[float] = []
+    other_latencies: list[float] = []
+    done = threading.Event()
+
+    def login_client(index: int):
+        for i in range(signins):
+            payload = payloads[index * signins + i]
+            signin_latencies.append(
+                request(port, "POST", "/api/v1/auth/signin", payload)
+            )
+
+    def other_client():
+        while not done.is_set():
+            other_latencies.append(request(port, "GET", MEMBER_PATH))
+
+    # baseline of the other endpoint without logins
+    idle = [request(port, "GET", MEMBER_PATH) for _ in range(50)]
+
+    threads = [threading.Thread(target=login_client, args=(i,)) for i in range(clients)]
+    other = threading.Thread(target=other_client)
+    started = time.perf_counter()
+    other.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    other.join()
+    return {
+        "throughput": len(signin_latencies) / elapsed,
+        "signin_p50": percentile(signin_latencies, 50),
+        "signin_p99": percentile(signin_latencies, 99),
+        "other_idle_p50": percentile(idle, 50),
+        "other_p50": percentile(other_latencies, 50),
+        "other_p99": percentile(other_latencies, 99),
+        "pool": app.extensions["verification_pool"].metrics(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--signins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=64)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    if not os.environ.get("TEST_DATABASE_URL"):
+        # the connections of the server threads must share the database
+        TestingConfig.SQLALCHEMY_DATABASE_URI = (
+            f"sqlite:///{tmpdir.name}/signin_load.sqlite3"
+        )
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        db.session.add(Member(address=MEMBER_ADDRESS))
+        db.session.commit()
+        domain = SignatureUtils.login_message_domain()
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        results = {}
+        for name, workers in (("request worker", 0), ("process pool", args.workers)):
+            pool = VerificationPool(
+                workers=workers,
+                queue_size=args.queue_size,
+                timeout=30,
+                domain=domain,
+            )
+            app.extensions["verification_pool"] = pool
+            with app.app_context():
+                # one signer per sign in, sign ins of the same member would
+                # race on its creation
+                payloads = signin_payloads(args.clients * args.signins)
+            if workers:
+                # start the processes outside of the measure
+                list(pool._get_executor().map(abs, range(workers * 4)))
+            try:
+                results[name] = run(
+                    app, server.port, payloads, args.clients, args.signins
+                )
+            finally:
+                pool.shutdown()
+            # both runs create their members
+            with app.app_context():
+                Member.query.filter(Member.address != MEMBER_ADDRESS).delete()
+                db.session.commit()
+    finally:
+        server.shutdown()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        tmpdir.cleanup()
+
+    print(
+        f"{args.clients} clients x {args.signins} sign ins, "
+        f"{args.workers} pool processes"
+    )
+    for name, result in results.items():
+        pool = result["pool"]
+        print(f"{name}:")
+        print(f"  sign in throughput:  {result['throughput']:8.1f} /s")
+        print(
+            f"  sign in p50 / p99:   {result['signin_p50']:8.1f} / "
+            f"{result['signin_p99']:.1f} ms"
+        )
+        print(
+            f"  other endpoint p50 / p99: {result['other_p50']:8.1f} / "
+            f"{result['other_p99']:.1f} ms (idle p50 {result['other_idle_p50']:.1f})"
+        )
+        print(
+            f"  pool queue time avg / max: {pool['queue_time_avg'] * 1000:8.1f} / "
+            f"{pool['queue_time_max'] * 1000:.1f} ms, rejected {pool['rejected']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare the sign in signature verification with the login message hash
+rebuilt on every request and with the precomputed login message hash.
+
+    python -m benchmarks.signin_verification --signers 20 --repeat 200
+"""
+
+import argparse
+import time
+
+from starknet_py.hash.utils import message_signature, verify_message_signature
+from starknet_py.net.signer.stark_curve_signer import KeyPair
+from starknet_py.utils.typed_data import TypedData
+
+from spherre.app import create_app
+from spherre.app.utils.signature import SignatureUtils
+
+
+def sign(key_pair: KeyPair, nonce: int) -> list[int]:
+    typed_data = TypedData(**SignatureUtils.login_typed_data_format(nonce=nonce))
+    message_hash = typed_data.message_hash(key_pair.public_key)
+    return list(message_signature(message_hash, key_pair.private_key))
+
+
+def uncached(signatures: list[int], public_key: int, nonce: int) -> bool:
+    """
+    The verification as it was done before the login message was cached
+    """
+    typed_data = TypedData(**SignatureUtils.login_typed_data_format(nonce=nonce))
+    return SignatureUtils.verify_signatures(typed_data, signatures, public_key)
+
+
+def hash_only_uncached(public_key: int, nonce: int) -> int:
+    typed_data = TypedData(**SignatureUtils.login_typed_data_format(nonce=nonce))
+    return typed_data.message_hash(public_key)
+
+
+def measure(verify, signed: list[tuple[list[int], int, int]], repeat: int) -> float:
+    """
+    Verifications per second
+    """
+    started = time.perf_counter()
+    for i in range(repeat):
+        signatures, public_key, nonce = signed[i % len(signed)]
+        assert verify(signatures, public_key, nonce)
+    return repeat / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--signers", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app("testing")
+    with app.app_context():
+        key_pairs = [KeyPair.from_private_key(i + 1) for i in range(args.signers)]
+        # the nonces of the challenges, the benchmark does not consume them
+        signed = [
+            (sign(key_pair, nonce), key_pair.public_key, nonce)
+            for nonce, key_pair in enumerate(key_pairs, start=1)
+        ]
+
+        before = measure(uncached, signed, args.repeat)
+        after = measure(SignatureUtils.verify_login_signatures, signed, args.repeat)
+
+        signers = [(public_key, nonce) for _signatures, public_key, nonce in signed]
+        login_message = SignatureUtils.login_message()
+        started = time.perf_counter()
+        for i in range(args.repeat):
+            hash_only_uncached(*signers[i % len(signers)])
+        hash_before = (time.perf_counter() - started) / args.repeat * 1e6
+        started = time.perf_counter()
+        for i in range(args.repeat):
+            login_message.message_hash(*signers[i % len(signers)])
+        hash_after = (time.perf_counter() - started) / args.repeat * 1e6
+
+        # the signature check is shared by both and bounds the speedup
+        signatures, public_key, nonce = signed[0]
+        message_hash = login_message.message_hash(public_key, nonce)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            verify_message_signature(message_hash, signatures, public_key)
+        ecdsa = (time.perf_counter() - started) / args.repeat * 1e6
+
+        print(f"{args.repeat} verifications, {args.signers} signers")
+        print(f"message hash, rebuilt:     {hash_before:10.1f} us")
+        print(f"message hash, precomputed: {hash_after:10.1f} us")
+        print(f"ecdsa verification:        {ecdsa:10.1f} us")
+        print(f"sign in, rebuilt:          {before:10.1f} verifications/s")
+        print(f"sign in, precomputed:      {after:10.1f} verifications/s")
+        print(f"speedup:                   {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,26 @@ from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 
 from spherre.app.config import config
 from spherre.app.extensions import cors, db, jwt, migrate
+from spherre.app.utils.access_cache import AccountAccessCache
+from spherre.app.utils.email import create_mailer
+from spherre.app.utils.events import create_event_bus
+from spherre.app.utils.nonce_store import create_nonce_store
+from spherre.app.utils.response_cache import create_cache_backend
+from spherre.app.utils.signature import SignatureUtils
+from spherre.app.utils.verification_pool import create_verification_pool
 from spherre.app.views.accounts import accounts_blueprint
 from spherre.app.views.auth import auth_blueprint
+from spherre.app.views.events import events_blueprint
 from spherre.app.views.notifications import notifications_blueprint
 from spherre.app.views.settings import settings_blueprint
 from spherre.app.views.smart_lock import smart_lock_blueprint
 from spherre.app.views.transactions import transactions_blueprint
 
+# a starknet address in a url path, not part of a longer hex string
+STARKNET_ADDRESS_PATTERN = re.compile(
+    r"(?<![0-9a-zA-Z])0x[0-9a-fA-F]{64}(?![0-9a-fA-F])"
+)
+
 
 def create_app(config_name="development"):
     app = Flask(__name__)
@@ -22,8 +35,26 @@ def create_app(config_name="development"):
     migrate.init_app(app, db)
     jwt.init_app(app)
     cors.init_app(app)
+    app.extensions["account_access_cache"] = AccountAccessCache(
+        ttl=app.config["ACCOUNT_ACCESS_CACHE_TTL"],
+        max_entries=app.config["ACCOUNT_ACCESS_CACHE_MAX_ENTRIES"],
+    )
+    app.extensions["response_cache"] = create_cache_backend(app.config)
+    app.extensions["event_bus"] = create_event_bus(app.config)
+    app.extensions["mailer"] = create_mailer(app.config)
+    # precompute the login message hash of the configured domain
+    SignatureUtils.login_message(app.config)
+    app.extensions["verification_pool"] = create_verification_pool(app.config)
+    app.extensions["nonce_store"] = create_nonce_store(app.config)
 
     from spherre.app import models  # noqa
+    from spherre.app.commands import (
+        dispatch_emails_command,
+        notification_inbox_command,
+        notification_retention_command,
+        reconcile_unread_counts_command,
+        repair_counters_command,
+    )
     from spherre.app.service.account import AccountService
 
     # Register blueprints
@@ -33,26 +64,28 @@ def create_app(config_name="development"):
     app.register_blueprint(transactions_blueprint)
     app.register_blueprint(auth_blueprint)
     app.register_blueprint(settings_blueprint)
+    app.register_blueprint(events_blueprint)
+
+    # Register cli commands
+    app.cli.add_command(repair_counters_command)
+    app.cli.add_command(dispatch_emails_command)
+    app.cli.add_command(reconcile_unread_counts_command)
+    app.cli.add_command(notification_inbox_command)
+    app.cli.add_command(notification_retention_command)
 
     @app.before_request
     def validate_private_account_access():
-        # get url path
-        url_path = request.path
-
-        # regex to check if url has a starknet address in it
-        regex = r"^0x[0-9a-fA-F]{64}$"
-
-        if account_address := re.search(regex, url_path):
-            # get account address from url
-            account_address = account_address.group(0)
-            account = AccountService.get_account_by_address(account_address)
+        # the first starknet address in the url path
+        if match := STARKNET_ADDRESS_PATTERN.search(request.path):
+            account_address = match.group(0)
+            access = AccountService.get_account_access(account_address)
             # check if account address is a private
-            if account and account.is_private:
+            if access and access.is_private:
                 # validate user is a member of the account
                 # this will raise an exception if no jwt is found
                 verify_jwt_in_request()
                 current_user = get_jwt_identity()
-                if not AccountService.is_account_member(account_address, current_user):
+                if current_user not in access.members:
                     return jsonify(
                         {"error": "You are not a member of this account"}
                     ), 403
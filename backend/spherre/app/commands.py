@@ -0,0 +1,109 @@
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from spherre.app.extensions import db
+from spherre.app.service.account import AccountService
+from spherre.app.service.email_outbox import EmailOutboxService
+from spherre.app.service.notification import NotificationService
+from spherre.app.service.transaction import TransactionService
+
+
+@click.command("repair-counters")
+@with_appcontext
+def repair_counters_command():
+    """
+    Recompute the denormalized member, approval and rejection counters
+    from the association tables.
+    """
+    accounts = AccountService.recompute_member_counts()
+    transactions = TransactionService.recompute_vote_counts()
+    click.echo(f"[+] Repaired {accounts} account(s) and {transactions} transaction(s).")
+
+
+@click.command("reconcile-unread-counts")
+@with_appcontext
+def reconcile_unread_counts_command():
+    """
+    Recompute the unread notification counters from the notification readers.
+    """
+    repaired = NotificationService.reconcile_unread_counts()
+    click.echo(f"[+] Repaired {repaired} unread notification counter(s).")
+
+
+@click.command("notification-inbox")
+@click.argument("account_address")
+@click.option(
+    "--enable/--disable",
+    default=True,
+    help="Serve the unread listings from the per-member inbox or not.",
+)
+@with_appcontext
+def notification_inbox_command(account_address: str, enable: bool):
+    """
+    Switch the unread notification listings of an account to the per-member
+    inbox, backfilling it, or back to the notification_readers anti-join.
+    """
+    try:
+        backfilled = NotificationService.set_inbox_enabled(account_address, enable)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    state = "enabled" if enable else "disabled"
+    click.echo(f"[+] Inbox {state}, backfilled {backfilled} notification(s).")
+
+
+@click.command("notification-retention")
+@click.option(
+    "--days",
+    type=int,
+    default=None,
+    help="Retention in days, defaults to NOTIFICATION_RETENTION_DAYS.",
+)
+@click.option(
+    "--delete", is_flag=True, help="Delete the notifications without archiving."
+)
+@click.option("--chunk-size", type=int, default=1000, show_default=True)
+@with_appcontext
+def notification_retention_command(days, delete: bool, chunk_size: int):
+    """
+    Archive, or delete, the notifications older than the retention period.
+    """
+    days = (
+        days if days is not None else current_app.config["NOTIFICATION_RETENTION_DAYS"]
+    )
+    removed = NotificationService.archive_notifications(
+        datetime.now() - timedelta(days=days),
+        archive=not delete,
+        chunk_size=chunk_size,
+    )
+    action = "Deleted" if delete else "Archived"
+    click.echo(f"[+] {action} {removed} notification(s) older than {days} day(s).")
+
+
+@click.command("dispatch-emails")
+@click.option("--once", is_flag=True, help="Run a single dispatch pass and exit.")
+@with_appcontext
+def dispatch_emails_command(once: bool):
+    """
+    Deliver the queued notification emails, polling the outbox every
+    EMAIL_DISPATCH_INTERVAL seconds.
+    """
+    interval = current_app.config["EMAIL_DISPATCH_INTERVAL"]
+    while True:
+        stats = EmailOutboxService.dispatch_pending()
+        metrics = EmailOutboxService.queue_metrics()
+        # release the connection while idle
+        db.session.remove()
+        click.echo(
+            f"[+] Sent {stats['sent']}, retrying {stats['retried']}, "
+            f"failed {stats['failed']} email(s). Queue: {metrics['pending']} "
+            f"pending ({metrics['due']} due), {metrics['failed']} failed, "
+            f"oldest {metrics['oldest_pending_seconds']:.0f}s."
+        )
+        if once:
+            break
+        if not any(stats.values()):
+            time.sleep(interval)
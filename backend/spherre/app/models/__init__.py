@@ -1,6 +1,9 @@
-from spherre.app.extensions import db
 from spherre.app.models.account import Account, Member
+from spherre.app.models.base import commit_session, transactional
+from spherre.app.models.indexer import IndexerCursor
 from spherre.app.models.notification import (
+    EmailOutbox,
+    EmailStatus,
     Notification,
     NotificationPreference,
     NotificationType,
@@ -14,12 +17,15 @@ from spherre.app.models.transaction import (
 
 
 def session_save():
-    db.session.commit()
+    commit_session()
 
 
 __all__ = [
     "Account",
     "Member",
+    "EmailOutbox",
+    "EmailStatus",
+    "IndexerCursor",
     "Notification",
     "NotificationPreference",
     "SmartLock",
@@ -28,4 +34,5 @@ __all__ = [
     "TransactionStatus",
     "TransactionType",
     "NotificationType",
+    "transactional",
 ]
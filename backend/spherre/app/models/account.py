@@ -1,5 +1,5 @@
 from spherre.app.extensions import db
-from spherre.app.models.base import ModelMixin
+from spherre.app.models.base import ModelMixin, maintain_count
 
 account_members = db.Table(
     "account_members",
@@ -15,6 +15,15 @@ class Account(ModelMixin, db.Model):
     description = db.Column(db.String, nullable=True)
     is_private = db.Column(db.Boolean, default=True)
     threshold = db.Column(db.Integer)
+    # denormalized size of `members`, see `maintain_count`
+    member_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # bumped by every write to the account data, used as the ETag of its listings
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # notifications are also fanned out to the notification_inbox rows of
+    # the members, which serve their unread listings
+    inbox_enabled = db.Column(
+        db.Boolean, nullable=False, default=False, server_default=db.false()
+    )
     members = db.relationship("Member", secondary=account_members, backref="accounts")
     transactions = db.relationship(
         "Transaction", backref="account", lazy=True, cascade="all, delete-orphan"
@@ -31,3 +40,6 @@ class Member(ModelMixin, db.Model):
 
     def __repr__(self):
         return f"<Member {self.address[0:10]}... >"
+
+
+maintain_count(Account, "members", "member_count")
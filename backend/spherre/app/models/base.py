@@ -1,5 +1,12 @@
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Table, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, attributes
+from sqlalchemy.orm.base import PASSIVE_NO_INITIALIZE
 
 from spherre.app.extensions import db
 
@@ -9,6 +16,129 @@ def generate_uuid():
     return str(uuid.uuid4())
 
 
+_TRANSACTION_DEPTH = "transaction_depth"
+_ROLLBACK_ONLY = "transaction_rollback_only"
+
+
+@contextmanager
+def transactional():
+    """
+    Group the writes of a logical operation into a single commit.
+    Inside the scope the model helpers and `session_save` defer their
+    commits, and the outermost scope commits once on exit or rolls back
+    if an exception is raised. Nested scopes join the outer one.
+    Can be used as a context manager or as a decorator:
+
+        with transactional():
+            ...
+
+        @transactional()
+        def operation():
+            ...
+    """
+    info = db.session.info
+    depth = info.get(_TRANSACTION_DEPTH, 0)
+    info[_TRANSACTION_DEPTH] = depth + 1
+    try:
+        yield db.session
+    except BaseException:
+        if depth == 0:
+            db.session.rollback()
+        else:
+            # the outer scope must not commit work the inner one gave up on
+            info[_ROLLBACK_ONLY] = True
+        raise
+    else:
+        if depth == 0:
+            if info.pop(_ROLLBACK_ONLY, False):
+                db.session.rollback()
+                raise RuntimeError(
+                    "Transaction rolled back because a nested scope failed"
+                )
+            db.session.commit()
+    finally:
+        info[_TRANSACTION_DEPTH] = depth
+        if depth == 0:
+            info.pop(_ROLLBACK_ONLY, None)
+
+
+def in_transaction() -> bool:
+    """
+    Check if the current session is inside a `transactional` scope
+    """
+    return db.session.info.get(_TRANSACTION_DEPTH, 0) > 0
+
+
+def commit_session():
+    """
+    Commit the session, unless a `transactional` scope will commit it later
+    """
+    if not in_transaction():
+        db.session.commit()
+
+
+# (model, collection attribute, counter column) triples kept in sync on flush
+_COUNTERS: list[tuple[type, str, str]] = []
+
+
+def maintain_count(model: type, collection: str, counter: str):
+    """
+    Keep the `counter` column of a model equal to the size of one of its
+    many-to-many collections. Every flush adds the number of appended items
+    minus the removed ones to the column with a single
+    `UPDATE ... SET counter = counter + delta`, so concurrent writers
+    never lose increments.
+    Rows written to the association table with Core statements bypass this
+    and must set the counter themselves.
+    """
+    _COUNTERS.append((model, collection, counter))
+
+
+@event.listens_for(Session, "after_flush")
+def _update_counters(session: Session, flush_context):
+    if not _COUNTERS:
+        return
+    expired = session.info.setdefault("expired_counters", [])
+    for obj in list(session.new) + list(session.dirty):
+        for model, collection, counter in _COUNTERS:
+            if not isinstance(obj, model):
+                continue
+            history = attributes.get_history(
+                obj, collection, passive=PASSIVE_NO_INITIALIZE
+            )
+            delta = len(history.added) - len(history.deleted)
+            if not delta:
+                continue
+            table = model.__table__
+            session.connection().execute(
+                table.update()
+                .where(table.c.id == obj.id)
+                .values({counter: table.c[counter] + delta})
+            )
+            expired.append((obj, counter))
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _expire_counters(session: Session, flush_context):
+    # reload the counters from the database on next access
+    for obj, counter in session.info.pop("expired_counters", []):
+        session.expire(obj, [counter])
+
+
+def insert_ignore(table: Table, dialect: Optional[str] = None):
+    """
+    Build an INSERT statement that skips rows conflicting with existing ones.
+    Uses ON CONFLICT DO NOTHING on Postgres and SQLite.
+    The dialect defaults to the one of the session bind.
+    """
+    dialect = dialect or db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return table.insert().prefix_with("IGNORE")
+
+
 class ModelMixin:
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -23,7 +153,7 @@ class ModelMixin:
     def create(cls, **kwargs):
         obj = cls(**kwargs)
         db.session.add(obj)
-        db.session.commit()
+        commit_session()
         return obj
 
     @classmethod
@@ -33,8 +163,8 @@ class ModelMixin:
 
     def save(self):
         db.session.add(self)
-        db.session.commit()
+        commit_session()
 
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
+        commit_session()
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from spherre.app.extensions import db
+
+
+class IndexerCursor(db.Model):
+    """
+    The last block persisted by an indexer.
+    It is written in the transaction of the block data, so after a restart
+    the indexer resumes right after the last block it committed.
+    """
+
+    __tablename__ = "indexer_cursors"
+    indexer_id = db.Column(db.String(64), primary_key=True)
+    block_number = db.Column(db.BigInteger, nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=False
+    )
+
+    def __repr__(self):
+        return f"<IndexerCursor {self.indexer_id} {self.block_number}>"
@@ -1,7 +1,9 @@
 import enum
+from datetime import datetime
 
-from sqlalchemy import Enum
+from sqlalchemy import Enum, Index
 
+from spherre.app.config import Config
 from spherre.app.extensions import db
 from spherre.app.models.base import ModelMixin
 
@@ -29,6 +31,41 @@ notification_readers = db.Table(
     db.Column("member_id", db.String, db.ForeignKey("members.id"), primary_key=True),
 )
 
+# number of notifications of an account not read by a member, maintained by
+# the notification service so unread badges are a primary key read
+notification_unread_counts = db.Table(
+    "notification_unread_counts",
+    db.Column("account_id", db.String, db.ForeignKey("accounts.id"), primary_key=True),
+    db.Column("member_id", db.String, db.ForeignKey("members.id"), primary_key=True),
+    db.Column("count", db.Integer, nullable=False, default=0, server_default="0"),
+)
+
+# per-member copy of the notifications of the accounts with the inbox
+# enabled, so unread listings are an index range scan instead of an anti-join
+# over the whole account history
+notification_inbox = db.Table(
+    "notification_inbox",
+    db.Column("member_id", db.String, db.ForeignKey("members.id"), primary_key=True),
+    db.Column(
+        "notification_id",
+        db.String,
+        db.ForeignKey("notifications.id"),
+        primary_key=True,
+    ),
+    db.Column("account_id", db.String, db.ForeignKey("accounts.id"), nullable=False),
+    db.Column(
+        "read", db.Boolean, nullable=False, default=False, server_default=db.false()
+    ),
+    db.Column("created_at", db.DateTime, nullable=False),
+    Index(
+        "idx_notification_inbox_member_read_created",
+        "member_id",
+        "account_id",
+        "read",
+        "created_at",
+    ),
+)
+
 
 class Notification(ModelMixin, db.Model):
     """
@@ -46,6 +83,34 @@ class Notification(ModelMixin, db.Model):
     message = db.Column(db.String, nullable=False)
     read_by = db.relationship("Member", secondary=notification_readers)
 
+    # account listings are ordered by (created_at, id)
+    __table_args__ = (
+        Index("idx_notifications_account_created", "account_id", "created_at", "id"),
+    )
+
+
+# notifications moved out of the notifications table by the retention job.
+# With NOTIFICATION_ARCHIVE_PARTITIONED set, the table is range partitioned
+# by month of creation on Postgres, the partitions being created by the job
+# as needed, so old months can be detached or dropped at once
+notifications_archive = db.Table(
+    "notifications_archive",
+    db.Column("id", db.String(36), primary_key=True),
+    db.Column("created_at", db.DateTime, primary_key=True),
+    db.Column("account_id", db.String, nullable=False),
+    db.Column("notification_type", Enum(NotificationType), nullable=False),
+    db.Column("title", db.String, nullable=True),
+    db.Column("message", db.String, nullable=False),
+    db.Column("updated_at", db.DateTime, nullable=True),
+    db.Column("archived_at", db.DateTime, nullable=False),
+    Index("idx_notifications_archive_account_created", "account_id", "created_at"),
+    **(
+        {"postgresql_partition_by": "RANGE (created_at)"}
+        if Config.NOTIFICATION_ARCHIVE_PARTITIONED
+        else {}
+    ),
+)
+
 
 class NotificationPreference(ModelMixin, db.Model):
     """
@@ -63,3 +128,44 @@ class NotificationPreference(ModelMixin, db.Model):
         "Member", foreign_keys=[member_id], backref="member_preferences"
     )
     email_enabled: bool = db.Column(db.Boolean, default=True)
+
+
+class EmailStatus(enum.Enum):
+    """
+    Enum representing the delivery status of an outgoing email.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class EmailOutbox(ModelMixin, db.Model):
+    """
+    Model representing an email waiting to be delivered by the dispatcher.
+    """
+
+    __tablename__ = "email_outbox"
+
+    notification_id = db.Column(
+        db.String, db.ForeignKey("notifications.id"), nullable=True
+    )
+    to_email = db.Column(db.String, nullable=False)
+    subject = db.Column(db.String, nullable=False)
+    message = db.Column(db.String, nullable=False)
+    status = db.Column(
+        Enum(EmailStatus),
+        default=EmailStatus.PENDING,
+        server_default=EmailStatus.PENDING.name,
+        nullable=False,
+    )
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # the email is not claimed by the dispatcher before this time
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    last_error = db.Column(db.String, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    # the dispatcher claims due pending emails
+    __table_args__ = (
+        Index("idx_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
@@ -1,9 +1,9 @@
 import enum
 
-from sqlalchemy import JSON, Enum
+from sqlalchemy import JSON, Enum, Index, UniqueConstraint
 
 from spherre.app.extensions import db
-from spherre.app.models.base import ModelMixin
+from spherre.app.models.base import ModelMixin, maintain_count
 
 
 class TransactionType(enum.Enum):
@@ -79,6 +79,55 @@ class Transaction(ModelMixin, db.Model):
         backref=db.backref("rejected_transactions", lazy="dynamic"),
         lazy="dynamic",
     )
+    # denormalized sizes of `approved` and `rejected`, see `maintain_count`
+    approval_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    rejection_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    # read-only, eagerly loadable views of the approved/rejected members
+    # used by the listing endpoints to avoid a dynamic query per transaction
+    approvers = db.relationship(
+        "Member", secondary=approved_members, viewonly=True, order_by="Member.id"
+    )
+    rejectors = db.relationship(
+        "Member", secondary=rejected_members, viewonly=True, order_by="Member.id"
+    )
     date_created = db.Column(db.DateTime, default=db.func.current_timestamp())
     date_executed = db.Column(db.DateTime, nullable=True)
     data = db.Column(JSON, nullable=True)
+
+    # Indexes matching the filter and sort paths of the transaction listing.
+    # `id` trails every index so keyset pages and tiebreaks stay index-ordered.
+    __table_args__ = (
+        UniqueConstraint(
+            "account_id", "transaction_id", name="uq_transactions_account_tx_id"
+        ),
+        Index("idx_transactions_account_created", "account_id", "date_created", "id"),
+        Index(
+            "idx_transactions_account_status_created",
+            "account_id",
+            "status",
+            "date_created",
+            "id",
+        ),
+        Index(
+            "idx_transactions_account_type_created",
+            "account_id",
+            "tx_type",
+            "date_created",
+            "id",
+        ),
+        Index(
+            "idx_transactions_account_proposer_created",
+            "account_id",
+            "proposer_id",
+            "date_created",
+            "id",
+        ),
+    )
+
+
+maintain_count(Transaction, "approved", "approval_count")
+maintain_count(Transaction, "rejected", "rejection_count")
@@ -15,22 +15,35 @@ class SignInSerializer(Schema):
         signatures: A list of strings representing the signatures of
             the signed login message
         public_key: The public key of the signer
+        nonce: The nonce of the sign in challenge signed in the message
     """
 
     signatures = fields.List(fields.Integer(), required=True)
     public_key = fields.String(required=True)
+    nonce = fields.String(required=True)
 
     @validates("signatures")
     def validate_signatures(self, signatures: list[int]):
         if len(signatures) != 2:
             raise ValidationError("Signatures must be a list of 2 integers")
 
+    @validates("nonce")
+    def validate_nonce(self, nonce: str):
+        try:
+            int(nonce, 16)
+        except ValueError:
+            raise ValidationError("Nonce must be a hex string")
+
     @post_load
     def validate_signin_request(self, data: dict, **kwargs):
         public_key = SignatureUtils.convert_public_key_to_int(data["public_key"])
-        if not AuthService.validate_signin_request(data["signatures"], public_key):
+        try:
+            address = AuthService.verify_signin(
+                data["signatures"], public_key, int(data["nonce"], 16)
+            )
+        except ValueError as e:
+            raise ValidationError(str(e), "nonce")
+        if address is None:
             raise ValidationError("Invalid signatures")
-        data["address"] = AuthService.generate_address_from_public_key(
-            data["public_key"]
-        )
+        data["address"] = address
         return data
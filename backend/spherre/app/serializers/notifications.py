@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, ValidationError, fields, validates_schema
 
 
 class AccountSchema(Schema):
@@ -24,3 +24,13 @@ class NotificationPreferenceSchema(Schema):
     account = fields.Nested(AccountSchema)
     member = fields.Nested(MemberSchema)
     email_enabled = fields.Boolean()
+
+
+class MarkNotificationsReadSerializer(Schema):
+    notification_ids = fields.List(fields.String())
+    up_to = fields.DateTime()
+
+    @validates_schema
+    def validate_selection(self, data, **kwargs):
+        if "notification_ids" not in data and "up_to" not in data:
+            raise ValidationError("Either notification_ids or up_to is required")
@@ -18,8 +18,8 @@ class TransactionSchema(Schema):
     status = EnumField(TransactionStatus, by_value=True)
     proposer = fields.Nested(MemberSchema)
     executor = fields.Nested(MemberSchema, allow_none=True)
-    approved = fields.List(fields.Nested(MemberSchema))
-    rejected = fields.List(fields.Nested(MemberSchema))
+    approved = fields.List(fields.Nested(MemberSchema), attribute="approvers")
+    rejected = fields.List(fields.Nested(MemberSchema), attribute="rejectors")
     date_created = fields.DateTime()
     date_executed = fields.DateTime(allow_none=True)
     data = fields.Dict()
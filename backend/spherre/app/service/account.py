@@ -1,7 +1,19 @@
-from typing import Optional
+from datetime import datetime
+from typing import Iterable, Optional
 
-from spherre.app.models import session_save
-from spherre.app.models.account import Account, Member
+from spherre.app.extensions import db
+from spherre.app.models import session_save, transactional
+from spherre.app.models.account import Account, Member, account_members
+from spherre.app.models.base import generate_uuid, insert_ignore
+from spherre.app.utils.access_cache import AccountAccess, get_account_access_cache
+from spherre.app.utils.response_cache import (
+    account_tag,
+    invalidate_cache_tags,
+    member_tag,
+)
+
+# max rows written per bulk INSERT statement
+BULK_CHUNK_SIZE = 500
 
 
 class AccountService:
@@ -16,17 +28,102 @@ class AccountService:
     ) -> Account:
         """
         Create an account.
-        Loop through the members and add it to the many-to-many
-        field of the account
+        The account and its members are written through the bulk
+        path in a single transaction.
+        """
+        return cls.create_accounts(
+            [
+                {
+                    "address": address,
+                    "name": name,
+                    "threshold": threshold,
+                    "members": members,
+                    "description": description,
+                }
+            ]
+        )[0]
+
+    @classmethod
+    def create_accounts(cls, accounts: list[dict]) -> list[Account]:
+        """
+        Create many accounts in a single transaction.
+        All member addresses are resolved in one query, the missing members
+        are inserted in bulk and the account memberships are written with
+        one executemany.
+
+        Args:
+            accounts(list[dict]): The accounts to create. Each item holds the
+                `address`, `name`, `threshold`, `members` and optional
+                `description` of an account.
+
+        Returns:
+            list[Account]: The created accounts, in the order they were given.
+        """
+        with transactional():
+            member_ids = cls._get_or_create_member_ids(
+                address for data in accounts for address in data["members"]
+            )
+            created = [
+                Account(
+                    address=data["address"],
+                    name=data["name"],
+                    threshold=data["threshold"],
+                    description=data.get("description"),
+                    # memberships are written with Core below
+                    member_count=len(set(data["members"])),
+                )
+                for data in accounts
+            ]
+            db.session.add_all(created)
+            db.session.flush()
+            memberships = [
+                {"account_id": account.id, "member_id": member_ids[address]}
+                for account, data in zip(created, accounts)
+                for address in dict.fromkeys(data["members"])
+            ]
+            if memberships:
+                db.session.execute(account_members.insert(), memberships)
+            invalidate_cache_tags(*(member_tag(address) for address in member_ids))
+        return created
+
+    @classmethod
+    def _get_or_create_member_ids(cls, addresses: Iterable[str]) -> dict[str, str]:
+        """
+        Map member addresses to member ids, inserting the missing members.
+        Nothing is committed here.
         """
-        account = Account.create(
-            name=name, threshold=threshold, description=description, address=address
+        addresses = list(dict.fromkeys(addresses))
+        member_ids = {}
+        for i in range(0, len(addresses), BULK_CHUNK_SIZE):
+            chunk = addresses[i : i + BULK_CHUNK_SIZE]
+            member_ids.update(cls._select_member_ids(chunk))
+            missing = [address for address in chunk if address not in member_ids]
+            if not missing:
+                continue
+            now = datetime.now()
+            db.session.execute(
+                insert_ignore(Member.__table__).values(
+                    [
+                        {
+                            "id": generate_uuid(),
+                            "address": address,
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for address in missing
+                    ]
+                )
+            )
+            # re-select since a concurrent writer could have won the insert
+            member_ids.update(cls._select_member_ids(missing))
+        return member_ids
+
+    @classmethod
+    def _select_member_ids(cls, addresses: list[str]) -> dict[str, str]:
+        rows = db.session.query(Member.address, Member.id).filter(
+            Member.address.in_(addresses)
         )
-        for member_address in members:
-            member = Member.get_or_create(address=member_address)
-            account.members.append(member)
-        session_save()  # save the member addition action
-        return account
+        return {address: member_id for address, member_id in rows}
 
     @classmethod
     def get_account_by_address(cls, address: str) -> Optional[Account]:
@@ -72,9 +169,19 @@ class AccountService:
         account = Account.query.filter_by(address=account_address).one_or_none()
         if not account:
             return None
-        member = Member.get_or_create(address=member_address)
-        account.members.append(member)
-        session_save()
+        from spherre.app.service.notification import NotificationService
+
+        with transactional():
+            member = Member.get_or_create(address=member_address)
+            account.members.append(member)
+            cls.mark_account_updated(account_address)
+            invalidate_cache_tags(member_tag(member_address))
+            db.session.flush()
+            # start the unread counter and the inbox of the member from the
+            # notifications the account already has
+            NotificationService.reconcile_unread_counts(account.id, member.id)
+            NotificationService.backfill_inbox(account.id, member.id)
+        get_account_access_cache().invalidate(account_address)
         return account
 
     @classmethod
@@ -91,7 +198,10 @@ class AccountService:
         if not member:
             return None
         account.members.remove(member)
+        cls.mark_account_updated(account_address)
+        invalidate_cache_tags(member_tag(member_address))
         session_save()
+        get_account_access_cache().invalidate(account_address)
         return account
 
     @classmethod
@@ -105,6 +215,7 @@ class AccountService:
         if not account:
             return None
         account.threshold = new_threshold
+        cls.mark_account_updated(account_address, members=True)
         account.save()
         return account
 
@@ -119,6 +230,7 @@ class AccountService:
         if not account:
             return None
         account.description = new_description
+        cls.mark_account_updated(account_address, members=True)
         account.save()
         return account
 
@@ -133,6 +245,7 @@ class AccountService:
         if not account:
             return None
         account.name = new_name
+        cls.mark_account_updated(account_address, members=True)
         account.save()
         return account
 
@@ -148,9 +261,51 @@ class AccountService:
         if not account:
             return None
         account.is_private = not account.is_private
+        cls.mark_account_updated(account_address, members=True)
         account.save()
+        get_account_access_cache().invalidate(account_address)
         return account
 
+    @classmethod
+    def mark_account_updated(cls, account_address: str, members: bool = False):
+        """
+        Record a write to the data of an account.
+        Bumps the account version in the current transaction and invalidates
+        the cached responses of the account once it commits.
+
+        Args:
+            account_address: The address of the account
+            members: Also invalidate the account lists of its members, for
+                writes to the account details they show
+        """
+        db.session.execute(
+            db.update(Account)
+            .where(Account.address == account_address)
+            .values(version=Account.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        invalidate_cache_tags(account_tag(account_address))
+        if members:
+            invalidate_cache_tags(
+                *(
+                    member_tag(address)
+                    for (address,) in cls._account_members_query(account_address)
+                )
+            )
+
+    @classmethod
+    def get_account_version(cls, account_address: str) -> Optional[int]:
+        """
+        Get the version of an account.
+        Read from the database on every call, a cached copy would not see
+        the writes of the other processes, e.g. the indexer.
+        """
+        return (
+            db.session.query(Account.version)
+            .filter_by(address=account_address)
+            .scalar()
+        )
+
     @classmethod
     def get_account_threshold(cls, account_address: str) -> Optional[float]:
         """
@@ -166,10 +321,114 @@ class AccountService:
         """
         Check if a member is part of an account
         """
-        account = Account.query.filter_by(address=account_address).one_or_none()
+        query = cls._account_members_query(account_address).filter(
+            Member.address == member_address
+        )
+        return db.session.query(query.exists()).scalar()
+
+    @classmethod
+    def filter_members(cls, account_address: str, addresses: Iterable[str]) -> set[str]:
+        """
+        Get the subset of the given addresses that are members of an account
+        """
+        addresses = set(addresses)
+        if not addresses:
+            return set()
+        query = cls._account_members_query(account_address).filter(
+            Member.address.in_(addresses)
+        )
+        return {address for (address,) in query}
+
+    @classmethod
+    def filter_existing_accounts(cls, addresses: Iterable[str]) -> set[str]:
+        """
+        Get the subset of the given addresses that are addresses of accounts
+        """
+        addresses = set(addresses)
+        if not addresses:
+            return set()
+        query = db.session.query(Account.address).filter(Account.address.in_(addresses))
+        return {address for (address,) in query}
+
+    @classmethod
+    def get_account_addresses(cls) -> list[str]:
+        """
+        Get the addresses of all accounts in one query, without loading
+        the accounts
+        """
+        return list(db.session.execute(db.select(Account.address)).scalars())
+
+    @classmethod
+    def _account_members_query(cls, account_address: str):
+        """
+        Query the member addresses of an account through the association table
+        """
+        return (
+            db.session.query(Member.address)
+            .join(account_members, account_members.c.member_id == Member.id)
+            .join(Account, Account.id == account_members.c.account_id)
+            .filter(Account.address == account_address)
+        )
+
+    @classmethod
+    def recompute_member_counts(cls) -> int:
+        """
+        Recompute the denormalized member count of every account
+        from the account_members table.
+
+        Returns:
+            int: The number of accounts whose count was wrong and got repaired.
+        """
+        actual = (
+            db.select(db.func.count())
+            .where(account_members.c.account_id == Account.id)
+            .scalar_subquery()
+        )
+        with transactional():
+            result = db.session.execute(
+                db.update(Account)
+                .where(Account.member_count != actual)
+                .values(member_count=actual)
+                .execution_options(synchronize_session=False)
+            )
+        return result.rowcount
+
+    @classmethod
+    def get_account_access(cls, account_address: str) -> Optional[AccountAccess]:
+        """
+        Get the privacy flag and member addresses of an account.
+        The result is served from the access cache when possible, and
+        the member addresses are only loaded for private accounts.
+        """
+        cache = get_account_access_cache()
+        access = cache.get(account_address)
+        if access is not None:
+            return access
+        access = cls.load_account_access(account_address)
+        if access is not None:
+            cache.set(account_address, access)
+        return access
+
+    @classmethod
+    def load_account_access(cls, account_address: str) -> Optional[AccountAccess]:
+        """
+        Load the privacy flag and member addresses of an account from the
+        database, bypassing the access cache. For checks that must see the
+        changes made by the other processes right away.
+        """
+        account = (
+            db.session.query(Account.id, Account.is_private)
+            .filter_by(address=account_address)
+            .one_or_none()
+        )
         if not account:
-            return False
-        member = Member.query.filter_by(address=member_address).one_or_none()
-        if not member:
-            return False
-        return member in account.members
+            return None
+        members = frozenset()
+        if account.is_private:
+            members = frozenset(
+                address
+                for (address,) in db.session.query(Member.address)
+                .join(account_members, account_members.c.member_id == Member.id)
+                .filter(account_members.c.account_id == account.id)
+            )
+        return AccountAccess(is_private=bool(account.is_private), members=members)
@@ -1,31 +1,71 @@
+from typing import Optional
+
 from flask import current_app
 from flask_jwt_extended import create_access_token, create_refresh_token
 from starknet_py.hash.address import compute_address
-from starknet_py.utils.typed_data import TypedData
 
-from spherre.app.models import Member
+from spherre.app.models import Member, transactional
+from spherre.app.utils.nonce_store import get_nonce_store
 from spherre.app.utils.signature import SignatureUtils
+from spherre.app.utils.verification_pool import get_verification_pool
 
 
 class AuthService:
     @classmethod
-    def validate_signin_request(
-        cls, signatures: list[str], public_key: list[str]
-    ) -> bool:
+    def verify_signin(
+        cls, signatures: list[int], public_key: int, nonce: int
+    ) -> Optional[str]:
         """
-        Validate the Signed data that verifies the signin of the user.
-        The data is signed by the user's wallet and it's components
-        are sent for verification
+        Verify the signed login message and compute the address of the signer
+        in the verification pool, off the request worker.
+        The nonce of the challenge is checked before the costly verification
+        and consumed after it, so a signature can be used only once.
+
         Args:
-            signatures(list[str]): the signatures of the message
-            public_key: The public key of the signer.
+            signatures(list[int]): the signatures of the message
+            public_key(int): The public key of the signer.
+            nonce(int): The nonce of the signed sign in challenge.
 
         Returns:
-            bool: a bool representing whether the signature is valid or not.
+            str: The address of the signer, None if the signatures are invalid
+
+        Raises:
+            ValueError: If the nonce was not issued, expired or was consumed
+            VerificationPoolBusy: If the pool is saturated
+        """
+        config = current_app.config
+        nonce_store = get_nonce_store()
+        if not nonce_store.exists(nonce):
+            raise ValueError("Invalid or expired nonce")
+        address = get_verification_pool().verify_signin(
+            signatures,
+            public_key,
+            nonce,
+            SignatureUtils.login_message_domain(),
+            int(config["ACCOUNT_CLASS_HASH"], 16),
+        )
+        if address is None:
+            return None
+        # a concurrent sign in with the same signature may have consumed it
+        if not nonce_store.consume(nonce):
+            raise ValueError("Invalid or expired nonce")
+        return address
+
+    @classmethod
+    def create_signin_challenge(cls) -> dict:
+        """
+        Issue the nonce of a sign in challenge.
+        The nonce is signed in the login message and consumed by the sign in.
+
+        Returns:
+            dict: The nonce in hex and the seconds it stays valid
+
+        Raises:
+            NonceStoreFull: If the nonce store has no room for the nonce
         """
-        typed_data_dict = SignatureUtils.login_typed_data_format()
-        typed_data = TypedData(**typed_data_dict)
-        return SignatureUtils.verify_signatures(typed_data, signatures, public_key)
+        ttl = current_app.config["NONCE_TTL"]
+        nonce = get_nonce_store().issue(ttl)
+        return {"nonce": hex(nonce), "expires_in": ttl}
 
     @classmethod
     def generate_address_from_public_key(cls, public_key: str) -> str:
@@ -49,8 +89,9 @@ class AuthService:
         """
         Sign in a member
         """
-        member = Member.get_or_create(address=member_address)
-        member.save()
+        with transactional():
+            member = Member.get_or_create(address=member_address)
+            member.save()
         # generate a jwt token for the member
         token = create_access_token(identity=member_address, fresh=True)
         refresh_token = create_refresh_token(identity=member_address)
@@ -0,0 +1,206 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import and_, func
+
+from spherre.app.extensions import db
+from spherre.app.models import transactional
+from spherre.app.models.account import Member, account_members
+from spherre.app.models.notification import (
+    EmailOutbox,
+    EmailStatus,
+    Notification,
+    NotificationPreference,
+)
+from spherre.app.utils.email import Mailer, OutgoingEmail, get_mailer
+
+
+class EmailOutboxService:
+    """
+    Service queueing notification emails in the outbox and delivering them
+    in batches from the dispatcher.
+    """
+
+    @classmethod
+    def enqueue_notification(cls, notification_id: str) -> int:
+        """
+        Queue the email of a notification for every member of its account
+        with an email address and email notifications enabled.
+        The recipients are selected with a single query joining the members
+        of the account with their notification preferences.
+
+        Args:
+            notification_id: The ID of the notification to send
+
+        Returns:
+            int: The number of emails queued
+
+        Raises:
+            ValueError: If the notification or its account does not exist
+        """
+        notification = (
+            db.session.query(Notification).filter_by(id=notification_id).first()
+        )
+        if not notification:
+            raise ValueError("Notification not found")
+        if not notification.account:
+            raise ValueError("Notification has no associated account")
+
+        recipients = (
+            db.session.query(Member.email)
+            .join(account_members, account_members.c.member_id == Member.id)
+            .outerjoin(
+                NotificationPreference,
+                and_(
+                    NotificationPreference.member_id == Member.id,
+                    NotificationPreference.account_id == notification.account_id,
+                ),
+            )
+            .filter(
+                account_members.c.account_id == notification.account_id,
+                Member.email.isnot(None),
+                func.coalesce(NotificationPreference.email_enabled, True).is_(True),
+            )
+            .distinct()
+            .all()
+        )
+        if not recipients:
+            return 0
+        with transactional():
+            db.session.execute(
+                db.insert(EmailOutbox),
+                [
+                    {
+                        "notification_id": notification.id,
+                        "to_email": email,
+                        "subject": notification.title or "Notification",
+                        "message": notification.message,
+                    }
+                    for (email,) in recipients
+                ],
+            )
+        return len(recipients)
+
+    @classmethod
+    def dispatch_pending(cls, mailer: Optional[Mailer] = None) -> dict:
+        """
+        Deliver the due emails of the outbox.
+        Up to `EMAIL_DISPATCHER_CONNECTIONS` batches of `EMAIL_BATCH_SIZE`
+        emails are claimed, then each batch is sent through its own SMTP
+        connection in parallel.
+        Claiming an email counts an attempt and postpones it by the retry
+        backoff, so an email whose delivery was interrupted is retried later.
+        Failed emails are retried with an exponential backoff until
+        `EMAIL_MAX_ATTEMPTS` is reached.
+
+        Args:
+            mailer: The mailer to send with, defaults to the app mailer
+
+        Returns:
+            dict: The number of emails sent, postponed and failed for good
+        """
+        mailer = mailer or get_mailer()
+        config = current_app.config
+        batch_size = config["EMAIL_BATCH_SIZE"]
+        connections = config["EMAIL_DISPATCHER_CONNECTIONS"]
+        max_attempts = config["EMAIL_MAX_ATTEMPTS"]
+
+        emails, attempts = cls._claim(batch_size * connections)
+        stats = {"sent": 0, "retried": 0, "failed": 0}
+        if not emails:
+            return stats
+
+        batches = [
+            emails[i : i + batch_size] for i in range(0, len(emails), batch_size)
+        ]
+        results: dict[str, Optional[str]] = {}
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            for batch_results in pool.map(mailer.send_batch, batches):
+                results.update(batch_results)
+
+        now = datetime.now()
+        updates = []
+        for email in emails:
+            error = results.get(email.id, "Not sent")
+            if error is None:
+                update = {"status": EmailStatus.SENT, "sent_at": now}
+                stats["sent"] += 1
+            elif attempts[email.id] >= max_attempts:
+                update = {"status": EmailStatus.FAILED}
+                stats["failed"] += 1
+            else:
+                update = {"status": EmailStatus.PENDING}
+                stats["retried"] += 1
+            updates.append({"id": email.id, "last_error": error, **update})
+        with transactional():
+            db.session.execute(db.update(EmailOutbox), updates)
+        return stats
+
+    @classmethod
+    def _claim(cls, limit: int) -> tuple[list[OutgoingEmail], dict[str, int]]:
+        """
+        Claim the due pending emails, oldest first.
+        Rows locked by another dispatcher are skipped on Postgres.
+        Returns the claimed emails and their number of attempts.
+        """
+        now = datetime.now()
+        backoff = current_app.config["EMAIL_RETRY_BACKOFF"]
+        with transactional():
+            rows = (
+                EmailOutbox.query.filter(
+                    EmailOutbox.status == EmailStatus.PENDING,
+                    EmailOutbox.next_attempt_at <= now,
+                )
+                .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            emails = []
+            attempts = {}
+            for row in rows:
+                row.attempts += 1
+                row.next_attempt_at = now + timedelta(
+                    seconds=backoff * 2 ** (row.attempts - 1)
+                )
+                emails.append(
+                    OutgoingEmail(row.id, row.to_email, row.subject, row.message)
+                )
+                attempts[row.id] = row.attempts
+        return emails, attempts
+
+    @classmethod
+    def queue_metrics(cls) -> dict:
+        """
+        Get the depth of the outbox.
+
+        Returns:
+            dict: The number of pending and failed emails, the number of
+                pending emails due now and the age in seconds of the oldest
+                pending email
+        """
+        now = datetime.now()
+        pending, due, oldest = (
+            db.session.query(
+                func.count(EmailOutbox.id),
+                func.count(EmailOutbox.id).filter(EmailOutbox.next_attempt_at <= now),
+                func.min(EmailOutbox.created_at),
+            )
+            .filter(EmailOutbox.status == EmailStatus.PENDING)
+            .one()
+        )
+        failed = (
+            db.session.query(func.count(EmailOutbox.id))
+            .filter(EmailOutbox.status == EmailStatus.FAILED)
+            .scalar()
+        )
+        return {
+            "pending": pending,
+            "due": due,
+            "failed": failed,
+            "oldest_pending_seconds": (
+                (now - oldest).total_seconds() if oldest is not None else 0
+            ),
+        }
@@ -0,0 +1,62 @@
+from typing import Optional
+
+from spherre.app.extensions import db
+from spherre.app.models import transactional
+from spherre.app.models.indexer import IndexerCursor
+
+
+class IndexerService:
+    """
+    Service keeping track of the blocks persisted by the indexers.
+    """
+
+    @classmethod
+    def get_cursor(cls, indexer_id: str) -> Optional[int]:
+        """
+        Get the last block persisted by an indexer.
+
+        Args:
+            indexer_id: The id of the indexer
+
+        Returns:
+            int: The number of the block, None if no block was persisted yet
+        """
+        return (
+            db.session.query(IndexerCursor.block_number)
+            .filter(IndexerCursor.indexer_id == indexer_id)
+            .scalar()
+        )
+
+    @classmethod
+    def save_cursor(cls, indexer_id: str, block_number: int):
+        """
+        Record a block as persisted by an indexer.
+        Meant to run in the `transactional` scope writing the data of the
+        block, so the data and the cursor are committed together.
+        The cursor only moves forward, the update is conditional on the
+        stored block being older so two indexers cannot both apply a block.
+
+        Args:
+            indexer_id: The id of the indexer
+            block_number: The number of the persisted block
+
+        Raises:
+            ValueError: If the block, or a later one, was already persisted
+        """
+        with transactional():
+            updated = db.session.execute(
+                db.update(IndexerCursor)
+                .where(
+                    IndexerCursor.indexer_id == indexer_id,
+                    IndexerCursor.block_number < block_number,
+                )
+                .values(block_number=block_number)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if updated:
+                return
+            if cls.get_cursor(indexer_id) is not None:
+                raise ValueError("Block already persisted")
+            db.session.add(
+                IndexerCursor(indexer_id=indexer_id, block_number=block_number)
+            )
@@ -1,6 +1,8 @@
 from typing import Optional
 
+from spherre.app.models import transactional
 from spherre.app.models.account import Member
+from spherre.app.service.account import AccountService
 
 
 class MemberService:
@@ -16,13 +18,18 @@ class MemberService:
         cls, member_address: str, new_email: str
     ) -> Optional[Member]:
         """
-        Update the email of a member
+        Update the email of a member.
+        The email is part of the account and transaction responses, so the
+        accounts of the member are marked updated in the same transaction.
         """
         member = Member.query.filter_by(address=member_address).one_or_none()
         if not member:
             return None
-        member.email = new_email
-        member.save()
+        with transactional():
+            member.email = new_email
+            member.save()
+            for account in member.accounts:
+                AccountService.mark_account_updated(account.address, members=True)
         return member
 
     @classmethod
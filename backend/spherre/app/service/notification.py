@@ -1,7 +1,10 @@
+from datetime import datetime, timedelta
 from math import ceil
 from typing import List, Optional
 from uuid import uuid4
 
+from flask import current_app
+
 from spherre.app.extensions import db
 from spherre.app.models import (
     Account,
@@ -9,8 +12,21 @@ from spherre.app.models import (
     Notification,
     NotificationPreference,
     NotificationType,
+    transactional,
+)
+from spherre.app.models.account import account_members
+from spherre.app.models.base import insert_ignore
+from spherre.app.models.notification import (
+    EmailOutbox,
+    notification_inbox,
+    notification_readers,
+    notification_unread_counts,
+    notifications_archive,
 )
-from spherre.app.utils.email import mock_send_email
+from spherre.app.service.account import AccountService
+from spherre.app.service.email_outbox import EmailOutboxService
+from spherre.app.utils.events import publish_event
+from spherre.app.utils.pagination import decode_cursor, encode_cursor, keyset_after
 
 
 class NotificationService:
@@ -35,35 +51,151 @@ class NotificationService:
             title=title,
             message=message,
         )
-        new_notification.save()
+        address = cls._mark_account_updated(account_id)
+        if address:
+            publish_event(
+                address,
+                "notification.created",
+                lambda: {
+                    "id": new_notification.id,
+                    "notification_type": new_notification.notification_type.value,
+                    "title": new_notification.title,
+                    "message": new_notification.message,
+                    "created_at": new_notification.created_at.isoformat(),
+                },
+            )
+        with transactional():
+            db.session.add(new_notification)
+            db.session.flush()
+            cls._increment_unread_counts(account_id)
+            cls._fan_out(new_notification)
         return new_notification
 
     @classmethod
-    # -- 2. Send Notification to Members via Email --
-    def send_notification_to_members(
-        cls,
-        notification_id: str,
-    ):
+    def _fan_out(cls, notification: Notification):
         """
-        Send a notification to specified members using a mock email service.
+        Add a new notification to the inbox of every member of its account,
+        if the account has the inbox enabled
         """
-        notification = (
-            db.session.query(Notification).filter_by(id=notification_id).first()
+        db.session.execute(
+            db.insert(notification_inbox).from_select(
+                ["member_id", "notification_id", "account_id", "read", "created_at"],
+                db.select(
+                    account_members.c.member_id,
+                    db.literal(notification.id),
+                    account_members.c.account_id,
+                    db.false(),
+                    db.literal(notification.created_at, db.DateTime),
+                )
+                .join(Account, Account.id == account_members.c.account_id)
+                .where(
+                    account_members.c.account_id == notification.account_id,
+                    Account.inbox_enabled.is_(True),
+                ),
+            )
         )
-        if not notification:
-            raise ValueError("Notification not found")
 
-        account = notification.account
-        if not account:
-            raise ValueError("Notification has no associated account")
+    @classmethod
+    def backfill_inbox(cls, account_id: str, member_id: Optional[str] = None) -> int:
+        """
+        Copy the notifications of an account with the inbox enabled to the
+        inbox of its members, with their current read state.
+        Notifications already in an inbox are skipped.
+
+        Args:
+            account_id: The ID of the account
+            member_id: Only fill the inbox of this member
 
-        for member in account.members:
-            if member.email:
-                mock_send_email(
-                    to_email=member.email,
-                    subject=notification.title or "Notification",
-                    message=notification.message,
+        Returns:
+            int: The number of inbox rows created
+        """
+        conditions = [
+            account_members.c.account_id == account_id,
+            Account.inbox_enabled.is_(True),
+        ]
+        if member_id is not None:
+            conditions.append(account_members.c.member_id == member_id)
+        read = db.exists().where(
+            notification_readers.c.notification_id == Notification.id,
+            notification_readers.c.member_id == account_members.c.member_id,
+        )
+        return db.session.execute(
+            insert_ignore(notification_inbox).from_select(
+                ["member_id", "notification_id", "account_id", "read", "created_at"],
+                db.select(
+                    account_members.c.member_id,
+                    Notification.id,
+                    Notification.account_id,
+                    read,
+                    Notification.created_at,
                 )
+                .join(
+                    Notification,
+                    Notification.account_id == account_members.c.account_id,
+                )
+                .join(Account, Account.id == account_members.c.account_id)
+                .where(*conditions),
+            )
+        ).rowcount
+
+    @classmethod
+    def set_inbox_enabled(cls, account_address: str, enabled: bool) -> int:
+        """
+        Switch the unread listings of an account to or from the per-member
+        inbox. Enabling it backfills the inbox of every member first, in
+        the same transaction. Disabling it keeps the inbox rows.
+
+        Returns:
+            int: The number of inbox rows backfilled
+
+        Raises:
+            ValueError: If the account does not exist
+        """
+        account = Account.query.filter_by(address=account_address).one_or_none()
+        if not account:
+            raise ValueError("Account not found")
+        backfilled = 0
+        with transactional():
+            account.inbox_enabled = enabled
+            db.session.flush()
+            if enabled:
+                backfilled = cls.backfill_inbox(account.id)
+            AccountService.mark_account_updated(account_address)
+        return backfilled
+
+    @classmethod
+    def _increment_unread_counts(cls, account_id: str):
+        """
+        Count a new notification as unread for every member of its account
+        """
+        db.session.execute(
+            insert_ignore(notification_unread_counts).from_select(
+                ["account_id", "member_id", "count"],
+                db.select(
+                    account_members.c.account_id,
+                    account_members.c.member_id,
+                    db.literal(0),
+                ).where(account_members.c.account_id == account_id),
+            )
+        )
+        db.session.execute(
+            db.update(notification_unread_counts)
+            .where(notification_unread_counts.c.account_id == account_id)
+            .values(count=notification_unread_counts.c.count + 1)
+        )
+
+    @classmethod
+    # -- 2. Send Notification to Members via Email --
+    def send_notification_to_members(
+        cls,
+        notification_id: str,
+    ) -> int:
+        """
+        Queue the notification email of the account members who have email
+        notifications enabled. The emails are delivered by the dispatcher.
+        Returns the number of emails queued.
+        """
+        return EmailOutboxService.enqueue_notification(notification_id)
 
     @classmethod
     # -- 3. Mark Notification as Read --
@@ -76,16 +208,214 @@ class NotificationService:
         Mark a notification as read by a member.
         """
         notification = (
-            db.session.query(Notification).filter_by(id=notification_id).first()
+            db.session.query(Notification.id).filter_by(id=notification_id).first()
         )
-        member = db.session.query(Member).filter_by(id=member_id).first()
+        member = db.session.query(Member.id).filter_by(id=member_id).first()
 
         if not notification or not member:
             raise ValueError("Notification or Member not found")
 
-        if member not in notification.read_by:
-            notification.read_by.append(member)
-            db.session.commit()
+        cls.mark_notifications_as_read(member_id, notification_ids=[notification_id])
+
+    @classmethod
+    def mark_notifications_as_read(
+        cls,
+        member_id: str,
+        notification_ids: Optional[List[str]] = None,
+        up_to: Optional[datetime] = None,
+        account_id: Optional[str] = None,
+    ) -> int:
+        """
+        Mark many notifications as read by a member at once.
+        The read receipts are written with one INSERT ... SELECT into
+        notification_readers that skips the notifications the member has
+        already read, and the unread counters are decremented accordingly.
+
+        Args:
+            member_id: The ID of the member reading the notifications
+            notification_ids: The IDs of the notifications to mark as read
+            up_to: Mark the notifications created up to this time as read
+            account_id: Only mark the notifications of this account
+
+        Returns:
+            int: The number of notifications newly marked as read
+
+        Raises:
+            ValueError: If the member does not exist or neither
+                `notification_ids` nor `up_to` is given
+        """
+        if notification_ids is None and up_to is None:
+            raise ValueError("Either notification_ids or up_to is required")
+        if not db.session.query(Member.id).filter_by(id=member_id).first():
+            raise ValueError("Member not found")
+        if notification_ids is not None and not notification_ids:
+            return 0
+
+        conditions = [
+            ~db.exists().where(
+                notification_readers.c.notification_id == Notification.id,
+                notification_readers.c.member_id == member_id,
+            )
+        ]
+        if notification_ids is not None:
+            conditions.append(Notification.id.in_(notification_ids))
+        if up_to is not None:
+            if up_to.tzinfo is not None:
+                # created_at is stored as naive local time
+                up_to = up_to.astimezone().replace(tzinfo=None)
+            conditions.append(Notification.created_at <= up_to)
+        if account_id is not None:
+            conditions.append(Notification.account_id == account_id)
+
+        with transactional():
+            db.session.execute(
+                db.update(notification_inbox)
+                .where(
+                    notification_inbox.c.member_id == member_id,
+                    notification_inbox.c.read.is_(False),
+                    notification_inbox.c.notification_id.in_(
+                        db.select(Notification.id).where(*conditions)
+                    ),
+                )
+                .values(read=True)
+            )
+            unread_by_account = db.session.execute(
+                db.select(
+                    Notification.account_id,
+                    Account.address,
+                    db.func.count(Notification.id),
+                )
+                .outerjoin(Account, Account.id == Notification.account_id)
+                .where(*conditions)
+                .group_by(Notification.account_id, Account.address)
+            ).all()
+            if not unread_by_account:
+                return 0
+            db.session.execute(
+                insert_ignore(notification_readers).from_select(
+                    ["notification_id", "member_id"],
+                    db.select(Notification.id, db.literal(member_id)).where(
+                        *conditions
+                    ),
+                )
+            )
+
+            counters = notification_unread_counts.c
+            read = db.bindparam("read", type_=db.Integer)
+            db.session.execute(
+                db.update(notification_unread_counts)
+                .where(
+                    counters.account_id == db.bindparam("counter_account_id"),
+                    counters.member_id == member_id,
+                )
+                .values(
+                    count=db.case(
+                        (counters.count > read, counters.count - read), else_=0
+                    )
+                ),
+                [
+                    {"counter_account_id": account, "read": count}
+                    for account, _address, count in unread_by_account
+                ],
+            )
+            for _account, address, _count in unread_by_account:
+                if address:
+                    AccountService.mark_account_updated(address)
+        return sum(count for _account, _address, count in unread_by_account)
+
+    @classmethod
+    def _mark_account_updated(cls, account_id: str) -> Optional[str]:
+        """
+        Mark the account of a notification updated, see
+        `AccountService.mark_account_updated`.
+        Returns the address of the account.
+        """
+        address = db.session.query(Account.address).filter_by(id=account_id).scalar()
+        if address:
+            AccountService.mark_account_updated(address)
+        return address
+
+    @classmethod
+    def get_unread_count(cls, account_address: str, member_id: str) -> Optional[int]:
+        """
+        Get the number of notifications of an account a member has not read.
+        Returns None if the account does not exist.
+        """
+        count = (
+            db.session.query(notification_unread_counts.c.count)
+            .join(Account, Account.id == notification_unread_counts.c.account_id)
+            .filter(
+                Account.address == account_address,
+                notification_unread_counts.c.member_id == member_id,
+            )
+            .scalar()
+        )
+        if count is not None:
+            return count
+        exists = db.session.query(Account.id).filter_by(address=account_address)
+        return 0 if exists.first() else None
+
+    @classmethod
+    def reconcile_unread_counts(
+        cls, account_id: Optional[str] = None, member_id: Optional[str] = None
+    ) -> int:
+        """
+        Recompute the unread notification counts from the notifications and
+        notification_readers tables, creating the missing counters of the
+        account members.
+
+        Args:
+            account_id: Only reconcile the counters of this account
+            member_id: Only reconcile the counters of this member
+
+        Returns:
+            int: The number of counters that were wrong or missing
+        """
+
+        def actual(account_column, member_column):
+            return (
+                db.select(db.func.count(Notification.id))
+                .where(
+                    Notification.account_id == account_column,
+                    ~db.exists().where(
+                        notification_readers.c.notification_id == Notification.id,
+                        notification_readers.c.member_id == member_column,
+                    ),
+                )
+                .scalar_subquery()
+            )
+
+        counters = notification_unread_counts.c
+        counters_filter = []
+        members_filter = [db.true()]
+        if account_id is not None:
+            counters_filter.append(counters.account_id == account_id)
+            members_filter.append(account_members.c.account_id == account_id)
+        if member_id is not None:
+            counters_filter.append(counters.member_id == member_id)
+            members_filter.append(account_members.c.member_id == member_id)
+
+        counters_actual = actual(counters.account_id, counters.member_id)
+        members_actual = actual(
+            account_members.c.account_id, account_members.c.member_id
+        )
+        with transactional():
+            updated = db.session.execute(
+                db.update(notification_unread_counts)
+                .where(counters.count != counters_actual, *counters_filter)
+                .values(count=counters_actual)
+            ).rowcount
+            created = db.session.execute(
+                insert_ignore(notification_unread_counts).from_select(
+                    ["account_id", "member_id", "count"],
+                    db.select(
+                        account_members.c.account_id,
+                        account_members.c.member_id,
+                        members_actual,
+                    ).where(*members_filter),
+                )
+            ).rowcount
+        return updated + created
 
     @classmethod
     # -- 4. List Notifications by Account --
@@ -96,31 +426,264 @@ class NotificationService:
         per_page: int = 20,
         unread_only: bool = False,
         member_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
     ) -> tuple[List[Notification], dict]:
         """
         Retrieve all notifications for an account, optionally filter by unread status.
+        Notifications are ordered newest first by (created_at, id). Pages are
+        addressed either by `page` number or, when `cursor` is given, by
+        keyset position, which costs one index range scan whatever the depth.
+        An empty cursor addresses the first page. The returned `next_cursor`
+        addresses the page after the current one in both modes.
+
+        Raises:
+            ValueError: If the cursor is invalid
         """
 
         query = Notification.query.filter_by(account_id=account_id)
+        created_at, notification_id = Notification.created_at, Notification.id
         # Unread filter
         if unread_only and member_id:
-            query = query.filter(~Notification.read_by.any(Member.id == str(member_id)))
-        total = query.count()
-        pages = ceil(total / per_page) if per_page else 1
+            inbox_enabled = (
+                db.session.query(Account.inbox_enabled)
+                .filter_by(id=account_id)
+                .scalar()
+            )
+            if inbox_enabled:
+                query = query.join(
+                    notification_inbox,
+                    notification_inbox.c.notification_id == Notification.id,
+                ).filter(
+                    notification_inbox.c.member_id == str(member_id),
+                    notification_inbox.c.account_id == account_id,
+                    notification_inbox.c.read.is_(False),
+                )
+                # walk the inbox index rather than the notifications one
+                created_at = notification_inbox.c.created_at
+                notification_id = notification_inbox.c.notification_id
+            else:
+                query = query.filter(
+                    ~Notification.read_by.any(Member.id == str(member_id))
+                )
+        total = query.count() if include_total else None
+        pages = ceil(total / per_page) if include_total and per_page else None
 
-        notifications = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        ).items
+        if cursor:
+            last_created_at, last_id = cls._decode_notification_cursor(cursor)
+            query = query.filter(
+                keyset_after(
+                    created_at, notification_id, last_created_at, last_id, True
+                )
+            )
+        query = query.order_by(created_at.desc(), notification_id.desc())
+        if cursor is None:
+            query = query.offset((page - 1) * per_page)
+        # one extra row tells if there is a next page
+        rows = query.limit(per_page + 1).all()
+        notifications = rows[:per_page]
+        next_cursor = None
+        if len(rows) > per_page:
+            next_cursor = encode_cursor(
+                {
+                    "created_at": notifications[-1].created_at.isoformat(),
+                    "id": notifications[-1].id,
+                }
+            )
 
         pagination = {
             "total": total,
             "pages": pages,
-            "current_page": page,
+            "current_page": page if cursor is None else None,
             "per_page": per_page,
+            "next_cursor": next_cursor,
         }
 
         return notifications, pagination
 
+    @classmethod
+    def _decode_notification_cursor(cls, cursor: str) -> tuple[datetime, str]:
+        """
+        Get the (created_at, id) position of a notification cursor
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        payload = decode_cursor(cursor)
+        try:
+            return datetime.fromisoformat(payload["created_at"]), str(payload["id"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    @classmethod
+    def archive_notifications(
+        cls, older_than: datetime, archive: bool = True, chunk_size: int = 1000
+    ) -> int:
+        """
+        Move the notifications created before a date to the archive table,
+        or delete them.
+        Notifications are processed oldest first in chunks, each in its own
+        short transaction, so the job never holds locks on many rows for
+        long. The read receipts, inbox rows and unread counters of the
+        removed notifications are cleaned up in the same transactions.
+
+        Args:
+            older_than: Remove the notifications created before this date
+            archive: Copy the notifications to notifications_archive
+                before deleting them
+            chunk_size: Number of notifications removed per transaction
+
+        Returns:
+            int: The number of notifications removed
+        """
+        removed = 0
+        while True:
+            chunk = db.session.execute(
+                db.select(Notification.id, Notification.created_at)
+                .where(Notification.created_at < older_than)
+                .order_by(Notification.created_at, Notification.id)
+                .limit(chunk_size)
+            ).all()
+            if not chunk:
+                return removed
+            with transactional():
+                cls._remove_notifications(
+                    [notification_id for notification_id, _ in chunk],
+                    archive,
+                    {created_at for _, created_at in chunk},
+                )
+            removed += len(chunk)
+
+    @classmethod
+    def _remove_notifications(
+        cls, ids: List[str], archive: bool, created: set[datetime]
+    ):
+        """
+        Remove a chunk of notifications and everything referencing them
+        """
+        in_chunk = Notification.id.in_(ids)
+        if archive:
+            if (
+                current_app.config["NOTIFICATION_ARCHIVE_PARTITIONED"]
+                and db.session.get_bind().dialect.name == "postgresql"
+            ):
+                cls._create_archive_partitions(created)
+            columns = [
+                "id",
+                "created_at",
+                "account_id",
+                "notification_type",
+                "title",
+                "message",
+                "updated_at",
+                "archived_at",
+            ]
+            db.session.execute(
+                notifications_archive.insert().from_select(
+                    columns,
+                    db.select(
+                        Notification.id,
+                        Notification.created_at,
+                        Notification.account_id,
+                        Notification.notification_type,
+                        Notification.title,
+                        Notification.message,
+                        Notification.updated_at,
+                        db.literal(datetime.now(), db.DateTime),
+                    ).where(in_chunk),
+                )
+            )
+
+        # the members who had not read a removed notification count it
+        unread = db.session.execute(
+            db.select(
+                account_members.c.account_id,
+                account_members.c.member_id,
+                db.func.count(Notification.id),
+            )
+            .join(Notification, Notification.account_id == account_members.c.account_id)
+            .where(
+                in_chunk,
+                ~db.exists().where(
+                    notification_readers.c.notification_id == Notification.id,
+                    notification_readers.c.member_id == account_members.c.member_id,
+                ),
+            )
+            .group_by(account_members.c.account_id, account_members.c.member_id)
+        ).all()
+        if unread:
+            counters = notification_unread_counts.c
+            removed = db.bindparam("removed", type_=db.Integer)
+            db.session.execute(
+                db.update(notification_unread_counts)
+                .where(
+                    counters.account_id == db.bindparam("counter_account_id"),
+                    counters.member_id == db.bindparam("counter_member_id"),
+                )
+                .values(
+                    count=db.case(
+                        (counters.count > removed, counters.count - removed), else_=0
+                    )
+                ),
+                [
+                    {
+                        "counter_account_id": account_id,
+                        "counter_member_id": member_id,
+                        "removed": count,
+                    }
+                    for account_id, member_id, count in unread
+                ],
+            )
+
+        addresses = db.session.execute(
+            db.select(Account.address)
+            .join(Notification, Notification.account_id == Account.id)
+            .where(in_chunk)
+            .distinct()
+        ).scalars()
+        for address in addresses:
+            AccountService.mark_account_updated(address)
+
+        db.session.execute(
+            db.delete(notification_readers).where(
+                notification_readers.c.notification_id.in_(ids)
+            )
+        )
+        db.session.execute(
+            db.delete(notification_inbox).where(
+                notification_inbox.c.notification_id.in_(ids)
+            )
+        )
+        db.session.execute(
+            db.update(EmailOutbox)
+            .where(EmailOutbox.notification_id.in_(ids))
+            .values(notification_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            db.delete(Notification)
+            .where(in_chunk)
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def _create_archive_partitions(cls, created: set[datetime]):
+        """
+        Create the monthly partitions of notifications_archive holding
+        the given creation dates
+        """
+        for month in {(date.year, date.month) for date in created}:
+            start = datetime(*month, 1)
+            end = (start + timedelta(days=32)).replace(day=1)
+            db.session.execute(
+                db.text(
+                    f"CREATE TABLE IF NOT EXISTS "
+                    f"notifications_archive_{start:%Y_%m} "
+                    f"PARTITION OF notifications_archive "
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                )
+            )
+
     @classmethod
     # -- 5. Get Notification by ID --
     def get_notification_by_id(cls, notification_id: str) -> Optional[Notification]:
@@ -147,6 +710,7 @@ class NotificationService:
         return notification_preference
 
     @classmethod
+    @transactional()
     def toggle_member_email_notification_preference(
         cls,
         member_address: str,
@@ -5,7 +5,10 @@ from typing import List, Optional, Tuple
 from sqlalchemy.exc import IntegrityError
 
 from spherre.app.extensions import db
+from spherre.app.models import session_save, transactional
 from spherre.app.models.smart_lock import LockStatus, SmartLock
+from spherre.app.service.account import AccountService
+from spherre.app.utils.events import publish_event
 
 
 class SmartLockService:
@@ -58,19 +61,22 @@ class SmartLockService:
             raise ValueError("account_address cannot be empty")
 
         try:
-            smart_lock = SmartLock(
-                lock_id=lock_id,
-                token=token,
-                date_locked=date_locked,
-                token_amount=token_amount,
-                lock_duration=lock_duration,
-                account_address=account_address,
-            )
-            db.session.add(smart_lock)
-            db.session.commit()
+            with transactional():
+                smart_lock = SmartLock(
+                    lock_id=lock_id,
+                    token=token,
+                    date_locked=date_locked,
+                    token_amount=token_amount,
+                    lock_duration=lock_duration,
+                    account_address=account_address,
+                )
+                db.session.add(smart_lock)
+                AccountService.mark_account_updated(account_address)
+                # surface constraint violations here, inside an enclosing
+                # scope the commit happens later
+                db.session.flush()
             return smart_lock
         except IntegrityError as e:
-            db.session.rollback()
             raise ValueError(f"Failed to create SmartLock: {str(e)}")
 
     @classmethod
@@ -96,7 +102,13 @@ class SmartLockService:
             raise ValueError("new_status must be a valid LockStatus enum value")
 
         smart_lock.lock_status = new_status
-        db.session.commit()
+        AccountService.mark_account_updated(smart_lock.account_address)
+        publish_event(
+            smart_lock.account_address,
+            "smart_lock.status",
+            {"lock_id": smart_lock.lock_id, "lock_status": new_status.name},
+        )
+        session_save()
         return smart_lock
 
     @classmethod
@@ -1,14 +1,51 @@
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from math import ceil
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 from sqlalchemy import asc, desc
+from sqlalchemy.orm import selectinload
 
-from spherre.app.models import session_save
-from spherre.app.models.account import Account, Member
+from spherre.app.extensions import db
+from spherre.app.models import transactional
+from spherre.app.models.account import Account, Member, account_members
 from spherre.app.models.transaction import (
     Transaction,
     TransactionStatus,
     TransactionType,
+    approved_members,
+    rejected_members,
+)
+from spherre.app.service.account import AccountService
+from spherre.app.utils.events import publish_event
+from spherre.app.utils.pagination import decode_cursor, encode_cursor, keyset_after
+
+# Columns usable as the cursor pagination key with the functions
+# converting their values to and from the cursor payload
+KEYSET_SORT_COLUMNS = {
+    "date_created": (datetime.isoformat, datetime.fromisoformat),
+    "transaction_id": (int, int),
+    "status": (lambda status: status.name, lambda name: TransactionStatus[name]),
+    "tx_type": (lambda tx_type: tx_type.name, lambda name: TransactionType[name]),
+}
+
+
+class Vote(NamedTuple):
+    """
+    An approval (approve=True) or rejection of a transaction by a member
+    """
+
+    transaction_id: int
+    member: Member
+    approve: bool
+
+
+# Loader options fetching everything `TransactionSchema` dumps in a fixed
+# number of queries, whatever the page size
+TRANSACTION_LISTING_OPTIONS = (
+    selectinload(Transaction.proposer),
+    selectinload(Transaction.executor),
+    selectinload(Transaction.approvers),
+    selectinload(Transaction.rejectors),
 )
 
 
@@ -61,6 +98,8 @@ class TransactionService:
             date_created=date_proposed,
         )
 
+        AccountService.mark_account_updated(account.address)
+        cls._publish_status(account, transaction)
         transaction.save()
         return transaction
 
@@ -83,47 +122,7 @@ class TransactionService:
             ValueError: If the transaction doesn't exist or member is not valid
             ValueError: If the transaction is not in an approvable state
         """
-        if not isinstance(account, Account):
-            raise ValueError("account must be an Account instance")
-
-        if not isinstance(member, Member):
-            raise ValueError("member must be a Member instance")
-
-        # Find the transaction
-        transaction = Transaction.query.filter_by(
-            transaction_id=transaction_id, account_id=account.id
-        ).one_or_none()
-
-        if not transaction:
-            raise ValueError(
-                f"Transaction with ID {transaction_id} not found for this account"
-            )
-
-        # Verify member is part of the account
-        if member not in account.members:
-            raise ValueError("Member must belong to the account")
-
-        # Check if transaction is in an approvable state
-        if transaction.status != TransactionStatus.INITIATED:
-            raise ValueError(
-                f"Transaction is in {transaction.status} state and cannot be approved"
-            )
-
-        # Check if member is not already an approver
-        if member in transaction.approved.all():
-            raise ValueError("Member has already approved this transaction")
-
-        # Check if member is not the proposer (optional rule, depends on business logic)
-        if transaction.proposer_id == member.id:
-            raise ValueError(
-                "Transaction proposer cannot approve their own transaction"
-            )
-
-        # Add member to approved list
-        transaction.approved.append(member)
-
-        session_save()
-        return transaction
+        return cls.apply_votes(account, [Vote(transaction_id, member, True)])[0]
 
     @classmethod
     def execute_transaction(
@@ -177,7 +176,7 @@ class TransactionService:
             )
 
         # Check if enough approvals based on account threshold
-        approval_count = transaction.approved.count()
+        approval_count = transaction.approval_count
         if approval_count < account.threshold:
             raise ValueError(
                 (
@@ -191,6 +190,8 @@ class TransactionService:
         transaction.executor_id = executor.id
         transaction.date_executed = date_executed
 
+        AccountService.mark_account_updated(account.address)
+        cls._publish_status(account, transaction)
         transaction.save()
         return transaction
 
@@ -213,54 +214,245 @@ class TransactionService:
             ValueError: If the transaction doesn't exist or member is not valid
             ValueError: If the transaction is not in a rejectable state
         """
-        if not isinstance(account, Account):
-            raise ValueError("account must be an Account instance")
+        return cls.apply_votes(account, [Vote(transaction_id, member, False)])[0]
 
-        if not isinstance(member, Member):
-            raise ValueError("member must be a Member instance")
+    @classmethod
+    def apply_votes(
+        cls, account: Account, votes: Iterable[Tuple[int, Member, bool]]
+    ) -> List[Transaction]:
+        """
+        Apply many approvals and rejections to the transactions of an account
+        in a single transaction.
+        The account members, the voted transactions and their current
+        approvers and rejectors are each loaded with one query, the votes are
+        validated in order against those sets, then the approved_members and
+        rejected_members rows are written in bulk and committed once.
+        Either every vote is applied or none is.
 
-        # Find the transaction
-        transaction = Transaction.query.filter_by(
-            transaction_id=transaction_id, account_id=account.id
-        ).one_or_none()
+        Args:
+            account: Account associated with the transactions
+            votes: (transaction_id, member, approve) tuples, where `approve`
+                is True for an approval and False for a rejection
 
-        if not transaction:
-            raise ValueError(
-                f"Transaction with ID {transaction_id} not found for this account"
+        Returns:
+            List[Transaction]: The voted transactions, in order of first vote
+
+        Raises:
+            ValueError: If a vote would be rejected by `approve_transaction`
+                or `reject_transaction`
+        """
+        if not isinstance(account, Account):
+            raise ValueError("account must be an Account instance")
+
+        votes = [Vote(*vote) for vote in votes]
+        for vote in votes:
+            if not isinstance(vote.member, Member):
+                raise ValueError("member must be a Member instance")
+        if not votes:
+            return []
+
+        # a failed vote must not leave earlier status changes in the session
+        with transactional():
+            new_approvals, new_rejections, transactions = cls._validate_votes(
+                account, votes
             )
+            if new_approvals:
+                db.session.execute(approved_members.insert(), new_approvals)
+            if new_rejections:
+                db.session.execute(rejected_members.insert(), new_rejections)
+            cls._increment_vote_counts(new_approvals, new_rejections)
+            AccountService.mark_account_updated(account.address)
+            for transaction in transactions:
+                db.session.expire(transaction, ["approval_count", "rejection_count"])
+        return transactions
 
-        # Verify member is part of the account
-        if member not in account.members:
-            raise ValueError("Member must belong to the account")
+    @classmethod
+    def _validate_votes(
+        cls, account: Account, votes: List[Vote]
+    ) -> Tuple[List[dict], List[dict], List[Transaction]]:
+        """
+        Validate votes against the preloaded members and voters of the account.
+        Updates the status of the transactions rejected by the votes.
 
-        # Check if transaction is in a rejectable state
-        if transaction.status not in [
-            TransactionStatus.INITIATED,
-            TransactionStatus.APPROVED,
-        ]:
-            raise ValueError(
-                f"Transaction is in {transaction.status} state and cannot be rejected"
+        Returns:
+            The approved_members rows, the rejected_members rows and
+            the voted transactions.
+        """
+        member_ids = set(
+            db.session.scalars(
+                db.select(account_members.c.member_id).where(
+                    account_members.c.account_id == account.id
+                )
+            )
+        )
+        transactions = {
+            transaction.transaction_id: transaction
+            for transaction in Transaction.query.filter(
+                Transaction.account_id == account.id,
+                Transaction.transaction_id.in_({vote.transaction_id for vote in votes}),
             )
+        }
+        ids = [transaction.id for transaction in transactions.values()]
+        approvals = cls._select_votes(approved_members, ids)
+        rejections = cls._select_votes(rejected_members, ids)
+
+        new_approvals = []
+        new_rejections = []
+        rejection_counts = {}
+        voted = {}
+        for transaction_id, member, approve in votes:
+            # Find the transaction
+            transaction = transactions.get(transaction_id)
+            if not transaction:
+                raise ValueError(
+                    f"Transaction with ID {transaction_id} not found for this account"
+                )
 
-        # Check if member is not already a rejector
-        if member in transaction.rejected.all():
-            raise ValueError("Member has already rejected this transaction")
+            # Verify member is part of the account
+            if member.id not in member_ids:
+                raise ValueError("Member must belong to the account")
+
+            key = (transaction.id, member.id)
+            row = {"transaction_id": transaction.id, "member_id": member.id}
+            if approve:
+                # Check if transaction is in an approvable state
+                if transaction.status != TransactionStatus.INITIATED:
+                    raise ValueError(
+                        f"Transaction is in {transaction.status} state "
+                        "and cannot be approved"
+                    )
+
+                # Check if member is not already an approver
+                if key in approvals:
+                    raise ValueError("Member has already approved this transaction")
+
+                # Check if member is not the proposer
+                # (optional rule, depends on business logic)
+                if transaction.proposer_id == member.id:
+                    raise ValueError(
+                        "Transaction proposer cannot approve their own transaction"
+                    )
+                approvals.add(key)
+                new_approvals.append(row)
+            else:
+                # Check if transaction is in a rejectable state
+                if transaction.status not in [
+                    TransactionStatus.INITIATED,
+                    TransactionStatus.APPROVED,
+                ]:
+                    raise ValueError(
+                        f"Transaction is in {transaction.status} state "
+                        "and cannot be rejected"
+                    )
+
+                # Check if member is not already a rejector
+                if key in rejections:
+                    raise ValueError("Member has already rejected this transaction")
+                rejections.add(key)
+                new_rejections.append(row)
+
+                # If enough rejections (e.g., more than a certain threshold),
+                # update status. This is business logic that should be
+                # clarified with requirements.
+                # Example: if more than half of members reject,
+                # transaction is considered rejected
+                rejection_count = (
+                    rejection_counts.get(transaction.id, transaction.rejection_count)
+                    + 1
+                )
+                rejection_counts[transaction.id] = rejection_count
+                if rejection_count > account.member_count / 2:
+                    transaction.status = TransactionStatus.REJECTED
+                    cls._publish_status(account, transaction)
+            voted.setdefault(transaction.id, transaction)
+        return new_approvals, new_rejections, list(voted.values())
 
-        # Add member to rejected list
-        transaction.rejected.append(member)
+    @classmethod
+    def _publish_status(cls, account: Account, transaction: Transaction):
+        """
+        Publish the status of a transaction on the event stream of its account
+        """
+        publish_event(
+            account.address,
+            "transaction.status",
+            {
+                "transaction_id": transaction.transaction_id,
+                "status": transaction.status.value,
+            },
+        )
 
-        # If enough rejections (e.g., more than a certain threshold), update status
-        # This is business logic that should be clarified with requirements
-        rejection_count = transaction.rejected.count()
-        member_count = len(account.members)
+    @classmethod
+    def _select_votes(cls, table, transaction_ids: list[str]) -> set[tuple]:
+        """
+        Get the (transaction id, member id) pairs of a vote association table
+        """
+        if not transaction_ids:
+            return set()
+        rows = db.session.execute(
+            db.select(table.c.transaction_id, table.c.member_id).where(
+                table.c.transaction_id.in_(transaction_ids)
+            )
+        )
+        return {tuple(row) for row in rows}
 
-        # Example: if more than half of members reject,
-        # transaction is considered rejected
-        if rejection_count > member_count / 2:
-            transaction.status = TransactionStatus.REJECTED
+    @classmethod
+    def _increment_vote_counts(cls, new_approvals: list, new_rejections: list):
+        """
+        Add the votes written with Core to the denormalized vote counters
+        """
+        increments = {}
+        for index, rows in enumerate((new_approvals, new_rejections)):
+            for row in rows:
+                counts = increments.setdefault(row["transaction_id"], [0, 0])
+                counts[index] += 1
+        if not increments:
+            return
+        table = Transaction.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == db.bindparam("row_id"))
+            .values(
+                approval_count=table.c.approval_count + db.bindparam("approvals"),
+                rejection_count=table.c.rejection_count + db.bindparam("rejections"),
+            ),
+            [
+                {"row_id": row_id, "approvals": approvals, "rejections": rejections}
+                for row_id, (approvals, rejections) in increments.items()
+            ],
+        )
 
-        session_save()
-        return transaction
+    @classmethod
+    def recompute_vote_counts(cls) -> int:
+        """
+        Recompute the denormalized approval and rejection counts of every
+        transaction from the approved_members and rejected_members tables.
+
+        Returns:
+            int: The number of transactions whose counts got repaired.
+        """
+        approvals = (
+            db.select(db.func.count())
+            .where(approved_members.c.transaction_id == Transaction.id)
+            .scalar_subquery()
+        )
+        rejections = (
+            db.select(db.func.count())
+            .where(rejected_members.c.transaction_id == Transaction.id)
+            .scalar_subquery()
+        )
+        with transactional():
+            result = db.session.execute(
+                db.update(Transaction)
+                .where(
+                    db.or_(
+                        Transaction.approval_count != approvals,
+                        Transaction.rejection_count != rejections,
+                    )
+                )
+                .values(approval_count=approvals, rejection_count=rejections)
+                .execution_options(synchronize_session=False)
+            )
+        return result.rowcount
 
     @classmethod
     def get_transaction(
@@ -335,8 +527,24 @@ class TransactionService:
         date_to: Optional[datetime] = None,
         sort_by: str = "date_created",
         sort_order: str = "desc",
+        cursor: Optional[str] = None,
+        include_total: bool = True,
     ) -> Dict[str, Any]:
-        query = Transaction.query.filter_by(account_id=account.id)
+        """
+        Retrieve a page of the account transactions.
+
+        Pages are addressed either by `page` number or, when `cursor` is given,
+        by keyset position on (sort column, id). Cursor pages cost one range
+        scan whatever their depth; the returned `next_cursor` addresses the
+        page after the current one in both modes, and is None on the last page.
+
+        Raises:
+            ValueError: If the cursor is invalid or the sort column does not
+                support cursor pagination
+        """
+        query = Transaction.query.filter_by(account_id=account.id).options(
+            *TRANSACTION_LISTING_OPTIONS
+        )
 
         # Apply filters
         if tx_type:
@@ -358,24 +566,113 @@ class TransactionService:
         if date_to:
             query = query.filter(Transaction.date_created <= date_to)
 
+        if cursor is not None:
+            return cls._get_transactions_after_cursor(
+                query,
+                per_page=per_page,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                cursor=cursor,
+                include_total=include_total,
+            )
+
         # Sorting
         sort_column = getattr(Transaction, sort_by, Transaction.date_created)
         if sort_order == "asc":
-            query = query.order_by(asc(sort_column))
+            query = query.order_by(asc(sort_column), asc(Transaction.id))
         else:
-            query = query.order_by(desc(sort_column))
+            query = query.order_by(desc(sort_column), desc(Transaction.id))
 
         # Pagination
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        total = query.order_by(None).count() if include_total else None
+        # one extra row tells if there is a next page
+        rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_next = len(rows) > per_page
+        next_cursor = None
+        if has_next and sort_by in KEYSET_SORT_COLUMNS:
+            next_cursor = cls._encode_transaction_cursor(items[-1], sort_by, sort_order)
 
         return {
-            "items": pagination.items,
+            "items": items,
             "pagination": {
-                "page": pagination.page,
-                "per_page": pagination.per_page,
-                "total": pagination.total,
-                "total_pages": pagination.pages,
-                "has_next": pagination.has_next,
-                "has_prev": pagination.has_prev,
+                "page": page,
+                "per_page": per_page,
+                "total": total,
+                "total_pages": ceil(total / per_page) if include_total else None,
+                "has_next": has_next,
+                "has_prev": page > 1,
+                "next_cursor": next_cursor,
             },
         }
+
+    @classmethod
+    def _get_transactions_after_cursor(
+        cls,
+        query,
+        *,
+        per_page: int,
+        sort_by: str,
+        sort_order: str,
+        cursor: str,
+        include_total: bool,
+    ) -> Dict[str, Any]:
+        """
+        Keyset pagination of a filtered transaction query
+        """
+        if sort_by not in KEYSET_SORT_COLUMNS:
+            raise ValueError(f"Cursor pagination is not supported for '{sort_by}'")
+        sort_column = getattr(Transaction, sort_by)
+        descending = sort_order != "asc"
+        total = query.order_by(None).count() if include_total else None
+
+        if cursor:
+            payload = decode_cursor(cursor)
+            if payload.get("sort_by") != sort_by or payload.get("desc") != descending:
+                raise ValueError("Cursor does not match the requested sort order")
+            try:
+                sort_value = KEYSET_SORT_COLUMNS[sort_by][1](payload["value"])
+                last_id = str(payload["id"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+            query = query.filter(
+                keyset_after(
+                    sort_column, Transaction.id, sort_value, last_id, descending
+                )
+            )
+
+        order = desc if descending else asc
+        rows = (
+            query.order_by(order(sort_column), order(Transaction.id))
+            .limit(per_page + 1)
+            .all()
+        )
+        items = rows[:per_page]
+        has_next = len(rows) > per_page
+        next_cursor = None
+        if has_next:
+            next_cursor = cls._encode_transaction_cursor(items[-1], sort_by, sort_order)
+
+        return {
+            "items": items,
+            "pagination": {
+                "per_page": per_page,
+                "total": total,
+                "has_next": has_next,
+                "next_cursor": next_cursor,
+            },
+        }
+
+    @classmethod
+    def _encode_transaction_cursor(
+        cls, transaction: Transaction, sort_by: str, sort_order: str
+    ) -> str:
+        dump = KEYSET_SORT_COLUMNS[sort_by][0]
+        return encode_cursor(
+            {
+                "sort_by": sort_by,
+                "desc": sort_order != "asc",
+                "value": dump(getattr(transaction, sort_by)),
+                "id": transaction.id,
+            }
+        )
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+from flask import current_app
+
+
+class AccountAccess(NamedTuple):
+    """
+    The access-control view of an account used by the private account gate.
+
+    Data:
+        is_private: Whether the account is private
+        members: The addresses of the account members. Only populated
+            for private accounts since public accounts are not gated.
+    """
+
+    is_private: bool
+    members: frozenset
+
+
+class AccountAccessCache:
+    """
+    In-process TTL cache mapping an account address to its `AccountAccess`,
+    bounded to `max_entries` accounts with least recently used eviction.
+
+    Entries expire after `ttl` seconds and are explicitly invalidated by the
+    account service whenever the privacy flag or the member set changes.
+    Only the process making the change invalidates its entry, the other
+    processes keep serving it until it expires, so `ttl` bounds how long a
+    removed member keeps access there.
+    Hit/miss counters are kept so the effectiveness of the cache can be
+    inspected through `stats()`.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 5,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, AccountAccess]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, account_address: str) -> Optional[AccountAccess]:
+        """
+        Get the cached access entry of an account.
+        Returns None when the entry is missing or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(account_address)
+            if entry is not None:
+                expires_at, access = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(account_address)
+                    self.hits += 1
+                    return access
+                del self._entries[account_address]
+            self.misses += 1
+            return None
+
+    def set(self, account_address: str, access: AccountAccess):
+        """
+        Cache the access entry of an account.
+        """
+        with self._lock:
+            self._entries[account_address] = (self._clock() + self.ttl, access)
+            self._entries.move_to_end(account_address)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, account_address: str):
+        """
+        Drop the cached access entry of an account.
+        """
+        with self._lock:
+            if self._entries.pop(account_address, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Drop all cached entries and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Get the hit/miss counters of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+
+def get_account_access_cache() -> AccountAccessCache:
+    """
+    Get the access cache of the current application
+    """
+    return current_app.extensions["account_access_cache"]
@@ -1,2 +1,139 @@
+import smtplib
+from email.message import EmailMessage
+from typing import NamedTuple, Optional
+
+from flask import current_app
+
+
 def mock_send_email(to_email: str, subject: str, message: str):
     print(f"[Email sent] To: {to_email} | Subject: {subject} | Message: {message}")
+
+
+class OutgoingEmail(NamedTuple):
+    """
+    An email handed to a mailer.
+
+    Data:
+        id: Id of the outbox row of the email
+        to_email: Recipient address
+        subject: Subject of the email
+        message: Plain text body of the email
+    """
+
+    id: str
+    to_email: str
+    subject: str
+    message: str
+
+
+class Mailer:
+    """
+    Interface of the email delivery backends.
+    """
+
+    def send_batch(self, emails: list[OutgoingEmail]) -> dict[str, Optional[str]]:
+        """
+        Send a batch of emails over a single connection.
+
+        Returns:
+            dict: The error of each email by id, None for delivered emails
+        """
+        raise NotImplementedError
+
+
+class MockMailer(Mailer):
+    """
+    Mailer printing the emails instead of sending them.
+    """
+
+    def send_batch(self, emails: list[OutgoingEmail]) -> dict[str, Optional[str]]:
+        for email in emails:
+            mock_send_email(email.to_email, email.subject, email.message)
+        return {email.id: None for email in emails}
+
+
+class SMTPMailer(Mailer):
+    """
+    Mailer sending each batch through one SMTP connection.
+
+    Args:
+        host: SMTP server host
+        port: SMTP server port
+        sender: The From address of the emails
+        username: Login of the SMTP server, if it requires authentication
+        password: Password of the SMTP server
+        use_tls: Whether to upgrade the connection with STARTTLS
+        timeout: Socket timeout in seconds
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        sender: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        timeout: float = 30,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send_batch(self, emails: list[OutgoingEmail]) -> dict[str, Optional[str]]:
+        results: dict[str, Optional[str]] = {}
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.use_tls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password)
+                for email in emails:
+                    try:
+                        smtp.send_message(self._build_message(email))
+                        results[email.id] = None
+                    except smtplib.SMTPRecipientsRefused as e:
+                        results[email.id] = str(e)
+        except (smtplib.SMTPException, OSError) as e:
+            # the connection failed, every email not sent yet failed with it
+            for email in emails:
+                results.setdefault(email.id, str(e))
+        return results
+
+    def _build_message(self, email: OutgoingEmail) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = email.to_email
+        message["Subject"] = email.subject
+        message.set_content(email.message)
+        return message
+
+
+def create_mailer(config: dict) -> Mailer:
+    """
+    Create the mailer selected by `EMAIL_BACKEND`
+    """
+    backend = config.get("EMAIL_BACKEND")
+    if not backend or backend == "mock":
+        return MockMailer()
+    if backend == "smtp":
+        return SMTPMailer(
+            host=config["EMAIL_SMTP_HOST"],
+            port=config["EMAIL_SMTP_PORT"],
+            sender=config["EMAIL_SENDER"],
+            username=config.get("EMAIL_SMTP_USERNAME"),
+            password=config.get("EMAIL_SMTP_PASSWORD"),
+            use_tls=config.get("EMAIL_SMTP_USE_TLS", False),
+        )
+    raise ValueError(f"Unknown email backend '{backend}'")
+
+
+def get_mailer() -> Mailer:
+    """
+    Get the mailer of the current application
+    """
+    return current_app.extensions["mailer"]
@@ -0,0 +1,329 @@
+import itertools
+import json
+import select
+import threading
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from flask import current_app, has_app_context
+from loguru import logger
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from spherre.app.extensions import db
+
+
+class Subscription:
+    """
+    The queue of events published to a channel for one subscriber.
+    An idle subscription is only a bounded deque and an unset
+    `threading.Event`: nothing polls it until an event is published.
+    When the subscriber falls behind, the oldest events are dropped.
+    """
+
+    def __init__(self, channel: str, max_queue: int):
+        self.channel = channel
+        self._events: deque = deque(maxlen=max_queue)
+        self._ready = threading.Event()
+
+    def put(self, event: dict):
+        self._events.append(event)
+        self._ready.set()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Get the next event, waiting up to `timeout` seconds for one.
+        Returns None if no event was published in time.
+        """
+        while True:
+            try:
+                return self._events.popleft()
+            except IndexError:
+                pass
+            if not self._ready.wait(timeout):
+                return None
+            self._ready.clear()
+
+
+class EventBus:
+    """
+    In-process publish/subscribe bus delivering committed events to the
+    subscriptions of this worker.
+
+    Args:
+        max_queue: Number of undelivered events kept per subscription
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(channel, self.max_queue)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel: str, event: dict):
+        """
+        Deliver an event to the subscriptions of a channel in this worker
+        """
+        event = {**event, "id": next(self._ids)}
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscriptions.values())
+
+    def before_commit(self, session: Session, events: list[tuple[str, dict]]):
+        """
+        Called with the events of a transaction before it commits
+        """
+
+    def after_commit(self, events: list[tuple[str, dict]]):
+        """
+        Called with the events of a transaction once it has committed
+        """
+        for channel, data in events:
+            self.publish(channel, data)
+
+
+class PostgresEventBus(EventBus):
+    """
+    Event bus fanning events out to every worker through Postgres
+    LISTEN/NOTIFY.
+    Events are sent with `pg_notify` inside the writing transaction, so
+    Postgres only delivers them once it commits. Each worker runs a thread
+    listening on a dedicated connection, started on the first subscription,
+    which hands the notifications to its local subscriptions.
+    NOTIFY payloads are limited to 8000 bytes: larger events are sent
+    without their long fields and marked `truncated`, for subscribers to
+    fetch them instead. A failed notification never fails the write, the
+    event is only lost.
+
+    Args:
+        dsn: Connection string of the database, e.g. `DATABASE_URL`
+        channel: The Postgres notification channel
+        poll_interval: Seconds between checks that the listener should stop
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str = "spherre_events",
+        max_queue: int = 100,
+        poll_interval: float = 5,
+    ):
+        try:
+            import psycopg2
+        except ImportError:
+            raise RuntimeError("The psycopg2 package is required for the postgres bus")
+        super().__init__(max_queue=max_queue)
+        self._psycopg2 = psycopg2
+        # psycopg2 does not understand the "+driver" part of SQLAlchemy urls
+        self.dsn = make_url(dsn).set(drivername="postgresql").render_as_string(False)
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._listener: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def subscribe(self, channel: str) -> Subscription:
+        self._start_listener()
+        return super().subscribe(channel)
+
+    def before_commit(self, session: Session, events: list[tuple[str, dict]]):
+        notify(session, self.channel, events)
+
+    def after_commit(self, events: list[tuple[str, dict]]):
+        # delivered by the listener, including to this worker
+        pass
+
+    def stop(self):
+        self._stopped.set()
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._stopped.clear()
+            self._listener = threading.Thread(
+                target=self._listen, name="spherre-event-listener", daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self):
+        try:
+            connection = self._psycopg2.connect(self.dsn)
+        except Exception as e:
+            logger.error(f"Event listener could not connect: {e}")
+            return
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while not self._stopped.is_set():
+                if select.select([connection], [], [], self.poll_interval)[0]:
+                    connection.poll()
+                    while connection.notifies:
+                        self._dispatch(connection.notifies.pop(0).payload)
+        except Exception as e:
+            logger.error(f"Event listener stopped: {e}")
+        finally:
+            connection.close()
+
+    def _dispatch(self, payload: str):
+        try:
+            message = json.loads(payload)
+            self.publish(message["channel"], message["event"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed event notification: {payload}")
+
+
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_NOTIFY_PAYLOAD = 7999
+# longer string fields are dropped from truncated events, addresses are kept
+MAX_TRUNCATED_FIELD = 100
+
+
+def notify_payload(channel: str, event: dict) -> str:
+    """
+    Build the NOTIFY payload of an event, truncated to fit the payload limit.
+
+    Args:
+        channel: The channel of the event
+        event: The event, with its type and data
+
+    Returns:
+        str: The JSON payload
+    """
+    payload = json.dumps({"channel": channel, "event": event}, default=str)
+    if len(payload.encode()) <= MAX_NOTIFY_PAYLOAD:
+        return payload
+    data = event.get("data")
+    if isinstance(data, dict):
+        data = {
+            key: value
+            for key, value in data.items()
+            if not isinstance(value, (str, dict, list))
+            or (isinstance(value, str) and len(value) <= MAX_TRUNCATED_FIELD)
+        }
+    truncated = {"type": event.get("type"), "data": data, "truncated": True}
+    payload = json.dumps({"channel": channel, "event": truncated}, default=str)
+    if len(payload.encode()) <= MAX_NOTIFY_PAYLOAD:
+        return payload
+    truncated["data"] = {}
+    return json.dumps({"channel": channel, "event": truncated}, default=str)
+
+
+def notify(session: Session, pg_channel: str, events: list[tuple[str, dict]]):
+    """
+    Send events with `pg_notify` in the transaction of a session. The
+    notifications run in a savepoint, so a failure is logged and rolled
+    back without failing the transaction.
+
+    Args:
+        session: The session about to commit
+        pg_channel: The Postgres notification channel
+        events: The (channel, event) pairs to send
+    """
+    connection = session.connection()
+    for channel, data in events:
+        try:
+            with connection.begin_nested():
+                connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": pg_channel, "payload": notify_payload(channel, data)},
+                )
+        except Exception as e:
+            logger.error(f"Could not notify event on {channel}: {e}")
+
+
+def create_event_bus(config: dict) -> EventBus:
+    """
+    Create the event bus selected by `EVENT_BUS_BACKEND`
+    """
+    backend = config.get("EVENT_BUS_BACKEND")
+    max_queue = config["EVENT_SUBSCRIBER_QUEUE_SIZE"]
+    if not backend or backend == "memory":
+        return EventBus(max_queue=max_queue)
+    if backend == "postgres":
+        dsn = config.get("EVENT_BUS_URL") or config["SQLALCHEMY_DATABASE_URI"]
+        return PostgresEventBus(dsn, max_queue=max_queue)
+    raise ValueError(f"Unknown event bus backend '{backend}'")
+
+
+def get_event_bus() -> EventBus:
+    """
+    Get the event bus of the current application
+    """
+    return current_app.extensions["event_bus"]
+
+
+def account_channel(account_address: str) -> str:
+    """
+    Channel of the events of an account
+    """
+    return f"account:{account_address}"
+
+
+def publish_event(
+    account_address: str, event_type: str, data: Callable[[], dict] | dict
+):
+    """
+    Publish an event on the channel of an account once the current
+    transaction commits. Events are dropped if it is rolled back.
+
+    Args:
+        account_address: Address of the account the event belongs to
+        event_type: Name of the event, e.g. "notification.created"
+        data: The event data, or a function building it. Functions are
+            called right before the commit, once the session is flushed,
+            so they can read generated columns.
+    """
+    db.session.info.setdefault("pending_events", []).append(
+        (account_channel(account_address), event_type, data)
+    )
+
+
+def _resolve(pending: Iterable[tuple]) -> list[tuple[str, dict]]:
+    return [
+        (channel, {"type": event_type, "data": data() if callable(data) else data})
+        for channel, event_type, data in pending
+    ]
+
+
+@event.listens_for(Session, "before_commit")
+def _prepare_events(session: Session):
+    if not session.info.get("pending_events") or not has_app_context():
+        return
+    session.flush()
+    events = _resolve(session.info.pop("pending_events"))
+    get_event_bus().before_commit(session, events)
+    session.info["committed_events"] = events
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_events(session: Session):
+    events = session.info.pop("committed_events", None)
+    if events and has_app_context():
+        get_event_bus().after_commit(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_events(session: Session):
+    session.info.pop("pending_events", None)
+    session.info.pop("committed_events", None)
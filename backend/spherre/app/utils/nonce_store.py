@@ -0,0 +1,196 @@
+import math
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from flask import current_app
+
+# nonces are felts of the signed login message, 128 bits keep them well
+# below the field prime and unguessable
+NONCE_BITS = 128
+
+
+def generate_nonce() -> int:
+    return secrets.randbits(NONCE_BITS)
+
+
+class NonceStoreFull(Exception):
+    """
+    Raised when the nonce store has no room left for a new nonce
+
+    Args:
+        retry_after: Seconds until the oldest nonce expires
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many sign in challenges, retry later")
+        self.retry_after = retry_after
+
+
+class NonceStore:
+    """
+    Interface of the storage of the sign in challenge nonces.
+    A nonce is valid from its issue until it is consumed or expires, and
+    can be consumed only once.
+    """
+
+    def issue(self, ttl: int) -> int:
+        """
+        Issue a new nonce valid for `ttl` seconds
+        """
+        raise NotImplementedError
+
+    def exists(self, nonce: int) -> bool:
+        """
+        Check whether a nonce is issued and not yet consumed nor expired
+        """
+        raise NotImplementedError
+
+    def consume(self, nonce: int) -> bool:
+        """
+        Consume a nonce atomically.
+        Returns True for only one of concurrent consumers of a valid nonce.
+        """
+        raise NotImplementedError
+
+
+class MemoryNonceStore(NonceStore):
+    """
+    In-process nonce store bounded to `max_entries` nonces.
+    Nonces are kept in issue order, which is also their expiry order since
+    they all share the same TTL, so expired nonces are purged from the
+    front in constant time per nonce. When the store is full of unexpired
+    nonces new challenges are refused with `NonceStoreFull`, live nonces are
+    never evicted so a flood of challenges cannot cancel the sign in of
+    other clients.
+    """
+
+    def __init__(
+        self, max_entries: int = 100000, clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[int, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.consumed = 0
+        self.expired = 0
+        self.rejected = 0
+
+    def issue(self, ttl: int) -> int:
+        """
+        Issue a new nonce valid for `ttl` seconds
+
+        Raises:
+            NonceStoreFull: If the store is full of unexpired nonces
+        """
+        nonce = generate_nonce()
+        with self._lock:
+            now = self._clock()
+            self._purge(now)
+            if len(self._entries) >= self.max_entries:
+                self.rejected += 1
+                oldest_expires_at = next(iter(self._entries.values()))
+                raise NonceStoreFull(max(math.ceil(oldest_expires_at - now), 1))
+            self._entries[nonce] = now + ttl
+            self.issued += 1
+        return nonce
+
+    def exists(self, nonce: int) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(nonce)
+            return expires_at is not None and expires_at > self._clock()
+
+    def consume(self, nonce: int) -> bool:
+        with self._lock:
+            expires_at = self._entries.pop(nonce, None)
+            if expires_at is None:
+                return False
+            if expires_at <= self._clock():
+                self.expired += 1
+                return False
+            self.consumed += 1
+            return True
+
+    def stats(self) -> dict:
+        """
+        Get the counters of the store
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "issued": self.issued,
+                "consumed": self.consumed,
+                "expired": self.expired,
+                "rejected": self.rejected,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _purge(self, now: float):
+        while self._entries:
+            nonce, expires_at = next(iter(self._entries.items()))
+            if expires_at > now:
+                return
+            self._entries.popitem(last=False)
+            self.expired += 1
+
+
+class RedisNonceStore(NonceStore):
+    """
+    Nonce store for any server speaking the Redis protocol.
+    Each nonce is a key expiring with its TTL, consuming it deletes the
+    key so only the consumer that removed it succeeds.
+
+    Args:
+        client: A redis-py compatible client
+        prefix: Prefix of every key written by the store
+    """
+
+    def __init__(self, client, prefix: str = "spherre:nonce:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisNonceStore":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for the redis store")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def issue(self, ttl: int) -> int:
+        nonce = generate_nonce()
+        self.client.set(self._key(nonce), b"1", ex=ttl)
+        return nonce
+
+    def exists(self, nonce: int) -> bool:
+        return bool(self.client.exists(self._key(nonce)))
+
+    def consume(self, nonce: int) -> bool:
+        return self.client.delete(self._key(nonce)) == 1
+
+    def _key(self, nonce: int) -> str:
+        return f"{self.prefix}{nonce:x}"
+
+
+def create_nonce_store(config: dict) -> NonceStore:
+    """
+    Create the nonce store selected by `NONCE_STORE_BACKEND`
+    """
+    backend = config.get("NONCE_STORE_BACKEND")
+    if not backend or backend == "memory":
+        return MemoryNonceStore(max_entries=config["NONCE_STORE_MAX_ENTRIES"])
+    if backend == "redis":
+        return RedisNonceStore.from_url(config["NONCE_STORE_URL"])
+    raise ValueError(f"Unknown nonce store backend '{backend}'")
+
+
+def get_nonce_store() -> NonceStore:
+    """
+    Get the nonce store of the current application
+    """
+    return current_app.extensions["nonce_store"]
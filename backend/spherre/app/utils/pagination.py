@@ -0,0 +1,46 @@
+import base64
+import binascii
+import json
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(payload: dict) -> str:
+    """
+    Encode a keyset position into an opaque url-safe cursor
+    """
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decode a cursor produced by `encode_cursor`
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid cursor")
+    return payload
+
+
+def keyset_after(sort_column, id_column, sort_value, last_id, descending: bool):
+    """
+    Build the condition selecting the rows that come after the
+    (sort_value, last_id) position when ordering by (sort_column, id_column).
+    """
+    if descending:
+        return or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < last_id),
+        )
+    return or_(
+        sort_column > sort_value,
+        and_(sort_column == sort_value, id_column > last_id),
+    )
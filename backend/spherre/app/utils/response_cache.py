@@ -0,0 +1,376 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Iterable, Optional
+
+from flask import Response, current_app, has_app_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from spherre.app.extensions import db
+
+
+def account_tag(account_address: str) -> str:
+    """
+    Tag of the cached responses built from an account's data
+    """
+    return f"account:{account_address}"
+
+
+def member_tag(member_address: str) -> str:
+    """
+    Tag of the cached responses built from a member's accounts
+    """
+    return f"member:{member_address}"
+
+
+class CacheBackend:
+    """
+    Interface of the response cache storage.
+    Values are response bodies stored under a key with a TTL and a set of
+    tags; invalidating a tag drops every key stored with it and bumps the
+    generation of the tag.
+    A value built from data read before an invalidation is not stored when
+    `set` is given the generations of its tags from before the read.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: int,
+        tags: Iterable[str],
+        generations: Optional[tuple] = None,
+    ):
+        """
+        Store a value, unless `generations` is given and a tag was
+        invalidated since they were read with `tag_generations`
+        """
+        raise NotImplementedError
+
+    def tag_generations(self, tags: Iterable[str]) -> tuple:
+        """
+        Get the generations of tags, to be passed to `set`
+        """
+        raise NotImplementedError
+
+    def invalidate_tag(self, tag: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU cache backend, bounded to `max_entries` keys.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, bytes, tuple]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _tags = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: int,
+        tags: Iterable[str],
+        generations: Optional[tuple] = None,
+    ):
+        tags = tuple(tags)
+        with self._lock:
+            if generations is not None and generations != self._tag_generations(tags):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def tag_generations(self, tags: Iterable[str]) -> tuple:
+        with self._lock:
+            return self._tag_generations(tags)
+
+    def invalidate_tag(self, tag: str):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in self._tags.pop(tag, set()):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            # the generations are kept, values read before are still stale
+
+    def _tag_generations(self, tags: Iterable[str]) -> tuple:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache backend for any server speaking the Redis protocol.
+    Each tag is a Redis set holding the keys stored with it, and a counter
+    holding its generation. The generations are compared right before the
+    value is written, not atomically with it, which leaves a window of one
+    round trip instead of the whole request.
+
+    Args:
+        client: A redis-py compatible client
+        prefix: Prefix of every key written by the backend
+    """
+
+    def __init__(self, client, prefix: str = "spherre:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisCacheBackend":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for the redis cache")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(
+        self,
+        key: str,
+        value: bytes,
+        ttl: int,
+        tags: Iterable[str],
+        generations: Optional[tuple] = None,
+    ):
+        tags = tuple(tags)
+        if generations is not None and generations != self.tag_generations(tags):
+            return
+        self.client.set(self.prefix + key, value, ex=ttl)
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            self.client.sadd(tag_key, key)
+            self.client.expire(tag_key, ttl)
+
+    def tag_generations(self, tags: Iterable[str]) -> tuple:
+        tags = tuple(tags)
+        if not tags:
+            return ()
+        return tuple(
+            int(generation or 0)
+            for generation in self.client.mget(
+                [self._generation_key(tag) for tag in tags]
+            )
+        )
+
+    def invalidate_tag(self, tag: str):
+        self.client.incr(self._generation_key(tag))
+        tag_key = self._tag_key(tag)
+        keys = [
+            self.prefix + (key.decode() if isinstance(key, bytes) else key)
+            for key in self.client.smembers(tag_key)
+        ]
+        self.client.delete(*keys, tag_key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def _generation_key(self, tag: str) -> str:
+        return f"{self.prefix}generation:{tag}"
+
+
+def create_cache_backend(config: dict) -> Optional[CacheBackend]:
+    """
+    Create the response cache backend selected by `RESPONSE_CACHE_BACKEND`.
+    Returns None when the cache is disabled.
+    """
+    backend = config.get("RESPONSE_CACHE_BACKEND")
+    if backend == "memory":
+        return MemoryCacheBackend(max_entries=config["RESPONSE_CACHE_MAX_ENTRIES"])
+    if backend == "redis":
+        return RedisCacheBackend.from_url(config["RESPONSE_CACHE_URL"])
+    if not backend or backend == "none":
+        return None
+    raise ValueError(f"Unknown response cache backend '{backend}'")
+
+
+def get_response_cache() -> Optional[CacheBackend]:
+    """
+    Get the response cache of the current application
+    """
+    return current_app.extensions.get("response_cache")
+
+
+def invalidate_cache_tags(*tags: str):
+    """
+    Invalidate cached responses by tag once the current transaction commits,
+    so requests running in the meantime do not cache the data from before
+    the write again. A request that read the old data before the commit
+    does not store it afterwards either, as the generations of its tags
+    changed, see `cached_response`.
+    Tags are dropped if the transaction is rolled back.
+    """
+    db.session.info.setdefault("invalidated_cache_tags", set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_tags(session: Session):
+    tags = session.info.pop("invalidated_cache_tags", None)
+    if not tags or not has_app_context():
+        return
+    cache = get_response_cache()
+    if cache is None:
+        return
+    for tag in tags:
+        cache.invalidate_tag(tag)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_tags(session: Session):
+    session.info.pop("invalidated_cache_tags", None)
+
+
+def _cache_key() -> str:
+    """
+    Build the cache key of the current request from its path and query args.
+    Requests to private accounts are also keyed on the JWT identity.
+    """
+    from spherre.app.service.account import AccountService
+
+    query = "&".join(
+        f"{name}={value}"
+        for name, values in sorted(request.args.lists())
+        for value in values
+    )
+    key = f"{request.path}?{query}"
+    account_address = (request.view_args or {}).get("account_address")
+    if account_address:
+        access = AccountService.get_account_access(account_address)
+        if access and access.is_private:
+            verify_jwt_in_request(optional=True)
+            key += f"|{get_jwt_identity()}"
+    return key
+
+
+def cached_response(tags: Callable[..., list[str]]):
+    """
+    Cache successful JSON responses of a GET view.
+
+    Args:
+        tags: Called with the view arguments, returns the tags the response
+            is stored with, e.g. the `account_tag` of the account it serves.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None or request.method != "GET":
+                return f(*args, **kwargs)
+            key = _cache_key()
+            body = cache.get(key)
+            if body is not None:
+                response = Response(body, status=200, mimetype="application/json")
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            # read before the view, a write committed while it runs
+            # invalidates the response it builds
+            response_tags = tags(*args, **kwargs)
+            generations = cache.tag_generations(response_tags)
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and response.is_json:
+                cache.set(
+                    key,
+                    response.get_data(),
+                    ttl=current_app.config["RESPONSE_CACHE_TTL"],
+                    tags=response_tags,
+                    generations=generations,
+                )
+                response.headers["X-Cache"] = "MISS"
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
+def versioned_response(version: Callable[..., Optional[int]]):
+    """
+    Add conditional GET support to a view whose response only changes when
+    the version of the data it serves changes.
+    The version is emitted as a weak ETag and a request whose `If-None-Match`
+    matches it gets a 304 before the view runs.
+
+    Args:
+        version: Called with the view arguments, returns the current version
+            of the data served, or None when it does not exist.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != "GET":
+                return f(*args, **kwargs)
+            current = version(*args, **kwargs)
+            if current is None:
+                return f(*args, **kwargs)
+            etag = f"version-{current}"
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+
+        return decorated_function
+
+    return decorator
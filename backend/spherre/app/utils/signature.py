@@ -1,24 +1,99 @@
+from functools import lru_cache
+from typing import Optional
+
 from flask import current_app
-from starknet_py.hash.utils import verify_message_signature
+from starknet_py.cairo.felt import encode_shortstring
+from starknet_py.hash.utils import (
+    compute_hash_on_elements,
+    verify_message_signature,
+)
 from starknet_py.utils.typed_data import Domain, Parameter, TypedData
 
 
+class LoginMessage:
+    """
+    The precomputed hashes of the login message of a domain.
+    Only the nonce of the message and the signer change between sign ins,
+    so the domain separator, the message type hash and the encoded
+    agreement are computed once and only the struct hash of the message
+    and the final hash are computed on each sign in.
+    The login message uses the `StarkNetDomain` (revision 0) encoding,
+    whose hashes are pedersen hashes on elements and whose felt strings
+    are short strings.
+
+    Args:
+        typed_data: The typed data of the login message
+
+    Raises:
+        ValueError: If the precomputed hash differs from
+            `TypedData.message_hash` of the login message
+    """
+
+    def __init__(self, typed_data: TypedData):
+        self.prefix = encode_shortstring("StarkNet Message")
+        self.domain_separator = typed_data.struct_hash(
+            typed_data.domain.separator_name, typed_data.domain.to_dict()
+        )
+        self.message_fields = [
+            typed_data.type_hash(typed_data.primary_type),
+            encode_shortstring(typed_data.message["agreement"]),
+        ]
+        # the encoding above is only valid for the revision 0 login message
+        nonce = int(typed_data.message["nonce"])
+        if self.message_hash(0, nonce) != typed_data.message_hash(0):
+            raise ValueError("Unsupported login message encoding")
+
+    def message_hash(self, account_address: int, nonce: int) -> int:
+        """
+        Same as `TypedData.message_hash` of the login message with this nonce
+        """
+        message_struct_hash = compute_hash_on_elements([*self.message_fields, nonce])
+        return compute_hash_on_elements(
+            [
+                self.prefix,
+                self.domain_separator,
+                account_address,
+                message_struct_hash,
+            ]
+        )
+
+
+@lru_cache(maxsize=8)
+def _login_message(domain_name: str, chain_id: str, version: str) -> LoginMessage:
+    typed_data = TypedData(
+        **SignatureUtils.login_typed_data_format(domain_name, chain_id, version)
+    )
+    return LoginMessage(typed_data)
+
+
 class SignatureUtils:
     @classmethod
-    def login_typed_data_format(cls) -> dict:
+    def login_typed_data_format(
+        cls,
+        domain_name: Optional[str] = None,
+        chain_id: Optional[str] = None,
+        version: Optional[str] = None,
+        nonce: int = 0,
+    ) -> dict:
         """
         This represents the signature request of the login operation.
         Read on starknet signatures to understand more
 
+        Args:
+            domain_name: The domain name, defaults to `DOMAIN_NAME`
+            chain_id: The chain id, defaults to `CHAIN_ID`
+            version: The version of the domain, defaults to `VERSION`
+            nonce: The nonce of the sign in challenge
+
         Returns:
             dict: The signature request structure of the login functionality.
         """
         data = {
             "domain": Domain(
                 **{
-                    "name": current_app.config.get("DOMAIN_NAME"),
-                    "chain_id": current_app.config.get("CHAIN_ID"),
-                    "version": current_app.config.get("VERSION"),
+                    "name": domain_name or current_app.config.get("DOMAIN_NAME"),
+                    "chain_id": chain_id or current_app.config.get("CHAIN_ID"),
+                    "version": version or current_app.config.get("VERSION"),
                 }
             ),
             "types": {
@@ -29,10 +104,11 @@ class SignatureUtils:
                 ],
                 "Message": [
                     Parameter(**{"name": "agreement", "type": "felt"}),
+                    Parameter(**{"name": "nonce", "type": "felt"}),
                 ],
             },
             "primary_type": "Message",
-            "message": {"agreement": "i agree to signin to spherre"},
+            "message": {"agreement": "i agree to signin to spherre", "nonce": nonce},
         }
         return data.copy()
 
@@ -73,6 +149,47 @@ class SignatureUtils:
         message_hash = typed_data.message_hash(public_key)
         return verify_message_signature(message_hash, signatures, public_key)
 
+    @classmethod
+    def login_message(cls, config: Optional[dict] = None) -> LoginMessage:
+        """
+        Get the precomputed login message of the domain configured by
+        `DOMAIN_NAME`, `CHAIN_ID` and `VERSION`.
+        It is computed on the first call for each domain and cached.
+
+        Args:
+            config: The config to read the domain from, defaults to the
+                config of the current app
+        """
+        config = config if config is not None else current_app.config
+        return _login_message(
+            config.get("DOMAIN_NAME"), config.get("CHAIN_ID"), config.get("VERSION")
+        )
+
+    @classmethod
+    def login_message_domain(cls, config: Optional[dict] = None) -> dict:
+        """
+        Get the `DOMAIN_NAME`, `CHAIN_ID` and `VERSION` config the login
+        message is built from, defaults to the config of the current app
+        """
+        config = config if config is not None else current_app.config
+        return {key: config.get(key) for key in ("DOMAIN_NAME", "CHAIN_ID", "VERSION")}
+
+    @classmethod
+    def verify_login_signatures(
+        cls, signatures: list[int], public_key: int, nonce: int
+    ) -> bool:
+        """
+        Verify the signature of the login message with the precomputed
+        login message hash.
+
+        Args:
+            signatures(list[int]): The signatures of the login message.
+            public_key(int): The public key of the signer.
+            nonce(int): The nonce of the signed sign in challenge.
+        """
+        message_hash = cls.login_message().message_hash(public_key, nonce)
+        return verify_message_signature(message_hash, signatures, public_key)
+
     @classmethod
     def convert_public_key_to_int(cls, public_key: str) -> int:
         """
@@ -0,0 +1,271 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from flask import current_app
+from starknet_py.hash.address import compute_address
+from starknet_py.hash.utils import verify_message_signature
+
+from spherre.app.utils.signature import SignatureUtils
+
+
+class VerificationPoolBusy(Exception):
+    """
+    Raised when the verification pool has no room left for a task
+    """
+
+
+class _TaskTimedOut(VerificationPoolBusy):
+    """
+    Raised when the result of a task that is still running times out
+    """
+
+    def __init__(self, message: str, future: Future):
+        super().__init__(message)
+        self.future = future
+
+
+def _verify_signin(
+    signatures: list[int],
+    public_key: int,
+    nonce: int,
+    domain: dict,
+    class_hash: int,
+    queued_at: float,
+) -> tuple[Optional[str], float]:
+    """
+    Verify a sign in signature and compute the address of the signer.
+    Runs in the pool processes, without an app context, so the login domain
+    config and the class hash are passed along.
+
+    Returns:
+        tuple: The address of the signer, None if the signature is invalid,
+            and the seconds the task waited in the queue
+    """
+    queue_time = max(time.time() - queued_at, 0.0)
+    login_message = SignatureUtils.login_message(domain)
+    message_hash = login_message.message_hash(public_key, nonce)
+    if not verify_message_signature(message_hash, signatures, public_key):
+        return None, queue_time
+    address = compute_address(
+        class_hash=class_hash, constructor_calldata=[public_key], salt=0
+    )
+    return hex(address), queue_time
+
+
+def _warm_up(domain: dict):
+    SignatureUtils.login_message(domain)
+
+
+class VerificationPool:
+    """
+    Bounded process pool running the CPU bound sign in verification off the
+    request workers.
+    At most `workers + queue_size` tasks are accepted at once, a task that
+    cannot get a slot within `timeout` seconds is rejected with
+    `VerificationPoolBusy` so login bursts are shed instead of piling up,
+    as is a task whose result takes longer than `result_timeout` seconds.
+    A running process cannot be interrupted, so a timed out task keeps its
+    slot until it actually finishes.
+    A pool broken by a crashed process is replaced and the task retried once.
+    With 0 workers the tasks run inline in the calling thread.
+
+    Args:
+        workers: Number of processes of the pool
+        queue_size: Number of tasks that can wait for a process
+        timeout: Seconds to wait for a free slot
+        result_timeout: Seconds to wait for the result of a running task
+        domain: The `DOMAIN_NAME`, `CHAIN_ID` and `VERSION` config the
+            processes precompute the login message of
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_size: int,
+        timeout: float,
+        result_timeout: float = 10,
+        domain: Optional[dict] = None,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.result_timeout = result_timeout
+        self.domain = domain
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "completed": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "timed_out": 0,
+            "timed_out_running": 0,
+            "queue_time_total": 0.0,
+            "queue_time_max": 0.0,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawned, forking would copy the threads of the app
+                # (event bus listener, database pool) into the workers
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up if self.domain else None,
+                    initargs=(self.domain,) if self.domain else (),
+                )
+            return self._executor
+
+    def _replace_broken_executor(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            # another thread may have replaced it already
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn: Callable, *args) -> tuple:
+        """
+        Run a task in the process pool, replacing the pool and retrying
+        once if it is broken
+        """
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                future: Future = executor.submit(fn, *args)
+                return future.result(timeout=self.result_timeout)
+            except BrokenProcessPool:
+                self._replace_broken_executor(executor)
+                if attempt:
+                    raise
+            except FutureTimeoutError:
+                if future.cancel():
+                    raise VerificationPoolBusy("Sign in verification timed out")
+                raise _TaskTimedOut("Sign in verification timed out", future)
+
+    def _release_timed_out(self, future: Future):
+        with self._lock:
+            self._metrics["timed_out_running"] -= 1
+        self._slots.release()
+
+    def run(self, fn: Callable, *args):
+        """
+        Run a task of the pool and wait for its result.
+        The task gets the time it was queued at as last argument and returns
+        its result along with its queue time, which includes the wait for
+        a slot.
+
+        Raises:
+            VerificationPoolBusy: If no slot frees up within the timeout or
+                the task does not finish within the result timeout
+            BrokenProcessPool: If the pool breaks again on the retry
+        """
+        queued_at = time.time()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._metrics["rejected"] += 1
+            raise VerificationPoolBusy("Too many sign in requests, retry later")
+        with self._lock:
+            self._metrics["in_flight"] += 1
+        running: Optional[Future] = None
+        try:
+            if self.workers <= 0:
+                result, queue_time = fn(*args, queued_at)
+            else:
+                result, queue_time = self._submit(fn, *args, queued_at)
+        except _TaskTimedOut as e:
+            running = e.future
+            raise
+        finally:
+            with self._lock:
+                self._metrics["in_flight"] -= 1
+                if running is not None:
+                    self._metrics["timed_out"] += 1
+                    self._metrics["timed_out_running"] += 1
+            if running is None:
+                self._slots.release()
+            else:
+                # the process still runs the task, the slot is released
+                # once it finishes
+                running.add_done_callback(self._release_timed_out)
+        with self._lock:
+            self._metrics["completed"] += 1
+            self._metrics["queue_time_total"] += queue_time
+            self._metrics["queue_time_max"] = max(
+                self._metrics["queue_time_max"], queue_time
+            )
+        return result
+
+    def verify_signin(
+        self,
+        signatures: list[int],
+        public_key: int,
+        nonce: int,
+        domain: dict,
+        class_hash: int,
+    ) -> Optional[str]:
+        """
+        Verify a sign in signature and compute the address of the signer
+        in the pool.
+
+        Args:
+            signatures: The signatures of the login message
+            public_key: The public key of the signer
+            nonce: The nonce of the signed sign in challenge
+            domain: The `DOMAIN_NAME`, `CHAIN_ID` and `VERSION` config
+            class_hash: The class hash of the signer account
+
+        Returns:
+            str: The address of the signer, None if the signature is invalid
+        """
+        return self.run(
+            _verify_signin, signatures, public_key, nonce, domain, class_hash
+        )
+
+    def metrics(self) -> dict:
+        """
+        Get the counters of the pool.
+
+        Returns:
+            dict: The number of completed, rejected, running and timed out
+                tasks, the timed out tasks still running, and the average
+                and maximum queue time in seconds
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        total = metrics.pop("queue_time_total")
+        metrics["queue_time_avg"] = (
+            total / metrics["completed"] if metrics["completed"] else 0.0
+        )
+        return metrics
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def create_verification_pool(config: dict) -> VerificationPool:
+    """
+    Create the sign in verification pool from the `SIGNIN_POOL_*` config
+    """
+    return VerificationPool(
+        workers=config["SIGNIN_POOL_WORKERS"],
+        queue_size=config["SIGNIN_POOL_QUEUE_SIZE"],
+        timeout=config["SIGNIN_POOL_TIMEOUT"],
+        result_timeout=config["SIGNIN_POOL_RESULT_TIMEOUT"],
+        domain=SignatureUtils.login_message_domain(config),
+    )
+
+
+def get_verification_pool() -> VerificationPool:
+    """
+    Get the sign in verification pool of the current application
+    """
+    return current_app.extensions["verification_pool"]
@@ -2,12 +2,14 @@ from flask import Blueprint, abort, jsonify
 
 from spherre.app.serializers.account import AccountSerializer
 from spherre.app.service.account import AccountService
+from spherre.app.utils.response_cache import cached_response, member_tag
 from spherre.app.utils.validation import is_valid_starknet_address
 
 accounts_blueprint = Blueprint("accounts", __name__, url_prefix="/api/v1")
 
 
 @accounts_blueprint.route("/accounts/member/<member_address>", methods=["GET"])
+@cached_response(lambda member_address: [member_tag(member_address)])
 def get_member_accounts(member_address):
     if not is_valid_starknet_address(member_address):
         abort(400, description="Invalid member address format")
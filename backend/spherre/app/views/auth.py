@@ -5,10 +5,24 @@ from marshmallow import ValidationError
 
 from spherre.app.serializers.auth import SignInSerializer
 from spherre.app.service.auth import AuthService
+from spherre.app.utils.nonce_store import NonceStoreFull
+from spherre.app.utils.verification_pool import VerificationPoolBusy
 
 auth_blueprint = Blueprint("auth", __name__, url_prefix="/api/v1")
 
 
+@auth_blueprint.route("/auth/challenge", methods=["POST"])
+def challenge():
+    try:
+        return jsonify(AuthService.create_signin_challenge())
+    except NonceStoreFull as e:
+        logger.warning(e)
+        return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+    except Exception as e:
+        logger.error(e)
+        return jsonify({"error": "Server error"}), 500
+
+
 @auth_blueprint.route("/auth/signin", methods=["POST"])
 def signin():
     data = request.json
@@ -22,6 +36,9 @@ def signin():
     except ValidationError as e:
         logger.error(e)
         return jsonify(e.messages), 400
+    except VerificationPoolBusy as e:
+        logger.warning(e)
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         logger.error(e)
         return jsonify({"error": "Server error"}), 500
@@ -0,0 +1,82 @@
+import json
+import time
+from typing import Optional
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    stream_with_context,
+)
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from spherre.app.extensions import db
+from spherre.app.service.account import AccountService
+from spherre.app.utils.access_cache import AccountAccess
+from spherre.app.utils.events import account_channel, get_event_bus
+
+events_blueprint = Blueprint("events", __name__, url_prefix="/api/v1")
+
+
+def _format_event(event: dict) -> str:
+    data = json.dumps(event["data"], default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+def _is_allowed(access: Optional[AccountAccess], identity) -> bool:
+    return access is not None and (not access.is_private or identity in access.members)
+
+
+@events_blueprint.route("/accounts/<string:account_address>/events", methods=["GET"])
+def stream_account_events(account_address):
+    """
+    Stream the events of an account as Server-Sent Events.
+    New notifications, transaction status changes and smart lock status
+    changes are sent once committed. Private accounts can only be streamed
+    by their members. The access is loaded again from the database every
+    `EVENT_STREAM_KEEPALIVE` seconds, busy or not, and the stream is closed
+    once the subscriber lost it, e.g. a removed member or an anonymous
+    subscriber of an account made private.
+    """
+    access = AccountService.get_account_access(account_address)
+    if access is None:
+        return jsonify({"error": "Account not found"}), 404
+    # members of a public account keep streaming if it is made private
+    verify_jwt_in_request(optional=not access.is_private)
+    identity = get_jwt_identity()
+    if not _is_allowed(access, identity):
+        return jsonify({"error": "You are not a member of this account"}), 403
+    # an idle stream must not hold a database connection
+    db.session.remove()
+
+    bus = get_event_bus()
+    keepalive = current_app.config["EVENT_STREAM_KEEPALIVE"]
+    subscription = bus.subscribe(account_channel(account_address))
+
+    def stream():
+        try:
+            yield ": connected\n\n"
+            next_check = time.monotonic() + keepalive
+            while True:
+                event = subscription.get(timeout=max(next_check - time.monotonic(), 0))
+                if event is not None:
+                    yield _format_event(event)
+                if time.monotonic() < next_check:
+                    continue
+                allowed = _is_allowed(
+                    AccountService.load_account_access(account_address), identity
+                )
+                db.session.remove()
+                if not allowed:
+                    return
+                next_check = time.monotonic() + keepalive
+                yield ": keep-alive\n\n"
+        finally:
+            bus.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
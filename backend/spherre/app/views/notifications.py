@@ -1,8 +1,19 @@
 from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from marshmallow import ValidationError
 
-from spherre.app.serializers.notifications import NotificationSchema
+from spherre.app.serializers.notifications import (
+    MarkNotificationsReadSerializer,
+    NotificationSchema,
+)
 from spherre.app.service.account import AccountService
+from spherre.app.service.member import MemberService
 from spherre.app.service.notification import NotificationService
+from spherre.app.utils.response_cache import (
+    account_tag,
+    cached_response,
+    versioned_response,
+)
 
 notifications_blueprint = Blueprint("notifications", __name__, url_prefix="/api/v1")
 
@@ -10,12 +21,20 @@ notifications_blueprint = Blueprint("notifications", __name__, url_prefix="/api/
 @notifications_blueprint.route(
     "/accounts/<string:account_address>/notifications", methods=["GET"]
 )
+@versioned_response(AccountService.get_account_version)
+@cached_response(lambda account_address: [account_tag(account_address)])
 def get_notifications(account_address):
     try:
         page = request.args.get("page", default=1, type=int)
         per_page = request.args.get("per_page", default=20, type=int)
         unread_only = request.args.get("unread_only", default="False").lower() == "true"
         member_id = request.args.get("member_id", default=None, type=str)
+        # an opaque keyset cursor, when given it takes precedence over `page`
+        cursor = request.args.get("cursor", default=None, type=str)
+        # the total is skipped by default on cursor pages to keep them flat
+        include_total = (
+            request.args.get("include_total", str(cursor is None)).lower() == "true"
+        )
 
         if page <= 0 or per_page <= 0:
             return jsonify({"error": "Invalid pagination parameters"}), 400
@@ -23,13 +42,20 @@ def get_notifications(account_address):
         account = AccountService.get_account_by_address(account_address)
         if not account:
             return jsonify({"error": "Account not found"}), 404
-        notifications, pagination = NotificationService.list_notifications_by_account(
-            account_id=account.id,
-            page=page,
-            per_page=per_page,
-            unread_only=unread_only,
-            member_id=member_id,
-        )
+        try:
+            notifications, pagination = (
+                NotificationService.list_notifications_by_account(
+                    account_id=account.id,
+                    page=page,
+                    per_page=per_page,
+                    unread_only=unread_only,
+                    member_id=member_id,
+                    cursor=cursor,
+                    include_total=include_total,
+                )
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         schema = NotificationSchema(many=True)
         serialized = schema.dump(notifications)
 
@@ -37,3 +63,48 @@ def get_notifications(account_address):
 
     except Exception:
         return jsonify({"error": "Internal server error"}), 500
+
+
+@notifications_blueprint.route(
+    "/accounts/<string:account_address>/notifications/unread-count", methods=["GET"]
+)
+@versioned_response(AccountService.get_account_version)
+def get_unread_notification_count(account_address):
+    member_id = request.args.get("member_id", default=None, type=str)
+    if not member_id:
+        return jsonify({"error": "member_id is required"}), 400
+
+    count = NotificationService.get_unread_count(account_address, member_id)
+    if count is None:
+        return jsonify({"error": "Account not found"}), 404
+    return jsonify({"unread_count": count}), 200
+
+
+@notifications_blueprint.route(
+    "/accounts/<string:account_address>/notifications/read", methods=["POST"]
+)
+@jwt_required()
+def mark_notifications_as_read(account_address):
+    """
+    Mark notifications of an account as read by the current member, either
+    by id or every notification created up to a timestamp.
+    """
+    account = AccountService.get_account_by_address(account_address)
+    if not account:
+        return jsonify({"error": "Account not found"}), 404
+    current_user = get_jwt_identity()
+    if not AccountService.is_account_member(account_address, current_user):
+        return jsonify({"error": "You are not a member of this account"}), 403
+    try:
+        data = MarkNotificationsReadSerializer().load(request.json or {})
+    except ValidationError as err:
+        return jsonify({"error": err.messages}), 400
+
+    member = MemberService.get_member_by_address(current_user)
+    marked = NotificationService.mark_notifications_as_read(
+        member.id,
+        notification_ids=data.get("notification_ids"),
+        up_to=data.get("up_to"),
+        account_id=account.id,
+    )
+    return jsonify({"marked": marked}), 200
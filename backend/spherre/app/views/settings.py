@@ -3,6 +3,7 @@ from flask_jwt_extended import get_jwt_identity, jwt_required
 from loguru import logger
 from marshmallow import ValidationError
 
+from spherre.app.models import transactional
 from spherre.app.serializers.account import EmailRequestSerializer
 from spherre.app.service.account import AccountService
 from spherre.app.service.member import MemberService
@@ -54,11 +55,12 @@ def add_email(account_address: str):
     member = MemberService.get_member_by_address(current_user)
     if member.email:
         return jsonify({"error": "Member already has an email"}), 400
-    MemberService.update_member_email(current_user, email)
-    # set member notification preference
-    NotificationService.toggle_member_email_notification_preference(
-        member_address=member.address, account_address=account_address
-    )
+    with transactional():
+        MemberService.update_member_email(current_user, email)
+        # set member notification preference
+        NotificationService.toggle_member_email_notification_preference(
+            member_address=member.address, account_address=account_address
+        )
     return jsonify({"success": True}), 201
 
 
@@ -4,12 +4,14 @@ from spherre.app.extensions import db
 from spherre.app.models.account import Account
 from spherre.app.serializers.smart_lock import SmartLockListResponseSerializer
 from spherre.app.service.smart_lock import SmartLockService
+from spherre.app.utils.response_cache import account_tag, cached_response
 from spherre.app.utils.validation import is_valid_starknet_address
 
 smart_lock_blueprint = Blueprint("smart_lock", __name__, url_prefix="/api/v1")
 
 
 @smart_lock_blueprint.route("/accounts/<account_address>/smart-locks", methods=["GET"])
+@cached_response(lambda account_address: [account_tag(account_address)])
 def get_account_smart_locks(account_address):
     """
     Get all smart locks for a specific account with pagination.
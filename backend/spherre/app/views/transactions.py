@@ -5,6 +5,11 @@ from flask import Blueprint, jsonify, request
 from spherre.app.serializers.transaction import TransactionSchema
 from spherre.app.service.account import AccountService
 from spherre.app.service.transaction import TransactionService
+from spherre.app.utils.response_cache import (
+    account_tag,
+    cached_response,
+    versioned_response,
+)
 from spherre.app.utils.validation import validate_transaction_filters
 
 transactions_blueprint = Blueprint("transactions", __name__, url_prefix="/api/v1")
@@ -13,6 +18,8 @@ transactions_blueprint = Blueprint("transactions", __name__, url_prefix="/api/v1
 @transactions_blueprint.route(
     "/accounts/<string:account_address>/transactions", methods=["GET"]
 )
+@versioned_response(AccountService.get_account_version)
+@cached_response(lambda account_address: [account_tag(account_address)])
 def get_transactions(account_address):
     account = AccountService.get_account_by_address(account_address)
     if not account:
@@ -41,6 +48,12 @@ def get_transactions(account_address):
 
     sort_by = request.args.get("sort_by", "date_created")
     sort_order = request.args.get("sort_order", "desc")
+    # an opaque keyset cursor, when given it takes precedence over `page`
+    cursor = request.args.get("cursor")
+    # the total is skipped by default on cursor pages to keep them flat
+    include_total = (
+        request.args.get("include_total", str(cursor is None)).lower() == "true"
+    )
 
     # Parse ISO dates if provided
     date_from_str = request.args.get("date_from")
@@ -70,6 +83,8 @@ def get_transactions(account_address):
             date_to=date_to,
             sort_by=sort_by,
             sort_order=sort_order,
+            cursor=cursor,
+            include_total=include_total,
         )
 
         # Serialize transactions
@@ -79,6 +94,16 @@ def get_transactions(account_address):
         }
 
         return jsonify(response)
+    except ValueError as e:
+        return jsonify(
+            {
+                "success": False,
+                "error": {
+                    "code": "Invalid cursor",
+                    "message": str(e),
+                },
+            }
+        ), 400
     except Exception:
         return jsonify(
             {
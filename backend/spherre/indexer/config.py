@@ -6,3 +6,10 @@ SPHERRE_CONTRACT_ADDRESS = ""
 SERVER_URL = ""
 MONGO_URL = ""
 DNA_TOKEN = os.environ.get("DNA_TOKEN")
+# config of the app whose database the indexer writes to
+APP_CONFIG = os.environ.get("FLASK_CONFIG") or "development"
+# how blocks are persisted: "thread" runs the app services on a writer
+# thread, "async" writes with the SQLAlchemy asyncio engine
+WRITER = os.environ.get("INDEXER_WRITER") or "thread"
+# blocks queued or being written before the stream consumer waits
+MAX_IN_FLIGHT_BLOCKS = int(os.environ.get("INDEXER_MAX_IN_FLIGHT_BLOCKS") or 4)
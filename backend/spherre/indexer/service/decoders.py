@@ -0,0 +1,129 @@
+from typing import Any, Callable, List, Optional, Sequence, Type, get_args, get_origin
+
+from loguru import logger
+from pydantic import BaseModel
+
+
+def felt_to_int(felt: Any) -> int:
+    """
+    Convert a wire-encoded field element to an int, like `felt.to_int`
+    """
+    return (felt.lo_lo << 192) | (felt.lo_hi << 128) | (felt.hi_lo << 64) | felt.hi_hi
+
+
+def felt_to_hex(felt: Any) -> str:
+    """
+    Convert a wire-encoded field element to a 0x prefixed hex string padded
+    to 64 digits, like `felt.to_hex`
+    """
+    return f"0x{felt_to_int(felt):064x}"
+
+
+# felt conversion of each field annotation
+FELT_CONVERTERS: dict[type, Callable[[Any], Any]] = {
+    str: felt_to_hex,
+    int: felt_to_int,
+}
+
+
+class EventDecoder:
+    """
+    Decodes the data felts of an event into an event model with a plan
+    compiled once from the model fields, instead of inspecting the fields
+    of every event.
+    The fields are read in declaration order. A `str` field is one felt
+    converted to hex, an `int` field one felt converted to an int, and a
+    `List[str]` or `List[int]` field a felt holding the array length
+    followed by the items.
+    The fields before the first array have fixed offsets and are read
+    with a single slice.
+
+    Args:
+        model: The event model, its fields declare the event data layout
+
+    Raises:
+        TypeError: If a field annotation has no felt conversion
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fixed: List[tuple[str, Callable[[Any], Any]]] = []
+        # (name, converter, is_array) of the fields from the first array on
+        self.variable: List[tuple[str, Callable[[Any], Any], bool]] = []
+        for name, field in model.model_fields.items():
+            annotation = field.annotation
+            if get_origin(annotation) in (list, List):
+                (item,) = get_args(annotation)
+                self.variable.append((name, self._converter(model, name, item), True))
+            elif self.variable:
+                self.variable.append(
+                    (name, self._converter(model, name, annotation), False)
+                )
+            else:
+                self.fixed.append((name, self._converter(model, name, annotation)))
+        self._validate = model.__pydantic_validator__.validate_python
+
+    @staticmethod
+    def _converter(model: Type[BaseModel], name: str, annotation: Any):
+        try:
+            return FELT_CONVERTERS[annotation]
+        except KeyError:
+            raise TypeError(
+                f"No felt conversion for field '{name}' of {model.__name__}: "
+                f"{annotation}"
+            ) from None
+
+    def decode(self, data: Sequence[Any]) -> BaseModel:
+        """
+        Decode the data felts of an event.
+
+        Args:
+            data: The data felts of the event
+
+        Returns:
+            BaseModel: The event model
+
+        Raises:
+            ValueError: If the data is shorter than the layout of the model,
+                pydantic's ValidationError is one
+        """
+        fixed = len(self.fixed)
+        if len(data) < fixed:
+            raise ValueError(
+                f"{self.model.__name__} needs at least {fixed} felts, got {len(data)}"
+            )
+        values = {
+            name: convert(felt)
+            for (name, convert), felt in zip(self.fixed, data[:fixed])
+        }
+        offset = fixed
+        for name, convert, is_array in self.variable:
+            if offset >= len(data):
+                raise ValueError(f"Field '{name}' of {self.model.__name__} is missing")
+            if is_array:
+                length = felt_to_int(data[offset])
+                end = offset + 1 + length
+                if end > len(data):
+                    raise ValueError(
+                        f"Array '{name}' of {self.model.__name__} has {length} "
+                        f"items, only {len(data) - offset - 1} felts left"
+                    )
+                values[name] = [convert(felt) for felt in data[offset + 1 : end]]
+                offset = end
+            else:
+                values[name] = convert(data[offset])
+                offset += 1
+        # the core validator of the model, the values already have the types
+        # of the fields
+        return self._validate(values)
+
+    def __call__(self, event: Any) -> Optional[BaseModel]:
+        """
+        Decode an event, logging and returning None if its data does not
+        match the model
+        """
+        try:
+            return self.decode(event.data)
+        except ValueError as err:
+            logger.error(f"Error decoding {self.model.__name__} event data: {err}")
+            return None
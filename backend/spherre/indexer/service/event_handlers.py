@@ -1,23 +1,88 @@
-from typing import Callable, Dict
+from typing import Awaitable, Callable, Dict, List
 
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from spherre.app.service.account import AccountService
+from spherre.indexer.service.persistence import create_accounts
 from spherre.indexer.service.types import (
     AccountCreationEvent,
     BaseEventModel,
     EventEnum,
+    TokenTransferEvent,
 )
 
 
 class EventHandlers:
+    """
+    Persist the events of a block, one call per event type.
+    The handlers run inside the `transactional` scope of the block and
+    must not commit.
+    """
+
+    @classmethod
+    def handle_account_creation(cls, events: List[AccountCreationEvent]):
+        # accounts already persisted, e.g. by the API, are skipped
+        existing = AccountService.filter_existing_accounts(
+            event.account_address for event in events
+        )
+        accounts = {}
+        for event in events:
+            if event.account_address not in existing:
+                accounts.setdefault(event.account_address, account_data(event))
+        if accounts:
+            AccountService.create_accounts(list(accounts.values()))
+
+    @classmethod
+    def handle_token_transafer(cls, events: List[TokenTransferEvent]):
+        # token transfers are not persisted yet
+        logger.debug(f"{len(events)} token transfers skipped")
+
+
+class AsyncEventHandlers:
+    """
+    The handlers of `EventHandlers` for the `AsyncBlockWriter`, writing with
+    the connection of the block transaction.
+    They return the addresses of the members whose accounts changed.
+    """
+
     @classmethod
-    def handle_account_creation(cls, data: AccountCreationEvent):
-        pass
+    async def handle_account_creation(
+        cls, connection: AsyncConnection, events: List[AccountCreationEvent]
+    ) -> set:
+        return await create_accounts(
+            connection, [account_data(event) for event in events]
+        )
 
     @classmethod
-    def handle_token_transafer(cls):
-        pass
+    async def handle_token_transafer(
+        cls, connection: AsyncConnection, events: List[TokenTransferEvent]
+    ) -> set:
+        logger.debug(f"{len(events)} token transfers skipped")
+        return set()
+
 
+def account_data(event: AccountCreationEvent) -> dict:
+    """
+    Map an account creation event to the account data of the services
+    """
+    return {
+        "address": event.account_address,
+        "name": event.name,
+        "description": event.description,
+        "threshold": event.threshold,
+        "members": event.members,
+    }
 
-DATA_HANDLERS: Dict[EventEnum, Callable[[BaseEventModel], None]] = {
+
+DATA_HANDLERS: Dict[EventEnum, Callable[[List[BaseEventModel]], None]] = {
     EventEnum.ACCOUNT_CREATION: EventHandlers.handle_account_creation,
     EventEnum.TOKEN_TRANSFER: EventHandlers.handle_token_transafer,
 }
+
+ASYNC_DATA_HANDLERS: Dict[
+    EventEnum, Callable[[AsyncConnection, List[BaseEventModel]], Awaitable[set]]
+] = {
+    EventEnum.ACCOUNT_CREATION: AsyncEventHandlers.handle_account_creation,
+    EventEnum.TOKEN_TRANSFER: AsyncEventHandlers.handle_token_transafer,
+}
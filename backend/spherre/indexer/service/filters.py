@@ -0,0 +1,106 @@
+import time
+from typing import Iterable, List, Optional
+
+
+class AccountFilterManager:
+    """
+    Tracks the account addresses watched by the indexer stream filter.
+    The addresses of the accounts created in a block are coalesced into a
+    single filter update, and addresses already watched are skipped, so
+    the stream is reconfigured at most once per block whatever the number
+    of accounts created in it.
+    It only deals with addresses, building the apibara filters is left to
+    the indexer.
+    """
+
+    def __init__(self):
+        # watched addresses by their integer value, "0x0abc" and "0xabc"
+        # are the same address
+        self._watched: dict[int, str] = {}
+        self._metrics = {
+            "loaded": 0,
+            "updates": 0,
+            "addresses_added": 0,
+            "largest_update": 0,
+            "first_update_block": None,
+            "last_update_block": None,
+            "last_update_at": None,
+        }
+
+    def load(self, addresses: Iterable[str]) -> List[str]:
+        """
+        Replace the watched addresses, e.g. with the accounts table on
+        startup, to build the initial filter in one pass.
+
+        Args:
+            addresses: The account addresses
+
+        Returns:
+            list: The watched addresses without duplicates
+        """
+        self._watched = {}
+        added = self._add(addresses)
+        self._metrics["loaded"] = len(added)
+        return added
+
+    def watch(self, block_number: int, addresses: Iterable[str]) -> List[str]:
+        """
+        Watch the accounts created in a block.
+
+        Args:
+            block_number: The block the accounts were created in
+            addresses: The addresses of the created accounts
+
+        Returns:
+            list: The addresses not watched yet, to add to the stream
+                filter in a single update. Empty if there is nothing to update
+        """
+        added = self._add(addresses)
+        if added:
+            metrics = self._metrics
+            metrics["updates"] += 1
+            metrics["addresses_added"] += len(added)
+            metrics["largest_update"] = max(metrics["largest_update"], len(added))
+            if metrics["first_update_block"] is None:
+                metrics["first_update_block"] = block_number
+            metrics["last_update_block"] = block_number
+            metrics["last_update_at"] = time.time()
+        return added
+
+    def is_watched(self, address: str) -> bool:
+        return int(address, 16) in self._watched
+
+    def __len__(self) -> int:
+        return len(self._watched)
+
+    def metrics(self) -> dict:
+        """
+        Get the counters of the filter.
+
+        Returns:
+            dict: The number of watched addresses, of addresses loaded on
+                startup, of filter updates and of addresses they added, the
+                largest update, the blocks of the first and last updates,
+                the average blocks between updates and the unix time of
+                the last update
+        """
+        metrics = dict(self._metrics)
+        metrics["watched"] = len(self._watched)
+        metrics["blocks_per_update"] = self._blocks_per_update()
+        return metrics
+
+    def _blocks_per_update(self) -> Optional[float]:
+        updates = self._metrics["updates"]
+        if updates < 2:
+            return None
+        span = self._metrics["last_update_block"] - self._metrics["first_update_block"]
+        return span / (updates - 1)
+
+    def _add(self, addresses: Iterable[str]) -> List[str]:
+        added = []
+        for address in addresses:
+            key = int(address, 16)
+            if key not in self._watched:
+                self._watched[key] = address
+                added.append(address)
+        return added
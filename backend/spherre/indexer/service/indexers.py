@@ -1,31 +1,67 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+
 from apibara.indexer import IndexerRunner, IndexerRunnerConfiguration, Info
 from apibara.indexer.indexer import IndexerConfiguration
 from apibara.protocol.proto.stream_pb2 import Cursor, DataFinality
 from apibara.starknet import EventFilter, Filter, StarkNetIndexer, felt
 from apibara.starknet.cursor import starknet_cursor
 from apibara.starknet.proto.starknet_pb2 import Block
+from flask import Flask
 from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection
 
-from spherre.indexer.config import NETWORK, SPHERRE_CONTRACT_ADDRESS
-from spherre.indexer.service.event_handlers import DATA_HANDLERS
+from spherre.app import create_app
+from spherre.app.models import transactional
+from spherre.app.service.account import AccountService
+from spherre.app.service.indexer import IndexerService
+from spherre.indexer.config import (
+    APP_CONFIG,
+    MAX_IN_FLIGHT_BLOCKS,
+    NETWORK,
+    SPHERRE_CONTRACT_ADDRESS,
+    WRITER,
+)
+from spherre.indexer.service.event_handlers import ASYNC_DATA_HANDLERS, DATA_HANDLERS
+from spherre.indexer.service.filters import AccountFilterManager
+from spherre.indexer.service.persistence import (
+    AsyncBlockWriter,
+    BlockSequencer,
+    BlockWriter,
+    ThreadBlockWriter,
+    save_cursor,
+)
 from spherre.indexer.service.types import (
     EVENT_SELECTORS,
+    BaseEventModel,
     EventEnum,
 )
 from spherre.indexer.service.utils import DATA_TRANSFORMERS
 
 
 class SpherreMainIndexer(StarkNetIndexer):
-    def start_account_indexer(self, address: str):
-        # create a new filter for the account address
-        account_address = felt.from_hex(address)
-        filter = (
-            EventFilter()
-            .with_from_address(account_address)
-            .with_keys([EVENT_SELECTORS.values()])
-        )
-        # add the filter to the indexer
-        self.update_filter(filter)
+    def __init__(self, app: Flask, writer: Optional[BlockWriter] = None):
+        super().__init__()
+        # the app whose services persist the events
+        self.app = app
+        # persists the blocks off the stream consumer
+        self.writer = writer or create_block_writer(self)
+        # submits the blocks to the writer, its cursor is the last block
+        # submitted and is loaded from the database on the first block
+        self.blocks = BlockSequencer(self.writer)
+        self._cursor_loaded = False
+        # the account addresses in the stream filter
+        self.filters = AccountFilterManager()
+
+    def account_filter(self, addresses: List[str]) -> Filter:
+        """
+        Build a filter on all the events of the given accounts, the handled
+        event types are picked by `group_block_events`
+        """
+        filter = Filter()
+        for address in addresses:
+            filter.add_event(EventFilter().with_from_address(felt.from_hex(address)))
+        return filter
 
     def indexer_id(self) -> str:
         return "spherre"
@@ -33,71 +69,214 @@ class SpherreMainIndexer(StarkNetIndexer):
     def initial_configuration(self) -> Filter:
         # Return initial configuration of the indexer.
         address = felt.from_hex(SPHERRE_CONTRACT_ADDRESS)
+        # the filter is rebuilt from the accounts table in one pass, instead
+        # of replaying one filter update per account
+        with self.app.app_context():
+            addresses = self.filters.load(AccountService.get_account_addresses())
+        logger.info(f"Stream filter built with {len(addresses)} accounts")
         return IndexerConfiguration(
-            filter=Filter().add_event(
+            filter=self.account_filter(addresses).add_event(
                 EventFilter()
                 .with_from_address(address)
                 .with_keys([EVENT_SELECTORS[EventEnum.ACCOUNT_CREATION]])
             ),
-            starting_cursor=starknet_cursor(10_000),
+            starting_cursor=self.starting_cursor(),
             finality=DataFinality.DATA_STATUS_ACCEPTED,
         )
 
+    def starting_cursor(self) -> Cursor:
+        """
+        Get the cursor the stream resumes from, the last block committed to
+        the database
+        """
+        cursor = self.get_cursor()
+        return starknet_cursor(cursor if cursor is not None else 10_000)
+
+    def get_cursor(self) -> Optional[int]:
+        """
+        Get the last block submitted to the writer
+        """
+        if not self._cursor_loaded:
+            self.blocks.cursor = self.load_cursor()
+            self._cursor_loaded = True
+        return self.blocks.cursor
+
+    def load_cursor(self) -> Optional[int]:
+        """
+        Get the last block committed to the database
+        """
+        with self.app.app_context():
+            return IndexerService.get_cursor(self.indexer_id())
+
+    async def reset(self):
+        """
+        Bring the indexer back to the database before the stream (re)connects:
+        the queued blocks are written, a held block is dropped and the cursor
+        is reloaded, the filter is then rebuilt by `initial_configuration`
+        """
+        await self.blocks.reset(self.load_cursor)
+        self._cursor_loaded = True
+
     async def handle_data(self, info: Info, data: Block):
-        # Handle one block of data
+        # Handle one block of data, persisted in a single transaction by the
+        # writer while the stream moves on to the next blocks
+        block_number = data.header.block_number
+        if self.blocks.held_block == block_number:
+            await self.handle_rescan(data)
+            return
+        self.get_cursor()
+        # a held block whose rescan had no events of the new accounts is
+        # submitted first
+        if not await self.blocks.start_block(block_number):
+            logger.info(f"Block {block_number} already persisted, skipped")
+            return
+
+        grouped_events = self.group_block_events(data)
+        if not grouped_events:
+            return
+
+        # a single filter update for all the accounts created in the block
+        created = grouped_events.get(EventEnum.ACCOUNT_CREATION, [])
+        addresses = self.filters.watch(
+            block_number, [account.account_address for account in created]
+        )
+        if addresses:
+            self.update_filter(self.account_filter(addresses))
+            logger.info(
+                f"Stream filter updated with {len(addresses)} accounts at block "
+                f"{block_number}, {len(self.filters)} accounts watched"
+            )
+            # apibara streams the block again with the new filter, the new
+            # accounts may have events in it
+            self.blocks.hold(block_number, grouped_events)
+            return
+        await self.blocks.submit(block_number, grouped_events)
+
+    async def handle_rescan(self, data: Block):
+        """
+        Add the events of the new accounts to the held block and submit it
+        """
+        # the rescan only streams the events of the new accounts
+        await self.blocks.rescan(
+            {
+                event_enum: events
+                for event_enum, events in self.group_block_events(data).items()
+                if event_enum != EventEnum.ACCOUNT_CREATION
+            }
+        )
+
+    def group_block_events(self, data: Block) -> Dict[EventEnum, List[BaseEventModel]]:
+        """
+        Transform the events of a block, grouped by event type in block order
+        """
+        grouped_events: Dict[EventEnum, List[BaseEventModel]] = defaultdict(list)
         for event_with_tx in data.events:
             tx_hash = felt.to_hex(event_with_tx.transaction.meta.hash)
             event = event_with_tx.event
             event_address = felt.to_hex(event.from_address)
-            logger.info("Transaction Hash:", tx_hash)
-
-            if event_address != SPHERRE_CONTRACT_ADDRESS:
-                event_type = event.keys
-                event_enum = EVENT_SELECTORS.inverse[event_type]
-                transformed_data = DATA_TRANSFORMERS[event_enum](event)
-                if transformed_data:
-                    DATA_HANDLERS[event_enum](transformed_data)
-                    logger.info(
-                        (
-                            f"Event with type '{event_type}' from address"
-                            f"'{event_address}' handled"
-                        )
-                    )
-                else:
-                    logger.error(
-                        (
-                            f"Failed to handle event of type '{event_type}'"
-                            f"from address '{event_address}'"
-                        )
-                    )
+            event_type = event.keys[0] if event.keys else None
+            event_enum = EVENT_SELECTORS.inverse.get(event_type)
+            logger.debug(f"Transaction Hash: {tx_hash}")
+
+            # only account creations are handled from the main contract
+            if (
+                event_address == SPHERRE_CONTRACT_ADDRESS
+                and event_enum != EventEnum.ACCOUNT_CREATION
+            ):
+                continue
+            if event_enum not in DATA_TRANSFORMERS or event_enum not in DATA_HANDLERS:
+                logger.debug(
+                    f"Event with type '{event_type}' from address "
+                    f"'{event_address}' is not handled"
+                )
+                continue
+
+            transformed_data = DATA_TRANSFORMERS[event_enum](event)
+            if transformed_data:
+                grouped_events[event_enum].append(transformed_data)
             else:
-                event_type = event.keys
-                if event_type == EVENT_SELECTORS[EventEnum.ACCOUNT_CREATION]:
-                    transformed_data = DATA_TRANSFORMERS[EventEnum.ACCOUNT_CREATION](
-                        event
+                logger.error(
+                    (
+                        f"Failed to handle event of type '{event_type}' "
+                        f"from address '{event_address}'"
                     )
-                    if transformed_data:
-                        DATA_HANDLERS[EventEnum.ACCOUNT_CREATION](transformed_data)
-                        self.start_account_indexer(transformed_data.account_address)
-                        logger.info(
-                            (
-                                "Account created for address "
-                                f"'{transformed_data.account_address}'"
-                            )
-                        )
-                    else:
-                        account_address = felt.to_hex(event.data[0])
-                        logger.error(
-                            (
-                                "Failed to handle account creation event"
-                                f"of address '{account_address}'"
-                            )
-                        )
+                )
+        return grouped_events
+
+    def persist_block(
+        self, block_number: int, grouped_events: Dict[EventEnum, List[BaseEventModel]]
+    ):
+        """
+        Persist the events of a block and its cursor in a single transaction,
+        one bulk write per event type.
+        Runs on the thread of the `ThreadBlockWriter`, in its app context.
+        """
+        with transactional():
+            for event_enum, events in grouped_events.items():
+                DATA_HANDLERS[event_enum](events)
+                logger.info(f"{len(events)} events of type '{event_enum.name}' handled")
+            IndexerService.save_cursor(self.indexer_id(), block_number)
+
+    async def persist_block_async(
+        self,
+        connection: AsyncConnection,
+        block_number: int,
+        grouped_events: Dict[EventEnum, List[BaseEventModel]],
+    ) -> set:
+        """
+        Persist the events of a block and its cursor in the transaction of
+        the `AsyncBlockWriter` connection.
+        Returns the addresses of the members whose accounts changed.
+        """
+        member_addresses = set()
+        for event_enum, events in grouped_events.items():
+            member_addresses |= await ASYNC_DATA_HANDLERS[event_enum](
+                connection, events
+            )
+            logger.info(f"{len(events)} events of type '{event_enum.name}' handled")
+        await save_cursor(connection, self.indexer_id(), block_number)
+        return member_addresses
 
     async def handle_invalidate(self, _info: Info, _cursor: Cursor):
         raise ValueError("data must be finalized")
 
 
+def create_block_writer(indexer: SpherreMainIndexer) -> BlockWriter:
+    """
+    Create the block writer selected by `INDEXER_WRITER`
+    """
+    if WRITER == "thread":
+        return ThreadBlockWriter(
+            indexer.app, indexer.persist_block, max_in_flight=MAX_IN_FLIGHT_BLOCKS
+        )
+    if WRITER == "async":
+        return AsyncBlockWriter(
+            indexer.app.config["SQLALCHEMY_DATABASE_URI"],
+            indexer.persist_block_async,
+            app=indexer.app,
+            max_in_flight=MAX_IN_FLIGHT_BLOCKS,
+        )
+    raise ValueError(f"Unknown indexer writer '{WRITER}'")
+
+
+class SpherreIndexerRunner(IndexerRunner):
+    """
+    Indexer runner resuming the stream from the last block committed to the
+    database.
+    apibara saves the cursor of a block in its storage as soon as
+    `handle_data` returns, while the block may still be queued in the block
+    writer or held until its rescan, and on (re)connect that saved cursor
+    overrides the starting cursor of `initial_configuration`. Before each
+    connection the indexer is reset to the database and the saved cursor is
+    replaced with the database cursor, so no uncommitted block is skipped.
+    """
+
+    async def _connect_and_stream(self, indexer: SpherreMainIndexer, ctx):
+        await indexer.reset()
+        self._indexer_storage._update_cursor(indexer.starting_cursor())
+        await super()._connect_and_stream(indexer, ctx)
+
+
 def run_in_thread(self):
     pass
 
@@ -125,13 +304,24 @@ async def run_indexer(
 async def run_main_indexer(
     server_url=None, mongo_url=None, restart=None, dna_token=None
 ):
-    runner = IndexerRunner(
+    runner = SpherreIndexerRunner(
         config=IndexerRunnerConfiguration(
             stream_url=server_url,
             storage_url=mongo_url,
             token=dna_token,
         ),
         reset_state=restart,
+        # the filter stored by apibara is replaced by the one rebuilt from
+        # the accounts table
+        _force_filter_from_script=True,
     )
 
-    await runner.run(SpherreMainIndexer(), ctx={"network": NETWORK})
+    app = create_app(APP_CONFIG)
+    indexer = SpherreMainIndexer(app)
+    try:
+        await runner.run(indexer, ctx={"network": NETWORK})
+    finally:
+        # a held block is not submitted, the next run resumes from the
+        # database cursor and streams it again
+        await indexer.writer.close()
+        logger.info(f"Stream filter metrics: {indexer.filters.metrics()}")
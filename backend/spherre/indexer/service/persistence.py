@@ -0,0 +1,430 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from flask import Flask
+from loguru import logger
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from spherre.app.models.account import Account, Member, account_members
+from spherre.app.models.base import generate_uuid, insert_ignore
+from spherre.app.models.indexer import IndexerCursor
+from spherre.app.utils.response_cache import get_response_cache, member_tag
+
+# the events of a block grouped by event type
+GroupedEvents = Dict[Any, List[Any]]
+
+
+class BlockWriter:
+    """
+    Persists the blocks of an indexer off the asyncio stream consumer.
+    Blocks are queued and written one after the other in stream order by
+    a writer task, so the consumer only waits when `max_in_flight` blocks
+    are already queued or being written.
+    A failed write stops the writer and is raised by the next `submit` or
+    `drain`, so no later block is committed after a failed one.
+
+    Args:
+        max_in_flight: Number of blocks queued or being written at most
+    """
+
+    def __init__(self, max_in_flight: int = 4):
+        self.max_in_flight = max_in_flight
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self._metrics = {
+            "written": 0,
+            "last_block": None,
+            "submit_wait_total": 0.0,
+            "submit_wait_max": 0.0,
+            "write_time_total": 0.0,
+        }
+
+    async def submit(self, block_number: int, grouped_events: GroupedEvents):
+        """
+        Queue a block for writing, waiting while the queue is full.
+        """
+        self._raise_error()
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_in_flight)
+            self._task = asyncio.create_task(self._run())
+        started = time.perf_counter()
+        await self._queue.put((block_number, grouped_events))
+        waited = time.perf_counter() - started
+        self._metrics["submit_wait_total"] += waited
+        self._metrics["submit_wait_max"] = max(self._metrics["submit_wait_max"], waited)
+
+    async def drain(self):
+        """
+        Wait until every queued block is written.
+        """
+        if self._queue is not None:
+            done = asyncio.create_task(self._queue.join())
+            # the writer task only ends on failure, stop waiting then
+            await asyncio.wait({done, self._task}, return_when=asyncio.FIRST_COMPLETED)
+            done.cancel()
+        self._raise_error()
+
+    async def close(self):
+        """
+        Write the queued blocks and stop the writer.
+        """
+        try:
+            await self.drain()
+        finally:
+            if self._task is not None:
+                self._task.cancel()
+                self._task = None
+            await self._close()
+
+    def metrics(self) -> dict:
+        """
+        Get the counters of the writer.
+
+        Returns:
+            dict: The number of blocks written, the last written block, the
+                blocks queued, the average and maximum time the consumer
+                waited on a full queue and the average write time in seconds
+        """
+        metrics = dict(self._metrics)
+        submitted = metrics["written"] + self.pending
+        wait_total = metrics.pop("submit_wait_total")
+        write_total = metrics.pop("write_time_total")
+        metrics["pending"] = self.pending
+        metrics["submit_wait_avg"] = wait_total / submitted if submitted else 0.0
+        metrics["write_time_avg"] = (
+            write_total / metrics["written"] if metrics["written"] else 0.0
+        )
+        return metrics
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self):
+        while True:
+            block_number, grouped_events = await self._queue.get()
+            try:
+                started = time.perf_counter()
+                await self._write(block_number, grouped_events)
+                self._metrics["write_time_total"] += time.perf_counter() - started
+                self._metrics["written"] += 1
+                self._metrics["last_block"] = block_number
+            except BaseException as e:
+                logger.error(f"Failed to persist block {block_number}: {e}")
+                self._error = e
+                raise
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("The block writer failed") from self._error
+
+    async def _write(self, block_number: int, grouped_events: GroupedEvents):
+        raise NotImplementedError
+
+    async def _close(self):
+        pass
+
+
+class BlockSequencer:
+    """
+    Submits the blocks of the stream to a block writer in stream order.
+    Blocks up to the cursor are skipped, and a block that is streamed again
+    after a filter update is held until its rescan arrives so it is
+    submitted once with the events of the new accounts.
+    The cursor is the last block submitted, it runs ahead of the database
+    while blocks are queued in the writer, and a held block is never
+    committed before it is submitted. `reset` brings both back to the
+    database, e.g. before the stream resumes from the database cursor.
+
+    Args:
+        writer: The writer of the blocks
+        cursor: The last block committed to the database
+    """
+
+    def __init__(self, writer: BlockWriter, cursor: Optional[int] = None):
+        self.writer = writer
+        self.cursor = cursor
+        self._held: Optional[tuple[int, GroupedEvents]] = None
+
+    @property
+    def held_block(self) -> Optional[int]:
+        return self._held[0] if self._held is not None else None
+
+    async def start_block(self, block_number: int) -> bool:
+        """
+        Start handling a block of the stream. A held block whose rescan did
+        not come is submitted first.
+
+        Returns:
+            bool: False if the block was already submitted
+        """
+        await self.submit_held()
+        return self.cursor is None or block_number > self.cursor
+
+    def hold(self, block_number: int, grouped_events: GroupedEvents):
+        """
+        Hold a block until it is streamed again
+        """
+        self._held = (block_number, grouped_events)
+
+    async def rescan(self, grouped_events: GroupedEvents):
+        """
+        Add the events of the rescan to the held block and submit it
+        """
+        for key, events in grouped_events.items():
+            self._held[1].setdefault(key, []).extend(events)
+        await self.submit_held()
+
+    async def submit_held(self):
+        if self._held is not None:
+            block_number, grouped_events = self._held
+            self._held = None
+            await self.submit(block_number, grouped_events)
+
+    async def submit(self, block_number: int, grouped_events: GroupedEvents):
+        # waits only while `max_in_flight` blocks are pending
+        await self.writer.submit(block_number, grouped_events)
+        self.cursor = block_number
+
+    async def reset(self, cursor: Callable[[], Optional[int]]):
+        """
+        Wait for the queued blocks to be written, drop the held block and
+        reload the cursor.
+
+        Args:
+            cursor: Gets the last block committed to the database
+        """
+        await self.writer.drain()
+        if self._held is not None:
+            logger.info(f"Held block {self._held[0]} dropped, it is streamed again")
+            self._held = None
+        self.cursor = cursor()
+
+
+class ThreadBlockWriter(BlockWriter):
+    """
+    Block writer running the synchronous app services on a dedicated
+    thread. The thread keeps an app context pushed for its lifetime, so it
+    gets its own scoped session, separate from the event loop thread.
+
+    Args:
+        app: The app whose services persist the blocks
+        persist: Writes a block and its cursor in one transaction, called
+            with the block number and the grouped events
+        max_in_flight: Number of blocks queued or being written at most
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        persist: Callable[[int, GroupedEvents], None],
+        max_in_flight: int = 4,
+    ):
+        super().__init__(max_in_flight)
+        self.app = app
+        self.persist = persist
+        self._contexts = []
+        # a single thread, blocks are committed in stream order
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="indexer-writer",
+            initializer=self._push_app_context,
+        )
+
+    def _push_app_context(self):
+        context = self.app.app_context()
+        context.push()
+        self._contexts.append((threading.get_ident(), context))
+
+    def _pop_app_context(self):
+        for ident, context in self._contexts:
+            if ident == threading.get_ident():
+                context.pop()
+
+    async def _write(self, block_number: int, grouped_events: GroupedEvents):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._executor, self.persist, block_number, grouped_events
+        )
+
+    async def _close(self):
+        if self._contexts:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._pop_app_context)
+        self._executor.shutdown()
+
+
+class AsyncBlockWriter(BlockWriter):
+    """
+    Block writer on the SQLAlchemy asyncio engine, writing with Core
+    statements from the event loop without blocking it.
+
+    Args:
+        database_url: The database url of the app, its driver is swapped
+            for the asyncio one, see `async_database_url`
+        persist: Writes a block and its cursor, called with the connection
+            of the block transaction, the block number and the grouped events
+        app: The app whose response cache is invalidated after each block
+        max_in_flight: Number of blocks queued or being written at most
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        persist: Callable[[AsyncConnection, int, GroupedEvents], Awaitable[set]],
+        app: Optional[Flask] = None,
+        max_in_flight: int = 4,
+    ):
+        super().__init__(max_in_flight)
+        self.engine = create_async_engine(async_database_url(database_url))
+        self.persist = persist
+        self.app = app
+
+    async def _write(self, block_number: int, grouped_events: GroupedEvents):
+        async with self.engine.begin() as connection:
+            member_addresses = await self.persist(
+                connection, block_number, grouped_events
+            )
+        if self.app is not None and member_addresses:
+            with self.app.app_context():
+                cache = get_response_cache()
+                if cache is not None:
+                    for address in member_addresses:
+                        cache.invalidate_tag(member_tag(address))
+
+    async def _close(self):
+        await self.engine.dispose()
+
+
+def async_database_url(url: str) -> str:
+    """
+    Swap the driver of a database url for its asyncio driver,
+    asyncpg for Postgres and aiosqlite for SQLite.
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        return url.set(drivername="postgresql+asyncpg").render_as_string(
+            hide_password=False
+        )
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(
+            hide_password=False
+        )
+    raise ValueError(f"No asyncio driver for database '{backend}'")
+
+
+async def create_accounts(connection: AsyncConnection, accounts: List[dict]) -> set:
+    """
+    Create the accounts not created yet and their members with Core
+    statements, the asyncio counterpart of `AccountService.create_accounts`.
+
+    Args:
+        connection: The connection of the block transaction
+        accounts: The accounts to create, each with its `address`, `name`,
+            `threshold`, `members` and optional `description`
+
+    Returns:
+        set: The addresses of the members of the created accounts
+    """
+    dialect = connection.dialect.name
+    existing = set(
+        (
+            await connection.execute(
+                select(Account.address).where(
+                    Account.address.in_([data["address"] for data in accounts])
+                )
+            )
+        ).scalars()
+    )
+    # the first creation of an address in the block wins
+    unique = {}
+    for data in accounts:
+        if data["address"] not in existing:
+            unique.setdefault(data["address"], data)
+    accounts = list(unique.values())
+    if not accounts:
+        return set()
+
+    now = datetime.now()
+    addresses = list(
+        dict.fromkeys(address for data in accounts for address in data["members"])
+    )
+    if addresses:
+        await connection.execute(
+            insert_ignore(Member.__table__, dialect),
+            [
+                {
+                    "id": generate_uuid(),
+                    "address": address,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for address in addresses
+            ],
+        )
+    member_ids = dict(
+        (
+            await connection.execute(
+                select(Member.address, Member.id).where(Member.address.in_(addresses))
+            )
+        ).all()
+    )
+    rows = [
+        {
+            "id": generate_uuid(),
+            "address": data["address"],
+            "name": data["name"],
+            "description": data.get("description"),
+            "threshold": data["threshold"],
+            "member_count": len(set(data["members"])),
+            "created_at": now,
+            "updated_at": now,
+        }
+        for data in accounts
+    ]
+    await connection.execute(insert(Account.__table__), rows)
+    memberships = [
+        {"account_id": row["id"], "member_id": member_ids[address]}
+        for row, data in zip(rows, accounts)
+        for address in dict.fromkeys(data["members"])
+    ]
+    if memberships:
+        await connection.execute(account_members.insert(), memberships)
+    return set(addresses)
+
+
+async def save_cursor(connection: AsyncConnection, indexer_id: str, block_number: int):
+    """
+    The asyncio counterpart of `IndexerService.save_cursor`.
+
+    Raises:
+        ValueError: If the block, or a later one, was already persisted
+    """
+    table = IndexerCursor.__table__
+    result = await connection.execute(
+        update(table)
+        .where(table.c.indexer_id == indexer_id, table.c.block_number < block_number)
+        .values(block_number=block_number, updated_at=datetime.now())
+    )
+    if result.rowcount:
+        return
+    stored = await connection.scalar(
+        select(table.c.block_number).where(table.c.indexer_id == indexer_id)
+    )
+    if stored is not None:
+        raise ValueError("Block already persisted")
+    await connection.execute(
+        insert(table).values(
+            indexer_id=indexer_id, block_number=block_number, updated_at=datetime.now()
+        )
+    )
@@ -1,9 +1,9 @@
 from enum import Enum
-from typing import Any, List, get_args, get_origin
+from typing import List
 
 from apibara.starknet import felt
 from bidict import bidict
-from pydantic import BaseModel, ValidationInfo, field_validator
+from pydantic import BaseModel
 
 
 class EventEnum(Enum):
@@ -34,6 +34,11 @@ EVENT_SELECTORS = bidict(
 
 
 class BaseEventModel(BaseModel):
+    """
+    An event decoded from its data felts. The fields declare the layout of
+    the event data, see `EventDecoder`.
+    """
+
     def __init__(self, *args, **kwargs):
         if args and not kwargs:
             # If only positional args provided, map to fields
@@ -41,31 +46,6 @@ class BaseEventModel(BaseModel):
             kwargs = dict(zip(field_names, args))
         super().__init__(**kwargs)
 
-    @field_validator("*", mode="before")  # Apply to all fields
-    @classmethod
-    def restructure_data_before_parsing(cls, v: Any, info: ValidationInfo):
-        field_info = cls.model_fields[info.field_name]
-        field_type = field_info.annotation
-
-        print(f"\n{info.field_name}:")
-        print(f"  Annotation: {field_type}")
-
-        new_value = v
-
-        if isinstance(field_type, str):
-            new_value = felt.to_hex(v)
-            return new_value
-        elif isinstance(field_type, int):
-            new_value = felt.to_int(v)
-        elif get_origin(field_type):
-            args = get_args(field_type)
-            if isinstance(args, str):
-                new_value = [felt.to_hex(val) for val in v]
-            elif isinstance(args, int):
-                new_value = [felt.to_int(val) for val in v]
-
-        return new_value
-
 
 class AccountCreationEvent(BaseEventModel):
     account_address: str
@@ -0,0 +1,80 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from spherre.app import create_app
+from spherre.app.extensions import db
+from spherre.app.models import Member, transactional
+
+
+class TestTransactional(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_commits_once(self):
+        with patch.object(db.session, "commit", wraps=db.session.commit) as commit:
+            with transactional():
+                member = Member.create(address="0x123")
+                member.email = "test@example.com"
+                member.save()
+                Member.get_or_create(address="0x456")
+            assert commit.call_count == 1
+        assert Member.query.count() == 2
+        member = Member.query.filter_by(address="0x123").one()
+        assert member.email == "test@example.com"
+
+    def test_as_decorator(self):
+        @transactional()
+        def create_members():
+            Member.create(address="0x123")
+            Member.create(address="0x456")
+
+        with patch.object(db.session, "commit", wraps=db.session.commit) as commit:
+            create_members()
+            assert commit.call_count == 1
+        assert Member.query.count() == 2
+
+    def test_rolls_back_on_error(self):
+        with self.assertRaises(ValueError):
+            with transactional():
+                Member.create(address="0x123")
+                raise ValueError("failed")
+        assert Member.query.count() == 0
+
+    def test_nested_scopes_join_outer(self):
+        with patch.object(db.session, "commit", wraps=db.session.commit) as commit:
+            with transactional():
+                Member.create(address="0x123")
+                with transactional():
+                    Member.create(address="0x456")
+                assert commit.call_count == 0
+            assert commit.call_count == 1
+        assert Member.query.count() == 2
+
+    def test_swallowed_nested_error_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            with transactional():
+                Member.create(address="0x123")
+                try:
+                    with transactional():
+                        raise ValueError("failed")
+                except ValueError:
+                    pass
+        assert Member.query.count() == 0
+        # the session is usable again after the failed scope
+        Member.create(address="0x456")
+        assert Member.query.count() == 1
+
+    def test_commits_immediately_outside_scope(self):
+        with patch.object(db.session, "commit", wraps=db.session.commit) as commit:
+            Member.create(address="0x123")
+            Member.create(address="0x456")
+            assert commit.call_count == 2
@@ -1,7 +1,14 @@
+import re
+from datetime import datetime, timedelta
 from unittest import TestCase
 
+from sqlalchemy import event
+
 from spherre.app import create_app
 from spherre.app.extensions import db
+from spherre.app.models.account import Account, Member
+from spherre.app.models.transaction import TransactionStatus, TransactionType
+from spherre.app.service.transaction import TransactionService
 
 
 class TestTransactionModel(TestCase):
@@ -24,3 +31,128 @@ class TestTransactionModel(TestCase):
     def test_update_transaction_model(self):
         # TODO: write test case for updating transactions
         pass
+
+
+def explain(statement: str, parameters) -> list[str]:
+    """
+    Get the query plan lines of a statement on the current database.
+    """
+    connection = db.session.connection()
+    cursor = connection.connection.cursor()
+    try:
+        if connection.dialect.name == "postgresql":
+            # tiny test tables would otherwise always be sequentially scanned,
+            # reset after the EXPLAIN so it does not leak to the pooled
+            # connection
+            cursor.execute("SET enable_seqscan = off")
+            try:
+                cursor.execute(f"EXPLAIN {statement}", parameters)
+                return [row[0] for row in cursor.fetchall()]
+            finally:
+                cursor.execute("RESET enable_seqscan")
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def scans_transactions(plan: list[str]) -> bool:
+    """
+    Check if a plan reads the transactions table without an index lookup.
+    """
+    for line in plan:
+        if re.search(r"Seq Scan on transactions\b", line):
+            return True
+        if re.search(r"\bSCAN transactions\b", line):
+            return True
+    return False
+
+
+class TestTransactionIndexes(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.account = Account.create(address="0x123", name="Test Account", threshold=1)
+        self.member = Member.get_or_create(address="0x456")
+        self.account.members.append(self.member)
+        db.session.commit()
+        for i in range(3):
+            TransactionService.create_transaction(
+                transaction_id=i + 1,
+                account=self.account,
+                status=TransactionStatus.INITIATED,
+                tx_type=TransactionType.TOKEN_SEND,
+                proposer=self.member,
+                date_proposed=datetime.now(),
+            )
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def capture_transaction_queries(self, call) -> list[tuple]:
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, *args):
+            if statement.startswith("SELECT") and re.search(
+                r"FROM transactions\b(?! AS)", statement
+            ):
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            call()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+        return statements
+
+    def assert_uses_indexes(self, call):
+        statements = self.capture_transaction_queries(call)
+        assert statements
+        for statement, parameters in statements:
+            plan = explain(statement, parameters)
+            assert not scans_transactions(plan), (statement, plan)
+
+    def test_filtered_listing_uses_indexes(self):
+        now = datetime.now()
+        filters = [
+            {},
+            {"tx_type": TransactionType.TOKEN_SEND.value},
+            {"status": TransactionStatus.INITIATED},
+            {"proposer_address": self.member.address},
+            {"date_from": now - timedelta(days=1), "date_to": now},
+            {
+                "tx_type": TransactionType.TOKEN_SEND.value,
+                "status": TransactionStatus.INITIATED,
+            },
+            {"sort_by": "transaction_id", "sort_order": "asc"},
+            {"sort_by": "status"},
+            {"cursor": ""},
+        ]
+        for kwargs in filters:
+            self.assert_uses_indexes(
+                lambda: TransactionService.get_filtered_transactions(
+                    account=self.account, **kwargs
+                )
+            )
+
+    def test_cursor_page_uses_indexes(self):
+        result = TransactionService.get_filtered_transactions(
+            account=self.account, per_page=1, cursor=""
+        )
+        cursor = result["pagination"]["next_cursor"]
+        self.assert_uses_indexes(
+            lambda: TransactionService.get_filtered_transactions(
+                account=self.account, per_page=1, cursor=cursor
+            )
+        )
+
+    def test_transaction_lookup_uses_indexes(self):
+        self.assert_uses_indexes(
+            lambda: TransactionService.get_transaction(2, self.account)
+        )
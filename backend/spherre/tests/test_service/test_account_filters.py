@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from spherre.app import create_app
+from spherre.app.extensions import db
+from spherre.app.service.account import AccountService
+from spherre.indexer.service.filters import AccountFilterManager
+
+
+class TestAccountFilterManager(TestCase):
+    def test_load_rebuilds_the_watched_addresses(self):
+        filters = AccountFilterManager()
+        filters.watch(1, ["0x9"])
+        addresses = filters.load(["0x1", "0x2", "0x01"])
+        # "0x01" is the address "0x1"
+        self.assertEqual(addresses, ["0x1", "0x2"])
+        self.assertEqual(len(filters), 2)
+        self.assertFalse(filters.is_watched("0x9"))
+        self.assertTrue(filters.is_watched("0x0002"))
+        self.assertEqual(filters.metrics()["loaded"], 2)
+
+    def test_accounts_of_a_block_are_coalesced(self):
+        filters = AccountFilterManager()
+        filters.load(["0x1"])
+        self.assertEqual(
+            filters.watch(10, ["0x1", "0x2", "0x3", "0x2"]), ["0x2", "0x3"]
+        )
+        # nothing new, no filter update
+        self.assertEqual(filters.watch(11, ["0x3", "0x1"]), [])
+        self.assertEqual(filters.watch(12, []), [])
+        self.assertEqual(filters.watch(20, ["0x4"]), ["0x4"])
+        self.assertEqual(
+            filters.watch(40, ["0x5", "0x6", "0x7"]), ["0x5", "0x6", "0x7"]
+        )
+
+        metrics = filters.metrics()
+        self.assertEqual(metrics["watched"], 7)
+        self.assertEqual(metrics["updates"], 3)
+        self.assertEqual(metrics["addresses_added"], 6)
+        self.assertEqual(metrics["largest_update"], 3)
+        self.assertEqual(metrics["first_update_block"], 10)
+        self.assertEqual(metrics["last_update_block"], 40)
+        self.assertEqual(metrics["blocks_per_update"], 15)
+        self.assertIsNotNone(metrics["last_update_at"])
+
+    def test_metrics_without_updates(self):
+        metrics = AccountFilterManager().metrics()
+        self.assertEqual(metrics["watched"], 0)
+        self.assertEqual(metrics["updates"], 0)
+        self.assertIsNone(metrics["blocks_per_update"])
+        self.assertIsNone(metrics["last_update_at"])
+
+
+class TestAccountAddresses(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_get_account_addresses(self):
+        self.assertEqual(AccountService.get_account_addresses(), [])
+        AccountService.create_accounts(
+            [
+                {"address": address, "name": "Account", "threshold": 1, "members": []}
+                for address in ("0x1", "0x2", "0x3")
+            ]
+        )
+        self.assertEqual(
+            sorted(AccountService.get_account_addresses()), ["0x1", "0x2", "0x3"]
+        )
@@ -1,9 +1,17 @@
 from unittest import TestCase
 
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
 from spherre.app import create_app
 from spherre.app.extensions import db
 from spherre.app.models.account import Account, Member
 from spherre.app.service.account import AccountService
+from spherre.app.utils.access_cache import (
+    AccountAccess,
+    AccountAccessCache,
+    get_account_access_cache,
+)
 
 
 class TestAccountService(TestCase):
@@ -95,6 +103,25 @@ class TestAccountService(TestCase):
         assert len(account.members) == 2
         assert any(member.address == "0x789" for member in account.members)
 
+    def test_add_member_to_account_commits_once(self):
+        AccountService.create_account(
+            address="0x123", name="Test Account", threshold=1.0, members=["0x456"]
+        )
+        commits = []
+
+        def record(session):
+            commits.append(session)
+
+        session = db.session()
+        event.listen(session, "after_commit", record)
+        try:
+            # the member is created in the same transaction
+            AccountService.add_member_to_account("0x123", "0x789")
+        finally:
+            event.remove(session, "after_commit", record)
+        assert len(commits) == 1
+        assert Member.query.filter_by(address="0x789").count() == 1
+
     def test_remove_member_from_account(self):
         AccountService.create_account(
             address="0x123",
@@ -160,3 +187,194 @@ class TestAccountService(TestCase):
         account = AccountService.toggle_account_privacy("0x123")
         assert account is not None
         assert account.is_private is True
+
+    def test_get_account_access_is_cached(self):
+        AccountService.create_account(
+            address="0x123",
+            name="Test Account",
+            threshold=1.0,
+            members=["0x456", "0x789"],
+            description="This is a test account",
+        )
+        cache = get_account_access_cache()
+        access = AccountService.get_account_access("0x123")
+        assert access is not None
+        assert access.is_private is True
+        assert access.members == frozenset({"0x456", "0x789"})
+        assert AccountService.get_account_access("0x123") == access
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+    def test_get_account_access_unknown_account(self):
+        assert AccountService.get_account_access("0x999") is None
+
+    def test_account_access_invalidated_on_account_updates(self):
+        AccountService.create_account(
+            address="0x123",
+            name="Test Account",
+            threshold=1.0,
+            members=["0x456"],
+            description="This is a test account",
+        )
+        AccountService.get_account_access("0x123")
+
+        AccountService.add_member_to_account("0x123", "0x789")
+        access = AccountService.get_account_access("0x123")
+        assert access.members == frozenset({"0x456", "0x789"})
+
+        AccountService.remove_member_from_account("0x123", "0x456")
+        access = AccountService.get_account_access("0x123")
+        assert access.members == frozenset({"0x789"})
+
+        AccountService.toggle_account_privacy("0x123")
+        access = AccountService.get_account_access("0x123")
+        assert access.is_private is False
+        assert get_account_access_cache().stats()["invalidations"] == 3
+
+    def test_account_access_expires(self):
+        AccountService.create_account(
+            address="0x123",
+            name="Test Account",
+            threshold=1.0,
+            members=["0x456"],
+            description="This is a test account",
+        )
+        cache = get_account_access_cache()
+        now = [0.0]
+        cache._clock = lambda: now[0]
+        AccountService.get_account_access("0x123")
+        now[0] += cache.ttl + 1
+        AccountService.get_account_access("0x123")
+        assert cache.stats()["misses"] == 2
+        assert cache.stats()["hits"] == 0
+
+    def test_account_access_cache_is_bounded(self):
+        cache = AccountAccessCache(max_entries=2)
+        access = AccountAccess(is_private=False, members=frozenset())
+        cache.set("0x1", access)
+        cache.set("0x2", access)
+        cache.get("0x1")
+        cache.set("0x3", access)
+        assert cache.get("0x1") == access
+        assert cache.get("0x2") is None
+        assert cache.stats()["size"] == 2
+        assert cache.stats()["evictions"] == 1
+
+    def test_is_account_member(self):
+        AccountService.create_account(
+            address="0x123",
+            name="Test Account",
+            threshold=1.0,
+            members=["0x456", "0x789"],
+            description="This is a test account",
+        )
+        Member.get_or_create(address="0xabc")
+        assert AccountService.is_account_member("0x123", "0x456") is True
+        assert AccountService.is_account_member("0x123", "0xabc") is False
+        assert AccountService.is_account_member("0x123", "0xdef") is False
+        assert AccountService.is_account_member("0x999", "0x456") is False
+
+    def test_filter_members(self):
+        AccountService.create_account(
+            address="0x123",
+            name="Test Account",
+            threshold=1.0,
+            members=["0x456", "0x789"],
+            description="This is a test account",
+        )
+        AccountService.create_account(
+            address="0x321",
+            name="Other Account",
+            threshold=1.0,
+            members=["0xabc"],
+        )
+        members = AccountService.filter_members(
+            "0x123", ["0x456", "0xabc", "0xdef", "0x789"]
+        )
+        assert members == {"0x456", "0x789"}
+        assert AccountService.filter_members("0x123", []) == set()
+
+    def test_create_accounts(self):
+        existing = Member.get_or_create(address="0x456")
+        accounts = AccountService.create_accounts(
+            [
+                {
+                    "address": "0x123",
+                    "name": "First Account",
+                    "threshold": 1,
+                    "members": ["0x456", "0x789", "0x789"],
+                },
+                {
+                    "address": "0x321",
+                    "name": "Second Account",
+                    "threshold": 2,
+                    "members": ["0x789", "0xabc"],
+                    "description": "Second",
+                },
+            ]
+        )
+        assert [account.address for account in accounts] == ["0x123", "0x321"]
+        assert Member.query.count() == 3
+        first_members = {member.address for member in accounts[0].members}
+        assert first_members == {"0x456", "0x789"}
+        assert existing in accounts[0].members
+        second_members = {member.address for member in accounts[1].members}
+        assert second_members == {"0x789", "0xabc"}
+        assert accounts[1].description == "Second"
+
+    def test_create_accounts_rolls_back_on_error(self):
+        AccountService.create_account(
+            address="0x123",
+            name="Test Account",
+            threshold=1.0,
+            members=["0x456"],
+        )
+        with self.assertRaises(IntegrityError):
+            AccountService.create_accounts(
+                [
+                    {
+                        "address": "0x321",
+                        "name": "New Account",
+                        "threshold": 1,
+                        "members": ["0x789"],
+                    },
+                    {
+                        "address": "0x123",
+                        "name": "Duplicate Account",
+                        "threshold": 1,
+                        "members": ["0x456"],
+                    },
+                ]
+            )
+        assert Account.query.count() == 1
+        assert Member.query.filter_by(address="0x789").one_or_none() is None
+
+    def test_member_count_is_maintained(self):
+        account = AccountService.create_account(
+            address="0x123",
+            name="Test Account",
+            threshold=1.0,
+            members=["0x456", "0x789"],
+        )
+        assert account.member_count == 2
+        account = AccountService.add_member_to_account("0x123", "0xabc")
+        assert account.member_count == 3
+        account = AccountService.remove_member_from_account("0x123", "0x456")
+        assert account.member_count == 2
+
+    def test_recompute_member_counts(self):
+        AccountService.create_account(
+            address="0x123",
+            name="Test Account",
+            threshold=1.0,
+            members=["0x456", "0x789"],
+        )
+        db.session.execute(db.update(Account).values(member_count=7))
+        db.session.commit()
+
+        assert AccountService.recompute_member_counts() == 1
+        account = AccountService.get_account_by_address("0x123")
+        db.session.refresh(account)
+        assert account.member_count == 2
+        assert AccountService.recompute_member_counts() == 0
@@ -1,10 +1,12 @@
 from unittest import TestCase
 
 from flask_jwt_extended import decode_token
+from starknet_py.utils.typed_data import TypedData
 
 from spherre.app import create_app
 from spherre.app.extensions import db
 from spherre.app.service.auth import AuthService
+from spherre.app.utils.signature import LoginMessage, SignatureUtils
 
 
 def is_jwt_token(token: str) -> bool:
@@ -46,3 +48,42 @@ class TestAuthService(TestCase):
             address
             == "0x4809f483eca7515a989e9ad1509708563bbdd972af975ffcc8fbd193aa47710"
         )
+
+    def test_login_message_hash_matches_typed_data(self):
+        typed_data = TypedData(**SignatureUtils.login_typed_data_format(nonce=0xABC))
+        login_message = SignatureUtils.login_message()
+        self.assertEqual(
+            login_message.message_hash(0x123, 0xABC), typed_data.message_hash(0x123)
+        )
+        self.assertNotEqual(
+            login_message.message_hash(0x123, 0xABD), typed_data.message_hash(0x123)
+        )
+        # cached per domain
+        self.assertIs(SignatureUtils.login_message(), login_message)
+        self.app.config["CHAIN_ID"] = "SN_MAIN"
+        other = SignatureUtils.login_message()
+        self.assertIsNot(other, login_message)
+        self.assertNotEqual(
+            other.message_hash(0x123, 0xABC), login_message.message_hash(0x123, 0xABC)
+        )
+
+    def test_login_message_known_hash(self):
+        # pins the hash signed by wallets, across starknet_py upgrades
+        typed_data = TypedData(
+            **SignatureUtils.login_typed_data_format("Spherre", "SN_SEPOLIA", "1")
+        )
+        self.assertEqual(
+            LoginMessage(typed_data).message_hash(0x123, 0xABC),
+            0x2AFC42E758B4FB5FD4E3BF167D386743326F050DC6BD6C620FA3D6F9FD84ECD,
+        )
+
+    def test_signin_challenge_nonce_is_single_use(self):
+        challenge = AuthService.create_signin_challenge()
+        self.assertEqual(challenge["expires_in"], self.app.config["NONCE_TTL"])
+        nonce = int(challenge["nonce"], 16)
+        # invalid signatures leave the nonce usable
+        self.assertIsNone(AuthService.verify_signin([1, 2], 0x123, nonce))
+        store = self.app.extensions["nonce_store"]
+        self.assertTrue(store.consume(nonce))
+        with self.assertRaises(ValueError):
+            AuthService.verify_signin([1, 2], 0x123, nonce)
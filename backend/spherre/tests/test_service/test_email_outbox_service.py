@@ -0,0 +1,178 @@
+import socket
+import unittest
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from spherre.app import create_app
+from spherre.app.extensions import db
+from spherre.app.models import (
+    Account,
+    EmailOutbox,
+    EmailStatus,
+    Member,
+    NotificationPreference,
+    NotificationType,
+)
+from spherre.app.service.email_outbox import EmailOutboxService
+from spherre.app.service.notification import NotificationService
+from spherre.app.utils.email import Mailer, SMTPMailer
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+class RecordingMailer(Mailer):
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def send_batch(self, emails):
+        self.batches.append(emails)
+        return {email.id: self.error for email in emails}
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+class TestEmailOutboxService(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config.update(
+            EMAIL_BATCH_SIZE=2, EMAIL_DISPATCHER_CONNECTIONS=4, EMAIL_MAX_ATTEMPTS=2
+        )
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.account = Account(id=str(uuid4()), name="Test", address="0x123344")
+        members = [
+            Member(id=str(uuid4()), email="enabled@example.com", address="0x1"),
+            Member(id=str(uuid4()), email="disabled@example.com", address="0x2"),
+            Member(id=str(uuid4()), email=None, address="0x3"),
+            Member(id=str(uuid4()), email="default@example.com", address="0x4"),
+        ]
+        self.account.members = members
+        db.session.add_all([self.account, *members])
+        db.session.add_all(
+            [
+                NotificationPreference(
+                    account_id=self.account.id,
+                    member_id=members[0].id,
+                    email_enabled=True,
+                ),
+                NotificationPreference(
+                    account_id=self.account.id,
+                    member_id=members[1].id,
+                    email_enabled=False,
+                ),
+            ]
+        )
+        db.session.commit()
+        self.notification = NotificationService.create_notification(
+            account_id=self.account.id,
+            notification_type=NotificationType.TRANSACTION,
+            title="Title",
+            message="Message",
+        )
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_enqueue_filters_by_preference(self):
+        queued = NotificationService.send_notification_to_members(self.notification.id)
+        self.assertEqual(queued, 2)
+        recipients = {email.to_email for email in EmailOutbox.query.all()}
+        self.assertEqual(recipients, {"enabled@example.com", "default@example.com"})
+
+    def test_enqueue_unknown_notification(self):
+        with self.assertRaises(ValueError):
+            EmailOutboxService.enqueue_notification(str(uuid4()))
+
+    def test_dispatch_batches_per_connection(self):
+        for _ in range(3):
+            EmailOutboxService.enqueue_notification(self.notification.id)
+        mailer = RecordingMailer()
+        stats = EmailOutboxService.dispatch_pending(mailer)
+        self.assertEqual(stats, {"sent": 6, "retried": 0, "failed": 0})
+        self.assertEqual(sorted(len(batch) for batch in mailer.batches), [2, 2, 2])
+        self.assertEqual(
+            EmailOutbox.query.filter_by(status=EmailStatus.SENT).count(), 6
+        )
+        self.assertEqual(EmailOutboxService.queue_metrics()["pending"], 0)
+
+    def test_failed_emails_are_retried_with_backoff(self):
+        EmailOutboxService.enqueue_notification(self.notification.id)
+        mailer = RecordingMailer(error="550 Mailbox unavailable")
+        stats = EmailOutboxService.dispatch_pending(mailer)
+        self.assertEqual(stats, {"sent": 0, "retried": 2, "failed": 0})
+
+        email = EmailOutbox.query.first()
+        self.assertEqual(email.status, EmailStatus.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, "550 Mailbox unavailable")
+        self.assertGreater(email.next_attempt_at, datetime.now())
+        metrics = EmailOutboxService.queue_metrics()
+        self.assertEqual((metrics["pending"], metrics["due"]), (2, 0))
+
+        # not due yet
+        self.assertEqual(EmailOutboxService.dispatch_pending(mailer)["retried"], 0)
+
+        EmailOutbox.query.update(
+            {"next_attempt_at": datetime.now() - timedelta(seconds=1)}
+        )
+        db.session.commit()
+        stats = EmailOutboxService.dispatch_pending(mailer)
+        self.assertEqual(stats, {"sent": 0, "retried": 0, "failed": 2})
+        self.assertEqual(EmailOutboxService.queue_metrics()["failed"], 2)
+
+    @unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+    def test_smtp_delivery(self):
+        handler = RecordingHandler()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        controller = Controller(handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        self.addCleanup(controller.stop)
+        mailer = SMTPMailer(
+            host="127.0.0.1", port=port, sender="notifications@spherre.xyz"
+        )
+
+        EmailOutboxService.enqueue_notification(self.notification.id)
+        stats = EmailOutboxService.dispatch_pending(mailer)
+        self.assertEqual(stats["sent"], 2)
+        self.assertEqual(handler.connections, 1)
+        self.assertEqual(
+            sorted(envelope.rcpt_tos[0] for envelope in handler.messages),
+            ["default@example.com", "enabled@example.com"],
+        )
+
+    def test_unreachable_smtp_server(self):
+        EmailOutboxService.enqueue_notification(self.notification.id)
+        mailer = SMTPMailer(host="127.0.0.1", port=1, sender="a@b.c", timeout=1)
+        stats = EmailOutboxService.dispatch_pending(mailer)
+        self.assertEqual(stats["retried"], 2)
+
+    def test_dispatch_command(self):
+        EmailOutboxService.enqueue_notification(self.notification.id)
+        result = self.app.test_cli_runner().invoke(args=["dispatch-emails", "--once"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Sent 2", result.output)
+        self.assertIn("Queue: 0 pending", result.output)
@@ -0,0 +1,108 @@
+from collections import namedtuple
+from typing import List
+from unittest import TestCase
+
+from pydantic import BaseModel
+
+from spherre.indexer.service.decoders import EventDecoder, felt_to_hex, felt_to_int
+
+# the fields of the apibara FieldElement protobuf
+FieldElement = namedtuple("FieldElement", "lo_lo lo_hi hi_lo hi_hi")
+Event = namedtuple("Event", "data")
+
+MASK = (1 << 64) - 1
+
+
+def felt(value: int) -> FieldElement:
+    return FieldElement(
+        value >> 192 & MASK, value >> 128 & MASK, value >> 64 & MASK, value & MASK
+    )
+
+
+# the layout of AccountCreationEvent, whose module needs apibara
+class AccountCreated(BaseModel):
+    account_address: str
+    owner: str
+    name: str
+    description: str
+    members: List[str]
+    threshold: int
+    deployer: int
+    date_deployed: int
+
+
+class Approvals(BaseModel):
+    transaction_id: int
+    approvers: List[str]
+    weights: list[int]
+
+
+def account_created_data(members: list[int]) -> list[FieldElement]:
+    return [
+        felt(value)
+        for value in (0xACC, 0x0E, 0x4E414D45, 0x0, len(members), *members, 2, 7, 99)
+    ]
+
+
+class TestEventDecoder(TestCase):
+    def test_felt_conversions(self):
+        value = 0x49D36570D4E46F48E99674BD3FCC84644DDD6B96F7C741B1562B82F9E004DC7
+        self.assertEqual(felt_to_int(felt(value)), value)
+        self.assertEqual(felt_to_hex(felt(value)), "0x" + hex(value)[2:].rjust(64, "0"))
+        self.assertEqual(felt_to_hex(felt(1)), "0x" + "0" * 63 + "1")
+
+    def test_plan_is_compiled_once(self):
+        decoder = EventDecoder(AccountCreated)
+        self.assertEqual(
+            [name for name, _ in decoder.fixed],
+            ["account_address", "owner", "name", "description"],
+        )
+        self.assertEqual(
+            [(name, is_array) for name, _, is_array in decoder.variable],
+            [
+                ("members", True),
+                ("threshold", False),
+                ("deployer", False),
+                ("date_deployed", False),
+            ],
+        )
+
+    def test_decode(self):
+        decoder = EventDecoder(AccountCreated)
+        event = decoder(Event(account_created_data([0xA, 0xB, 0xC])))
+        self.assertIsInstance(event, AccountCreated)
+        self.assertEqual(event.account_address, felt_to_hex(felt(0xACC)))
+        self.assertEqual(event.name, felt_to_hex(felt(0x4E414D45)))
+        self.assertEqual(
+            event.members, [felt_to_hex(felt(member)) for member in (0xA, 0xB, 0xC)]
+        )
+        self.assertEqual(
+            (event.threshold, event.deployer, event.date_deployed), (2, 7, 99)
+        )
+
+    def test_decode_empty_array(self):
+        event = EventDecoder(AccountCreated).decode(account_created_data([]))
+        self.assertEqual(event.members, [])
+        self.assertEqual(event.threshold, 2)
+
+    def test_decode_consecutive_arrays(self):
+        data = [felt(value) for value in (5, 2, 0xA, 0xB, 2, 1, 3)]
+        event = EventDecoder(Approvals).decode(data)
+        self.assertEqual(event.transaction_id, 5)
+        self.assertEqual(len(event.approvers), 2)
+        self.assertEqual(event.weights, [1, 3])
+
+    def test_short_data(self):
+        decoder = EventDecoder(AccountCreated)
+        data = account_created_data([0xA, 0xB])
+        for short in (data[:3], data[:4], data[:6], data[:-1]):
+            with self.assertRaises(ValueError):
+                decoder.decode(short)
+            self.assertIsNone(decoder(Event(short)))
+
+    def test_unsupported_annotation(self):
+        class Unsupported(BaseModel):
+            amount: float
+
+        with self.assertRaises(TypeError):
+            EventDecoder(Unsupported)
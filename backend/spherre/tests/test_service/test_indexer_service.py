@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from spherre.app import create_app
+from spherre.app.extensions import db
+from spherre.app.models import Account, transactional
+from spherre.app.service.account import AccountService
+from spherre.app.service.indexer import IndexerService
+
+
+class TestIndexerService(TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_cursor_only_moves_forward(self):
+        self.assertIsNone(IndexerService.get_cursor("spherre"))
+        IndexerService.save_cursor("spherre", 10)
+        IndexerService.save_cursor("spherre", 12)
+        self.assertEqual(IndexerService.get_cursor("spherre"), 12)
+        with self.assertRaises(ValueError):
+            IndexerService.save_cursor("spherre", 12)
+        with self.assertRaises(ValueError):
+            IndexerService.save_cursor("spherre", 11)
+        self.assertEqual(IndexerService.get_cursor("spherre"), 12)
+        self.assertIsNone(IndexerService.get_cursor("other"))
+
+    def test_block_data_and_cursor_commit_together(self):
+        accounts = [
+            {"address": "0x1", "name": "A", "threshold": 1, "members": ["0xa"]},
+        ]
+        with transactional():
+            AccountService.create_accounts(accounts)
+            IndexerService.save_cursor("spherre", 10)
+
+        # replaying the block fails on the cursor and rolls back its data
+        with self.assertRaises(ValueError):
+            with transactional():
+                AccountService.create_accounts(
+                    [{"address": "0x2", "name": "B", "threshold": 1, "members": []}]
+                )
+                IndexerService.save_cursor("spherre", 10)
+        self.assertEqual([a.address for a in Account.query.all()], ["0x1"])
+        self.assertEqual(
+            AccountService.filter_existing_accounts(["0x1", "0x2"]), {"0x1"}
+        )
@@ -1,9 +1,17 @@
+from datetime import datetime, timedelta
 from unittest import TestCase
 from uuid import uuid4
 
 from spherre.app import create_app
 from spherre.app.extensions import db
 from spherre.app.models import Account, Member, Notification, NotificationType
+from spherre.app.models.notification import (
+    notification_inbox,
+    notification_readers,
+    notification_unread_counts,
+    notifications_archive,
+)
+from spherre.app.service.account import AccountService
 from spherre.app.service.notification import NotificationService
 
 
@@ -120,3 +128,303 @@ class TestNotificationService(TestCase):
         fetched = self.service.get_notification_by_id(notification.id)
         self.assertIsNotNone(fetched)
         self.assertEqual(fetched.title, "Welcome")
+
+    def create_account_with_member(self):
+        account = Account(id=self.account_id, name="TestAccount", address="0x123344")
+        account.members = [self.member]
+        db.session.add(account)
+        db.session.commit()
+        return account
+
+    def test_unread_counts_are_maintained(self):
+        account = self.create_account_with_member()
+        n1 = self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 1", "Info"
+        )
+        self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 2", "Info"
+        )
+        self.assertEqual(
+            self.service.get_unread_count(account.address, self.member.id), 2
+        )
+
+        self.service.mark_notification_as_read(n1.id, self.member.id)
+        # reading twice does not count twice
+        self.service.mark_notification_as_read(n1.id, self.member.id)
+        self.assertEqual(
+            self.service.get_unread_count(account.address, self.member.id), 1
+        )
+        self.assertIsNone(self.service.get_unread_count("0x999", self.member.id))
+
+    def test_new_member_counts_existing_notifications(self):
+        account = self.create_account_with_member()
+        self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 1", "Info"
+        )
+        AccountService.add_member_to_account(account.address, "0x777")
+        new_member = Member.query.filter_by(address="0x777").one()
+        self.assertEqual(self.service.get_unread_count("0x123344", new_member.id), 1)
+        self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 2", "Info"
+        )
+        self.assertEqual(self.service.get_unread_count("0x123344", new_member.id), 2)
+
+    def test_reconcile_unread_counts(self):
+        account = self.create_account_with_member()
+        n1 = self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 1", "Info"
+        )
+        self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 2", "Info"
+        )
+        # drift the counters behind the service's back
+        n1.read_by.append(self.member)
+        db.session.execute(db.delete(notification_unread_counts))
+        db.session.commit()
+        self.assertEqual(
+            self.service.get_unread_count(account.address, self.member.id), 0
+        )
+
+        self.assertEqual(self.service.reconcile_unread_counts(), 1)
+        self.assertEqual(
+            self.service.get_unread_count(account.address, self.member.id), 1
+        )
+        db.session.execute(db.update(notification_unread_counts).values(count=5))
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=["reconcile-unread-counts"])
+        self.assertIn("Repaired 1 unread notification counter(s)", result.output)
+        self.assertEqual(
+            self.service.get_unread_count(account.address, self.member.id), 1
+        )
+        self.assertEqual(self.service.reconcile_unread_counts(), 0)
+
+    def test_mark_notifications_as_read_by_ids(self):
+        account = self.create_account_with_member()
+        notifications = [
+            self.service.create_notification(
+                self.account_id, NotificationType.TRANSACTION, f"Tx {i}", "Info"
+            )
+            for i in range(4)
+        ]
+        self.service.mark_notification_as_read(notifications[0].id, self.member.id)
+
+        ids = [n.id for n in notifications[:3]]
+        marked = self.service.mark_notifications_as_read(
+            self.member.id, notification_ids=ids
+        )
+        # the notification already read is skipped
+        self.assertEqual(marked, 2)
+        self.assertEqual(
+            self.service.get_unread_count(account.address, self.member.id), 1
+        )
+        self.assertEqual(
+            self.service.mark_notifications_as_read(
+                self.member.id, notification_ids=ids
+            ),
+            0,
+        )
+        unread, _pagination = self.service.list_notifications_by_account(
+            self.account_id, unread_only=True, member_id=self.member.id
+        )
+        self.assertEqual([n.id for n in unread], [notifications[3].id])
+
+    def test_mark_notifications_as_read_up_to(self):
+        account = self.create_account_with_member()
+        old = self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Old", "Info"
+        )
+        old.created_at = datetime(2025, 1, 1)
+        db.session.commit()
+        self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "New", "Info"
+        )
+
+        marked = self.service.mark_notifications_as_read(
+            self.member.id, up_to=datetime(2025, 6, 1), account_id=self.account_id
+        )
+        self.assertEqual(marked, 1)
+        self.assertEqual(
+            self.service.get_unread_count(account.address, self.member.id), 1
+        )
+
+    def test_mark_notifications_as_read_errors(self):
+        with self.assertRaises(ValueError):
+            self.service.mark_notifications_as_read(self.member.id)
+        with self.assertRaises(ValueError):
+            self.service.mark_notifications_as_read("unknown", notification_ids=["1"])
+
+    def test_inbox_read_path(self):
+        account = self.create_account_with_member()
+        n1 = self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 1", "Info"
+        )
+        self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 2", "Info"
+        )
+        self.service.mark_notification_as_read(n1.id, self.member.id)
+        anti_join, _pagination = self.service.list_notifications_by_account(
+            self.account_id, unread_only=True, member_id=self.member.id
+        )
+
+        # enabling backfills the existing notifications with their read state
+        self.assertEqual(self.service.set_inbox_enabled(account.address, True), 2)
+        inbox, pagination = self.service.list_notifications_by_account(
+            self.account_id, unread_only=True, member_id=self.member.id
+        )
+        self.assertEqual([n.id for n in inbox], [n.id for n in anti_join])
+        self.assertEqual(pagination["total"], 1)
+
+        # new notifications, reads and members keep the inbox in sync
+        n3 = self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 3", "Info"
+        )
+        self.service.mark_notifications_as_read(
+            self.member.id, notification_ids=[n3.id]
+        )
+        AccountService.add_member_to_account(account.address, "0x777")
+        new_member = Member.query.filter_by(address="0x777").one()
+        inbox_rows = db.session.execute(
+            db.select(notification_inbox.c.member_id, notification_inbox.c.read)
+        ).all()
+        self.assertEqual(len(inbox_rows), 6)
+        self.assertEqual(
+            sum(1 for member, read in inbox_rows if member == self.member.id and read),
+            2,
+        )
+        inbox, _pagination = self.service.list_notifications_by_account(
+            self.account_id, unread_only=True, member_id=new_member.id
+        )
+        self.assertEqual(len(inbox), 3)
+
+        result = self.app.test_cli_runner().invoke(
+            args=["notification-inbox", account.address, "--disable"]
+        )
+        self.assertIn("Inbox disabled", result.output)
+        anti_join, _pagination = self.service.list_notifications_by_account(
+            self.account_id, unread_only=True, member_id=self.member.id
+        )
+        self.assertEqual(len(anti_join), 1)
+
+    def test_inbox_disabled_by_default(self):
+        self.create_account_with_member()
+        self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Tx 1", "Info"
+        )
+        self.assertEqual(
+            db.session.execute(
+                db.select(db.func.count()).select_from(notification_inbox)
+            ).scalar(),
+            0,
+        )
+
+    def test_list_notifications_ordering(self):
+        created = []
+        for i in range(3):
+            notification = self.service.create_notification(
+                self.account_id, NotificationType.TRANSACTION, f"Tx {i}", "Info"
+            )
+            notification.created_at = datetime(2025, 1, 1)
+            created.append(notification.id)
+        db.session.commit()
+        newest = self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Newest", "Info"
+        )
+
+        notifications, _pagination = self.service.list_notifications_by_account(
+            self.account_id
+        )
+        # newest first, ties broken by id
+        self.assertEqual(
+            [n.id for n in notifications], [newest.id, *sorted(created, reverse=True)]
+        )
+
+    def test_list_notifications_cursor(self):
+        account = self.create_account_with_member()
+        for i in range(5):
+            self.service.create_notification(
+                self.account_id, NotificationType.TRANSACTION, f"Tx {i}", "Info"
+            )
+        expected, _pagination = self.service.list_notifications_by_account(
+            self.account_id, unread_only=True, member_id=self.member.id
+        )
+        self.service.set_inbox_enabled(account.address, True)
+
+        # the inbox read path pages over the same keys
+        seen, cursor = [], ""
+        while cursor is not None:
+            notifications, pagination = self.service.list_notifications_by_account(
+                self.account_id,
+                per_page=2,
+                unread_only=True,
+                member_id=self.member.id,
+                cursor=cursor,
+                include_total=False,
+            )
+            self.assertIsNone(pagination["total"])
+            self.assertIsNone(pagination["current_page"])
+            seen += [n.id for n in notifications]
+            cursor = pagination["next_cursor"]
+        self.assertEqual(seen, [n.id for n in expected])
+
+        with self.assertRaises(ValueError):
+            self.service.list_notifications_by_account(self.account_id, cursor="x")
+
+    def test_archive_notifications(self):
+        account = self.create_account_with_member()
+        old = []
+        for i in range(5):
+            notification = self.service.create_notification(
+                self.account_id, NotificationType.TRANSACTION, f"Old {i}", "Info"
+            )
+            notification.created_at = datetime(2025, 1, 1 + i)
+            old.append(notification.id)
+        db.session.commit()
+        self.service.mark_notification_as_read(old[0], self.member.id)
+        recent = self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Recent", "Info"
+        )
+        self.service.set_inbox_enabled(account.address, True)
+
+        removed = self.service.archive_notifications(datetime(2025, 6, 1), chunk_size=2)
+        self.assertEqual(removed, 5)
+        self.assertEqual([n.id for n in Notification.query.all()], [recent.id])
+        archived = db.session.execute(
+            db.select(notifications_archive.c.id, notifications_archive.c.title)
+        ).all()
+        self.assertEqual(sorted(row.id for row in archived), sorted(old))
+        self.assertEqual(
+            db.session.execute(
+                db.select(db.func.count()).select_from(notification_readers)
+            ).scalar(),
+            0,
+        )
+        self.assertEqual(
+            db.session.execute(
+                db.select(db.func.count()).select_from(notification_inbox)
+            ).scalar(),
+            1,
+        )
+        # only the recent notification is left unread
+        self.assertEqual(
+            self.service.get_unread_count(account.address, self.member.id), 1
+        )
+        self.assertEqual(self.service.reconcile_unread_counts(), 0)
+
+    def test_retention_command_deletes(self):
+        notification = self.service.create_notification(
+            self.account_id, NotificationType.TRANSACTION, "Old", "Info"
+        )
+        notification.created_at = datetime.now() - timedelta(days=31)
+        db.session.commit()
+        result = self.app.test_cli_runner().invoke(
+            args=["notification-retention", "--days", "30", "--delete"]
+        )
+        self.assertIn("Deleted 1 notification(s) older than 30 day(s)", result.output)
+        self.assertEqual(Notification.query.count(), 0)
+        self.assertEqual(
+            db.session.execute(
+                db.select(db.func.count()).select_from(notifications_archive)
+            ).scalar(),
+            0,
+        )
@@ -4,6 +4,7 @@ from unittest import TestCase
 
 from spherre.app import create_app
 from spherre.app.extensions import db
+from spherre.app.models import transactional
 from spherre.app.models.smart_lock import LockStatus, SmartLock
 from spherre.app.service.smart_lock import SmartLockService
 
@@ -57,6 +58,21 @@ class TestSmartLockService(TestCase):
         assert db_lock is not None
         assert db_lock.token == "ETH"
 
+    def test_create_smart_lock_joins_enclosing_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transactional():
+                SmartLockService.create_smart_lock(
+                    lock_id=1,
+                    token="ETH",
+                    date_locked=datetime(2024, 8, 15),
+                    token_amount=Decimal("1"),
+                    lock_duration=60,
+                    account_address=TEST_ACCOUNT_ADDRESS,
+                )
+                # the smart lock is not committed before the outer scope ends
+                raise RuntimeError("failed")
+        assert SmartLock.query.filter_by(lock_id=1).first() is None
+
     def test_create_smart_lock_duplicate_lock_id(self):
         """Test creating smart lock with duplicate lock_id raises error."""
         test_date = datetime.now()
@@ -5,6 +5,7 @@ from spherre.app import create_app
 from spherre.app.extensions import db
 from spherre.app.models.account import Account, Member
 from spherre.app.models.transaction import (
+    Transaction,
     TransactionStatus,
     TransactionType,
 )
@@ -339,3 +340,103 @@ class TestTransactionService(TestCase):
         assert len(approved_token_send) == 1
         assert approved_token_send[0].status == TransactionStatus.APPROVED
         assert approved_token_send[0].tx_type == TransactionType.TOKEN_SEND
+
+    def test_vote_counts_are_maintained(self):
+        TransactionService.create_transaction(
+            transaction_id=1,
+            account=self.account,
+            status=TransactionStatus.INITIATED,
+            tx_type=TransactionType.TOKEN_SEND,
+            proposer=self.member1,
+            date_proposed=self.current_time,
+        )
+        transaction = TransactionService.approve_transaction(
+            1, self.account, self.member2
+        )
+        assert transaction.approval_count == 1
+        transaction = TransactionService.reject_transaction(
+            1, self.account, self.member3
+        )
+        assert transaction.rejection_count == 1
+        assert transaction.status == TransactionStatus.INITIATED
+        assert self.account.member_count == 3
+
+    def test_repair_counters_command(self):
+        transaction = TransactionService.create_transaction(
+            transaction_id=1,
+            account=self.account,
+            status=TransactionStatus.INITIATED,
+            tx_type=TransactionType.TOKEN_SEND,
+            proposer=self.member1,
+            date_proposed=self.current_time,
+        )
+        TransactionService.approve_transaction(1, self.account, self.member2)
+        db.session.execute(
+            db.update(Transaction).values(approval_count=0, rejection_count=5)
+        )
+        db.session.execute(db.update(Account).values(member_count=0))
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=["repair-counters"])
+        assert result.exit_code == 0
+        assert "Repaired 1 account(s) and 1 transaction(s)" in result.output
+
+        db.session.refresh(transaction)
+        db.session.refresh(self.account)
+        assert transaction.approval_count == 1
+        assert transaction.rejection_count == 0
+        assert self.account.member_count == 3
+
+    def test_apply_votes(self):
+        for transaction_id in (1, 2):
+            TransactionService.create_transaction(
+                transaction_id=transaction_id,
+                account=self.account,
+                status=TransactionStatus.INITIATED,
+                tx_type=TransactionType.TOKEN_SEND,
+                proposer=self.member1,
+                date_proposed=self.current_time,
+            )
+
+        transactions = TransactionService.apply_votes(
+            self.account,
+            [
+                (1, self.member2, True),
+                (1, self.member3, True),
+                (2, self.member2, True),
+                (2, self.member1, False),
+                (2, self.member3, False),
+            ],
+        )
+        assert [transaction.transaction_id for transaction in transactions] == [1, 2]
+        first, second = transactions
+        assert set(first.approved.all()) == {self.member2, self.member3}
+        assert first.approval_count == 2
+        assert second.approval_count == 1
+        assert second.rejection_count == 2
+        # two of three members rejected
+        assert second.status == TransactionStatus.REJECTED
+
+    def test_apply_votes_is_atomic(self):
+        TransactionService.create_transaction(
+            transaction_id=1,
+            account=self.account,
+            status=TransactionStatus.INITIATED,
+            tx_type=TransactionType.TOKEN_SEND,
+            proposer=self.member1,
+            date_proposed=self.current_time,
+        )
+        with self.assertRaises(ValueError):
+            TransactionService.apply_votes(
+                self.account,
+                [
+                    (1, self.member2, False),
+                    (1, self.member3, False),
+                    # the transaction is rejected by now
+                    (1, self.member2, True),
+                ],
+            )
+        transaction = TransactionService.get_transaction(1, self.account)
+        assert transaction.status == TransactionStatus.INITIATED
+        assert transaction.rejected.count() == 0
+        assert transaction.rejection_count == 0
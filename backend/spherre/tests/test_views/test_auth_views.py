@@ -1,3 +1,7 @@
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
 from unittest import TestCase
 
 from flask_jwt_extended import decode_token
@@ -10,7 +14,14 @@ from starknet_py.utils.typed_data import TypedData
 from spherre.app import create_app
 from spherre.app.extensions import db
 from spherre.app.service.auth import AuthService
+from spherre.app.utils.nonce_store import (
+    MemoryNonceStore,
+    NonceStoreFull,
+    RedisNonceStore,
+)
 from spherre.app.utils.signature import SignatureUtils
+from spherre.app.utils.verification_pool import VerificationPool, VerificationPoolBusy
+from spherre.tests.test_views.test_response_cache import FakeRedis
 
 
 def is_jwt_token(token: str) -> bool:
@@ -24,11 +35,11 @@ def is_jwt_token(token: str) -> bool:
         return False
 
 
-def generate_signin_signature(key_pair: KeyPair) -> list[int]:
+def generate_signin_signature(key_pair: KeyPair, nonce: str) -> list[int]:
     """
-    Generate a signin signature for the given public key
+    Generate a signin signature of the challenge nonce for the given public key
     """
-    typed_data_dict = SignatureUtils.login_typed_data_format()
+    typed_data_dict = SignatureUtils.login_typed_data_format(nonce=int(nonce, 16))
 
     typed_data = TypedData(**typed_data_dict)
     account = Account(
@@ -47,6 +58,11 @@ def generate_signin_signature(key_pair: KeyPair) -> list[int]:
     return signer.sign_message(typed_data, account.address)
 
 
+def _sleep(seconds: float, queued_at: float) -> tuple:
+    time.sleep(seconds)
+    return seconds, 0.0
+
+
 class TestAuthViews(TestCase):
     def setUp(self):
         self.app = create_app()
@@ -60,13 +76,20 @@ class TestAuthViews(TestCase):
         db.drop_all()
         self.ctx.pop()
 
-    def test_signin(self):
-        key_pair = KeyPair.generate()
-        signature = generate_signin_signature(key_pair)
-        data = {
-            "signatures": signature,
+    def signin_data(self, key_pair: KeyPair) -> dict:
+        """
+        Request a sign in challenge and sign it
+        """
+        nonce = self.client.post("/api/v1/auth/challenge").json["nonce"]
+        return {
+            "signatures": generate_signin_signature(key_pair, nonce),
             "public_key": hex(key_pair.public_key),
+            "nonce": nonce,
         }
+
+    def test_signin(self):
+        key_pair = KeyPair.generate()
+        data = self.signin_data(key_pair)
         res = self.client.post("/api/v1/auth/signin", json=data)
         assert res.status_code == 200
         address = AuthService.generate_address_from_public_key(hex(key_pair.public_key))
@@ -76,20 +99,192 @@ class TestAuthViews(TestCase):
 
     def test_signin_invalid_signature(self):
         key_pair = KeyPair.generate()
-        signature = [1, 2]
-        data = {
-            "signatures": signature,
-            "public_key": hex(key_pair.public_key),
-        }
+        data = self.signin_data(key_pair)
+        data["signatures"] = [1, 2]
         res = self.client.post("/api/v1/auth/signin", json=data)
         assert res.status_code == 400
 
     def test_signin_invalid_public_key(self):
         key_pair = KeyPair.generate()
-        signature = generate_signin_signature(key_pair)
+        data = self.signin_data(key_pair)
+        data["public_key"] = "0x123"
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 400
+
+    def test_signin_in_process_pool(self):
+        pool = VerificationPool(
+            workers=1,
+            queue_size=4,
+            timeout=30,
+            domain=SignatureUtils.login_message_domain(),
+        )
+        self.addCleanup(pool.shutdown)
+        self.app.extensions["verification_pool"] = pool
+        key_pair = KeyPair.generate()
+        data = self.signin_data(key_pair)
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 200
+        address = AuthService.generate_address_from_public_key(hex(key_pair.public_key))
+        assert res.json["member"] == address
+
+        data = self.signin_data(key_pair)
+        data["signatures"] = [1, 2]
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 400
+        metrics = pool.metrics()
+        assert metrics["completed"] == 2
+        assert metrics["in_flight"] == 0
+        assert metrics["queue_time_max"] >= metrics["queue_time_avg"] >= 0
+
+    def test_signin_pool_replaces_broken_pool(self):
+        pool = VerificationPool(
+            workers=1,
+            queue_size=4,
+            timeout=30,
+            domain=SignatureUtils.login_message_domain(),
+        )
+        self.addCleanup(pool.shutdown)
+        self.app.extensions["verification_pool"] = pool
+        # a crashed worker breaks the executor
+        broken = pool._get_executor()
+        with self.assertRaises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result(timeout=30)
+
+        key_pair = KeyPair.generate()
+        res = self.client.post("/api/v1/auth/signin", json=self.signin_data(key_pair))
+        assert res.status_code == 200
+        assert pool._executor is not broken
+        assert pool.metrics()["completed"] == 1
+
+    def test_signin_pool_result_timeout(self):
+        pool = VerificationPool(workers=1, queue_size=0, timeout=1, result_timeout=0.2)
+        self.addCleanup(pool.shutdown)
+        with self.assertRaises(VerificationPoolBusy):
+            pool.run(_sleep, 1)
+        metrics = pool.metrics()
+        assert metrics["in_flight"] == 0
+        assert metrics["timed_out"] == 1
+        assert metrics["timed_out_running"] == 1
+        # the task still runs in the process and holds the slot
+        assert not pool._slots.acquire(timeout=0)
+        assert pool._slots.acquire(timeout=5)
+        pool._slots.release()
+        assert pool.metrics()["timed_out_running"] == 0
+
+    def test_signin_pool_saturated(self):
+        pool = VerificationPool(workers=0, queue_size=0, timeout=0.01)
+        self.app.extensions["verification_pool"] = pool
+        # hold the only slot of the pool
+        pool._slots.acquire()
+        key_pair = KeyPair.generate()
+        data = self.signin_data(key_pair)
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 503
+        assert res.headers["Retry-After"] == "1"
+        assert pool.metrics()["rejected"] == 1
+
+        pool._slots.release()
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 200
+
+    def test_signin_replay(self):
+        key_pair = KeyPair.generate()
+        data = self.signin_data(key_pair)
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 200
+        # the nonce was consumed by the first sign in
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 400
+        assert res.json == {"nonce": ["Invalid or expired nonce"]}
+
+    def test_signin_unknown_nonce(self):
+        key_pair = KeyPair.generate()
+        nonce = hex(0xABC)
         data = {
-            "signatures": signature,
-            "public_key": "0x123",
+            "signatures": generate_signin_signature(key_pair, nonce),
+            "public_key": hex(key_pair.public_key),
+            "nonce": nonce,
         }
         res = self.client.post("/api/v1/auth/signin", json=data)
         assert res.status_code == 400
+        data["nonce"] = "not hex"
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 400
+
+    def test_signin_expired_nonce(self):
+        now = [0.0]
+        store = MemoryNonceStore(clock=lambda: now[0])
+        self.app.extensions["nonce_store"] = store
+        data = self.signin_data(KeyPair.generate())
+        now[0] += self.app.config["NONCE_TTL"]
+        res = self.client.post("/api/v1/auth/signin", json=data)
+        assert res.status_code == 400
+        assert res.json == {"nonce": ["Invalid or expired nonce"]}
+
+    def test_signin_challenge_store_full(self):
+        store = MemoryNonceStore(max_entries=1)
+        self.app.extensions["nonce_store"] = store
+        nonce = self.client.post("/api/v1/auth/challenge").json["nonce"]
+        res = self.client.post("/api/v1/auth/challenge")
+        assert res.status_code == 429
+        assert int(res.headers["Retry-After"]) > 0
+        # the challenge issued first is still valid
+        assert store.exists(int(nonce, 16))
+
+    def test_signin_challenge(self):
+        res = self.client.post("/api/v1/auth/challenge")
+        assert res.status_code == 200
+        assert res.json["expires_in"] == self.app.config["NONCE_TTL"]
+        other = self.client.post("/api/v1/auth/challenge").json
+        assert other["nonce"] != res.json["nonce"]
+
+
+class TestNonceStore(TestCase):
+    def test_memory_store_expiry_and_bound(self):
+        now = [0.0]
+        store = MemoryNonceStore(max_entries=3, clock=lambda: now[0])
+        first = store.issue(ttl=10)
+        assert store.exists(first)
+        now[0] = 5
+        nonces = [store.issue(ttl=10) for _ in range(2)]
+        # the store is bounded, live nonces are kept and new ones refused
+        with self.assertRaises(NonceStoreFull) as refused:
+            store.issue(ttl=10)
+        assert refused.exception.retry_after == 5
+        assert store.exists(first)
+        assert store.consume(nonces[0])
+        assert not store.consume(nonces[0])
+
+        # expired nonces are purged before the bound is checked
+        now[0] = 20
+        assert not store.consume(nonces[1])
+        store.issue(ttl=10)
+        assert store.stats() == {
+            "size": 1,
+            "issued": 4,
+            "consumed": 1,
+            "expired": 2,
+            "rejected": 1,
+        }
+
+    def test_memory_store_consume_is_atomic(self):
+        store = MemoryNonceStore()
+        nonce = store.issue(ttl=10)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(store.consume(nonce)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count(True) == 1
+
+    def test_redis_store(self):
+        store = RedisNonceStore(FakeRedis())
+        nonce = store.issue(ttl=10)
+        assert store.exists(nonce)
+        assert store.consume(nonce)
+        assert not store.exists(nonce)
+        assert not store.consume(nonce)
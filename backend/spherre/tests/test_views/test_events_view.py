@@ -0,0 +1,297 @@
+import json
+import threading
+import tracemalloc
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from flask_jwt_extended import create_access_token
+
+from spherre.app import create_app
+from spherre.app.extensions import db
+from spherre.app.models import transactional
+from spherre.app.models.account import Account, Member
+from spherre.app.models.notification import NotificationType
+from spherre.app.models.smart_lock import LockStatus
+from spherre.app.models.transaction import TransactionStatus, TransactionType
+from spherre.app.service.account import AccountService
+from spherre.app.service.notification import NotificationService
+from spherre.app.service.smart_lock import SmartLockService
+from spherre.app.service.transaction import TransactionService
+from spherre.app.utils.events import (
+    MAX_NOTIFY_PAYLOAD,
+    EventBus,
+    account_channel,
+    get_event_bus,
+    notify,
+    notify_payload,
+)
+
+
+class TestEventBus(unittest.TestCase):
+    def test_publish_reaches_channel_subscribers(self):
+        bus = EventBus()
+        first = bus.subscribe("account:1")
+        second = bus.subscribe("account:1")
+        other = bus.subscribe("account:2")
+        bus.publish("account:1", {"type": "test", "data": {}})
+        self.assertEqual(first.get(timeout=0)["type"], "test")
+        self.assertEqual(second.get(timeout=0)["type"], "test")
+        self.assertIsNone(other.get(timeout=0))
+
+        bus.unsubscribe(first)
+        bus.publish("account:1", {"type": "test", "data": {}})
+        self.assertIsNone(first.get(timeout=0))
+        self.assertEqual(bus.subscriber_count(), 2)
+
+    def test_slow_subscriber_drops_oldest_events(self):
+        bus = EventBus(max_queue=2)
+        subscription = bus.subscribe("account:1")
+        for i in range(3):
+            bus.publish("account:1", {"type": "test", "data": {"n": i}})
+        self.assertEqual(subscription.get(timeout=0)["data"], {"n": 1})
+        self.assertEqual(subscription.get(timeout=0)["data"], {"n": 2})
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_thousands_of_idle_subscribers(self):
+        """
+        Load test: a worker holding 5000 idle subscriptions over 1000
+        accounts, 500 of them blocked waiting, fans an event out to the
+        subscribers of one account only, and an idle subscription stays
+        small.
+        """
+        bus = EventBus()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        subscriptions = [bus.subscribe(f"account:{i % 1000}") for i in range(5000)]
+        per_subscription = (tracemalloc.get_traced_memory()[0] - before) / 5000
+        tracemalloc.stop()
+        self.assertLess(per_subscription, 4096)
+        self.assertEqual(bus.subscriber_count(), 5000)
+
+        received = []
+        waiting = [
+            threading.Thread(
+                target=lambda s=s: received.append(s.get(timeout=10)), daemon=True
+            )
+            for s in subscriptions[:500]
+        ]
+        for thread in waiting:
+            thread.start()
+        bus.publish("account:7", {"type": "test", "data": {}})
+        for subscription in subscriptions[:500]:
+            if subscription.channel != "account:7":
+                # wake up the other waiters
+                subscription.put({"type": "stop", "data": {}})
+        for thread in waiting:
+            thread.join(timeout=10)
+
+        self.assertEqual(len(received), 500)
+        self.assertEqual(sum(event["type"] == "test" for event in received), 1)
+        delivered = [s for s in subscriptions[500:] if s.get(timeout=0)]
+        self.assertEqual(len(delivered), 4)
+        self.assertTrue(all(s.channel == "account:7" for s in delivered))
+
+    def test_notify_payload_is_truncated_to_the_limit(self):
+        event = {"type": "test", "data": {"id": "abc", "n": 1}}
+        self.assertEqual(
+            json.loads(notify_payload("account:1", event)),
+            {"channel": "account:1", "event": event},
+        )
+
+        event["data"]["message"] = "x" * 10000
+        message = json.loads(notify_payload("account:1", event))
+        self.assertEqual(
+            message["event"],
+            {"type": "test", "data": {"id": "abc", "n": 1}, "truncated": True},
+        )
+
+        event["data"] = {f"key{i}": i for i in range(1000)}
+        payload = notify_payload("account:1", event)
+        self.assertLessEqual(len(payload.encode()), MAX_NOTIFY_PAYLOAD)
+        self.assertEqual(json.loads(payload)["event"]["data"], {})
+
+
+class TestAccountEvents(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config["EVENT_STREAM_KEEPALIVE"] = 0.1
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.account = Account.create(
+            address="0x" + "2" * 64, name="Test Account", threshold=1
+        )
+        self.member = Member.get_or_create(address="0x" + "1" * 64)
+        self.account.members.append(self.member)
+        db.session.commit()
+        self.bus = get_event_bus()
+        self.channel = account_channel(self.account.address)
+        self.url = f"/api/v1/accounts/{self.account.address}/events"
+        self.headers = {
+            "Authorization": f"Bearer {create_access_token(self.member.address)}"
+        }
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_committed_writes_publish_events(self):
+        subscription = self.bus.subscribe(self.channel)
+        notification = NotificationService.create_notification(
+            account_id=self.account.id,
+            notification_type=NotificationType.TRANSACTION,
+            title="Title",
+            message="Message",
+        )
+        event = subscription.get(timeout=0)
+        self.assertEqual(event["type"], "notification.created")
+        self.assertEqual(event["data"]["id"], notification.id)
+        self.assertEqual(event["data"]["notification_type"], "transaction")
+
+        TransactionService.create_transaction(
+            transaction_id=1,
+            account=self.account,
+            status=TransactionStatus.INITIATED,
+            tx_type=TransactionType.TOKEN_SEND,
+            proposer=self.member,
+            date_proposed=datetime.now(),
+        )
+        event = subscription.get(timeout=0)
+        self.assertEqual(event["type"], "transaction.status")
+        self.assertEqual(event["data"], {"transaction_id": 1, "status": 1})
+
+        SmartLockService.create_smart_lock(
+            lock_id=1,
+            token="0x" + "5" * 64,
+            date_locked=datetime.now(),
+            token_amount=Decimal("10"),
+            lock_duration=3600,
+            account_address=self.account.address,
+        )
+        SmartLockService.update_lock_status(1, LockStatus.PAIDOUT)
+        event = subscription.get(timeout=0)
+        self.assertEqual(event["type"], "smart_lock.status")
+        self.assertEqual(event["data"], {"lock_id": 1, "lock_status": "PAIDOUT"})
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_rolled_back_writes_publish_nothing(self):
+        subscription = self.bus.subscribe(self.channel)
+        with self.assertRaises(ValueError):
+            with transactional():
+                NotificationService.create_notification(
+                    account_id=self.account.id,
+                    notification_type=NotificationType.TRANSACTION,
+                    title="Title",
+                    message="Message",
+                )
+                raise ValueError("failed")
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_failed_notification_keeps_the_write(self):
+        address = "0x" + "3" * 64
+        with transactional():
+            db.session.add(Member(address=address))
+            db.session.flush()
+            # sqlite has no pg_notify
+            notify(db.session, "spherre_events", [(self.channel, {"type": "test"})])
+        db.session.remove()
+        self.assertIsNotNone(Member.query.filter_by(address=address).one_or_none())
+
+    def test_stream_sends_events(self):
+        res = self.client.get(self.url, headers=self.headers, buffered=False)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "text/event-stream")
+        chunks = iter(res.response)
+        self.assertEqual(next(chunks), b": connected\n\n")
+        self.assertEqual(self.bus.subscriber_count(), 1)
+
+        self.bus.publish(self.channel, {"type": "test", "data": {"n": 1}})
+        lines = next(chunks).decode().splitlines()
+        self.assertEqual(lines[1], "event: test")
+        self.assertEqual(json.loads(lines[2].removeprefix("data: ")), {"n": 1})
+        self.assertEqual(next(chunks), b": keep-alive\n\n")
+
+        res.close()
+        self.assertEqual(self.bus.subscriber_count(), 0)
+
+    def test_private_account_requires_membership(self):
+        self.assertTrue(self.account.is_private)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        outsider = {"Authorization": f"Bearer {create_access_token('0x' + '3' * 64)}"}
+        self.assertEqual(self.client.get(self.url, headers=outsider).status_code, 403)
+
+    def test_removed_member_stream_is_closed(self):
+        res = self.client.get(self.url, headers=self.headers, buffered=False)
+        chunks = iter(res.response)
+        next(chunks)
+        AccountService.remove_member_from_account("0x" + "2" * 64, "0x" + "1" * 64)
+        self.assertEqual(list(chunks), [])
+        self.assertEqual(self.bus.subscriber_count(), 0)
+
+    def keep_busy(self):
+        """
+        Publish events on the account channel until the test ends
+        """
+        stopped = threading.Event()
+
+        def publish():
+            while not stopped.wait(0.005):
+                self.bus.publish(self.channel, {"type": "test", "data": {}})
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stopped.set)
+
+    def assert_stream_ends(self, chunks):
+        # a stream left open keeps receiving the events of the busy account
+        for _ in range(2000):
+            if next(chunks, None) is None:
+                break
+        else:
+            self.fail("the stream was not closed")
+        self.assertEqual(self.bus.subscriber_count(), 0)
+
+    def test_removed_member_stream_of_busy_account_is_closed(self):
+        res = self.client.get(self.url, headers=self.headers, buffered=False)
+        chunks = iter(res.response)
+        next(chunks)
+        self.keep_busy()
+        self.assertTrue(next(chunks).startswith(b"id: "))
+        AccountService.remove_member_from_account("0x" + "2" * 64, "0x" + "1" * 64)
+        self.assert_stream_ends(chunks)
+
+    def test_anonymous_stream_closed_when_account_made_private(self):
+        address = self.account.address
+        AccountService.toggle_account_privacy(address)
+        res = self.client.get(self.url, buffered=False)
+        self.assertEqual(res.status_code, 200)
+        chunks = iter(res.response)
+        next(chunks)
+        self.keep_busy()
+        # made private by another process, whose access cache is not shared
+        with db.engine.begin() as connection:
+            connection.execute(
+                db.update(Account)
+                .where(Account.address == address)
+                .values(is_private=True)
+            )
+        self.assert_stream_ends(chunks)
+
+    def test_member_stream_survives_account_made_private(self):
+        address = self.account.address
+        AccountService.toggle_account_privacy(address)
+        res = self.client.get(self.url, headers=self.headers, buffered=False)
+        chunks = iter(res.response)
+        next(chunks)
+        AccountService.toggle_account_privacy(address)
+        self.assertEqual(next(chunks), b": keep-alive\n\n")
+        res.close()
+
+    def test_unknown_account(self):
+        res = self.client.get(f"/api/v1/accounts/0x{'9' * 64}/events")
+        self.assertEqual(res.status_code, 404)
@@ -1,7 +1,11 @@
 import unittest
+from datetime import datetime
 from unittest.mock import patch
 from uuid import uuid4
 
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
 from spherre.app import create_app, db
 from spherre.app.models import Account, Member, Notification, NotificationType
 from spherre.app.service.notification import NotificationService
@@ -22,9 +26,13 @@ class TestNotificationViews(unittest.TestCase):
         self.account = Account(
             id=str(uuid4()), address="0x" + "2" * 64, name="Test Account"
         )
+        self.account.members.append(self.member)
         db.session.add(self.member)
         db.session.add(self.account)
         db.session.commit()
+        # the account is private, requests are sent as its member
+        token = create_access_token(identity=self.member.address)
+        self.client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
 
     def tearDown(self):
         db.session.remove()
@@ -109,3 +117,120 @@ class TestNotificationViews(unittest.TestCase):
                 f"/api/v1/accounts/{self.account.address}/notifications"
             )
             self.assertEqual(res.status_code, 500)
+
+    def test_get_unread_count(self):
+        notification = NotificationService.create_notification(
+            self.account.id, NotificationType.TRANSACTION, "Notif 1", "Message"
+        )
+        NotificationService.create_notification(
+            self.account.id, NotificationType.TRANSACTION, "Notif 2", "Message"
+        )
+        url = (
+            f"/api/v1/accounts/{self.account.address}/notifications/unread-count"
+            f"?member_id={self.member.id}"
+        )
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json(), {"unread_count": 2})
+
+        NotificationService.mark_notification_as_read(notification.id, self.member.id)
+        self.assertEqual(self.client.get(url).get_json(), {"unread_count": 1})
+
+    def test_get_unread_count_errors(self):
+        url = f"/api/v1/accounts/{self.account.address}/notifications/unread-count"
+        self.assertEqual(self.client.get(url).status_code, 400)
+        res = self.client.get(
+            f"/api/v1/accounts/{uuid4()}/notifications/unread-count?member_id=1"
+        )
+        self.assertEqual(res.status_code, 404)
+        # members without a counter have nothing unread
+        res = self.client.get(f"{url}?member_id={self.member.id}")
+        self.assertEqual(res.get_json(), {"unread_count": 0})
+
+    def test_mark_notifications_as_read(self):
+        first = self.create_notification(title="Notif 1")
+        second = self.create_notification(title="Notif 2")
+        url = f"/api/v1/accounts/{self.account.address}/notifications/read"
+        headers = {
+            "Authorization": f"Bearer {create_access_token(self.member.address)}"
+        }
+
+        res = self.client.post(
+            url, json={"notification_ids": [first.id]}, headers=headers
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json(), {"marked": 1})
+
+        res = self.client.post(
+            url, json={"up_to": datetime.now().isoformat()}, headers=headers
+        )
+        self.assertEqual(res.get_json(), {"marked": 1})
+        db.session.refresh(second)
+        self.assertIn(self.member, second.read_by)
+
+    def test_mark_notifications_as_read_errors(self):
+        url = f"/api/v1/accounts/{self.account.address}/notifications/read"
+        anonymous = self.app.test_client()
+        self.assertEqual(anonymous.post(url, json={}).status_code, 401)
+        # not a member of the account
+        outsider = {"Authorization": f"Bearer {create_access_token('0x' + '3' * 64)}"}
+        self.assertEqual(
+            self.client.post(
+                url, json={"up_to": "2025-01-01T00:00:00"}, headers=outsider
+            ).status_code,
+            403,
+        )
+        self.assertEqual(self.client.post(url, json={}).status_code, 400)
+
+    def test_get_notifications_with_cursor(self):
+        for i in range(5):
+            notification = self.create_notification(title=f"Notif {i}")
+            notification.created_at = datetime(2025, 1, 1 + i)
+        # a tie on created_at is broken by id
+        tied = self.create_notification(title="Tied")
+        tied.created_at = datetime(2025, 1, 3)
+        db.session.commit()
+        url = f"/api/v1/accounts/{self.account.address}/notifications?per_page=2"
+
+        res = self.client.get(f"{url}&cursor=")
+        data = res.get_json()
+        self.assertIsNone(data["pagination"]["total"])
+        seen = [n["title"] for n in data["notifications"]]
+        while data["pagination"]["next_cursor"]:
+            data = self.client.get(
+                f"{url}&cursor={data['pagination']['next_cursor']}"
+            ).get_json()
+            seen += [n["title"] for n in data["notifications"]]
+        self.assertEqual(seen[:2], ["Notif 4", "Notif 3"])
+        self.assertEqual(set(seen[2:4]), {"Notif 2", "Tied"})
+        self.assertEqual(seen[4:], ["Notif 1", "Notif 0"])
+
+        # page mode hands out a cursor to the next page too
+        data = self.client.get(f"{url}&page=1").get_json()
+        self.assertEqual(data["pagination"]["total"], 6)
+        data = self.client.get(
+            f"{url}&cursor={data['pagination']['next_cursor']}&include_total=true"
+        ).get_json()
+        self.assertEqual(len(data["notifications"]), 2)
+        self.assertEqual(data["pagination"]["total"], 6)
+
+    def test_get_notifications_invalid_cursor(self):
+        res = self.client.get(
+            f"/api/v1/accounts/{self.account.address}/notifications?cursor=oops"
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.get_json(), {"error": "Invalid cursor"})
+
+    def test_get_notifications_counts_once(self):
+        self.create_notification(title="Notif 1")
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            self.client.get(f"/api/v1/accounts/{self.account.address}/notifications")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(sum("count(" in s.lower() for s in statements), 1)
@@ -0,0 +1,318 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from spherre.app import create_app
+from spherre.app.extensions import db
+from spherre.app.models import transactional
+from spherre.app.models.account import Account, Member
+from spherre.app.models.transaction import TransactionStatus, TransactionType
+from spherre.app.service.account import AccountService
+from spherre.app.service.member import MemberService
+from spherre.app.service.transaction import TransactionService
+from spherre.app.utils.response_cache import (
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    get_response_cache,
+)
+
+
+class FakeRedis:
+    """
+    Minimal in-memory stand-in for the redis commands used by the cache
+    and the nonce store.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(m.encode() for m in members)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, ttl):
+        return key in self.data
+
+    def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        return [key for key in self.data if key.startswith(prefix)]
+
+
+class TestCacheBackends(unittest.TestCase):
+    def test_memory_backend_evicts_least_recently_used(self):
+        cache = MemoryCacheBackend(max_entries=2)
+        cache.set("a", b"1", ttl=30, tags=["account:1"])
+        cache.set("b", b"2", ttl=30, tags=["account:1"])
+        cache.get("a")
+        cache.set("c", b"3", ttl=30, tags=["account:2"])
+        self.assertEqual(cache.get("a"), b"1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_memory_backend_expires_entries(self):
+        now = [0.0]
+        cache = MemoryCacheBackend(clock=lambda: now[0])
+        cache.set("a", b"1", ttl=30, tags=[])
+        now[0] = 31
+        self.assertIsNone(cache.get("a"))
+
+    def test_memory_backend_invalidates_tags(self):
+        cache = MemoryCacheBackend()
+        cache.set("a", b"1", ttl=30, tags=["account:1"])
+        cache.set("b", b"2", ttl=30, tags=["account:1", "member:1"])
+        cache.set("c", b"3", ttl=30, tags=["account:2"])
+        cache.invalidate_tag("account:1")
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), b"3")
+
+    def test_stale_values_are_not_stored_after_an_invalidation(self):
+        for cache in (MemoryCacheBackend(), RedisCacheBackend(FakeRedis())):
+            generations = cache.tag_generations(["account:1", "member:1"])
+            cache.invalidate_tag("member:1")
+            cache.set(
+                "a",
+                b"1",
+                ttl=30,
+                tags=["account:1", "member:1"],
+                generations=generations,
+            )
+            self.assertIsNone(cache.get("a"))
+            generations = cache.tag_generations(["account:1", "member:1"])
+            cache.set(
+                "a",
+                b"2",
+                ttl=30,
+                tags=["account:1", "member:1"],
+                generations=generations,
+            )
+            self.assertEqual(cache.get("a"), b"2")
+
+    def test_redis_backend(self):
+        client = FakeRedis()
+        cache = RedisCacheBackend(client)
+        cache.set("a", b"1", ttl=30, tags=["account:1"])
+        cache.set("b", b"2", ttl=30, tags=["account:2"])
+        self.assertEqual(cache.get("a"), b"1")
+        cache.invalidate_tag("account:1")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), b"2")
+        cache.clear()
+        self.assertEqual(client.data, {})
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.account = Account.create(
+            address="0x" + "2" * 64, name="Test Account", threshold=1
+        )
+        self.member = Member.get_or_create(address="0x" + "1" * 64)
+        self.other_member = Member.get_or_create(address="0x" + "3" * 64)
+        self.account.members.append(self.member)
+        self.account.members.append(self.other_member)
+        db.session.commit()
+        # the account is private, requests are sent as one of its members
+        token = create_access_token(identity=self.member.address)
+        self.client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        self.url = f"/api/v1/accounts/{self.account.address}/transactions"
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def create_transaction(self, transaction_id: int):
+        return TransactionService.create_transaction(
+            transaction_id=transaction_id,
+            account=self.account,
+            status=TransactionStatus.INITIATED,
+            tx_type=TransactionType.TOKEN_SEND,
+            proposer=self.member,
+            date_proposed=datetime.now(),
+        )
+
+    def test_responses_are_cached(self):
+        self.create_transaction(1)
+        res = self.client.get(self.url)
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+        res = self.client.get(self.url)
+        self.assertEqual(res.headers["X-Cache"], "HIT")
+        self.assertEqual(len(res.get_json()["transactions"]), 1)
+
+        # other query args are cached separately
+        res = self.client.get(f"{self.url}?per_page=5")
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+
+    def test_writes_invalidate_account_responses(self):
+        self.create_transaction(1)
+        self.client.get(self.url)
+        self.create_transaction(2)
+        res = self.client.get(self.url)
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+        self.assertEqual(len(res.get_json()["transactions"]), 2)
+
+    def test_write_committed_during_the_request_is_not_cached_over(self):
+        self.create_transaction(1)
+        get_filtered_transactions = TransactionService.get_filtered_transactions
+
+        def read_then_write(*args, **kwargs):
+            result = get_filtered_transactions(*args, **kwargs)
+            # committed after the view read the transactions
+            self.create_transaction(2)
+            return result
+
+        with patch.object(
+            TransactionService, "get_filtered_transactions", side_effect=read_then_write
+        ):
+            res = self.client.get(self.url)
+        self.assertEqual(len(res.get_json()["transactions"]), 1)
+        res = self.client.get(self.url)
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+        self.assertEqual(len(res.get_json()["transactions"]), 2)
+
+    def test_member_accounts_invalidated_on_account_update(self):
+        url = f"/api/v1/accounts/member/{self.member.address}"
+        self.client.get(url)
+        self.assertEqual(self.client.get(url).headers["X-Cache"], "HIT")
+        AccountService.update_account_name(self.account.address, "Renamed")
+        res = self.client.get(url)
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+        self.assertEqual(res.get_json()[0]["name"], "Renamed")
+
+    def test_private_account_responses_are_keyed_on_identity(self):
+        self.assertTrue(self.account.is_private)
+        headers = {
+            "Authorization": f"Bearer {create_access_token(self.member.address)}"
+        }
+        other_headers = {
+            "Authorization": (
+                f"Bearer {create_access_token(self.other_member.address)}"
+            )
+        }
+        self.assertEqual(
+            self.client.get(self.url, headers=headers).headers["X-Cache"], "MISS"
+        )
+        self.assertEqual(
+            self.client.get(self.url, headers=other_headers).headers["X-Cache"],
+            "MISS",
+        )
+        self.assertEqual(
+            self.client.get(self.url, headers=headers).headers["X-Cache"], "HIT"
+        )
+
+    def test_member_email_update_invalidates_account_responses(self):
+        self.create_transaction(1)
+        accounts_url = f"/api/v1/accounts/member/{self.other_member.address}"
+        self.client.get(self.url)
+        self.client.get(accounts_url)
+        self.assertEqual(self.client.get(self.url).headers["X-Cache"], "HIT")
+
+        MemberService.update_member_email(self.member.address, "new@example.com")
+        res = self.client.get(self.url)
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+        proposer = res.get_json()["transactions"][0]["proposer"]
+        self.assertEqual(proposer["email"], "new@example.com")
+        # the account lists of the other members show the email too
+        res = self.client.get(accounts_url)
+        self.assertEqual(res.headers["X-Cache"], "MISS")
+
+    def test_rolled_back_writes_keep_cache(self):
+        self.client.get(self.url)
+        with self.assertRaises(ValueError):
+            with transactional():
+                self.create_transaction(1)
+                raise ValueError("failed")
+        self.assertEqual(self.client.get(self.url).headers["X-Cache"], "HIT")
+        self.assertEqual(len(get_response_cache()), 1)
+
+    def count_queries(self, request):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            res = request()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        return res, len(statements)
+
+    def test_not_modified_with_a_version_read(self):
+        self.create_transaction(1)
+        res = self.client.get(self.url)
+        etag = res.headers["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+
+        res, queries = self.count_queries(
+            lambda: self.client.get(self.url, headers={"If-None-Match": etag})
+        )
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.get_data(), b"")
+        self.assertEqual(res.headers["ETag"], etag)
+        # only the account version is read
+        self.assertEqual(queries, 1)
+
+    def test_version_written_by_another_process(self):
+        etag = self.client.get(self.url).headers["ETag"]
+        # e.g. the indexer, whose writes do not reach the cache of this process
+        with db.engine.begin() as connection:
+            connection.execute(
+                db.update(Account)
+                .where(Account.address == self.account.address)
+                .values(version=Account.version + 1)
+            )
+        res = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers["ETag"], etag)
+
+    def test_writes_change_etag(self):
+        self.create_transaction(1)
+        etag = self.client.get(self.url).headers["ETag"]
+        notifications_url = f"/api/v1/accounts/{self.account.address}/notifications"
+        self.assertEqual(self.client.get(notifications_url).headers["ETag"], etag)
+
+        self.create_transaction(2)
+        res = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers["ETag"], etag)
+        self.assertEqual(len(res.get_json()["transactions"]), 2)
+
+        etag = res.headers["ETag"]
+        AccountService.add_member_to_account(self.account.address, "0x" + "4" * 64)
+        res = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+
+    def test_unknown_account_has_no_etag(self):
+        res = self.client.get(f"/api/v1/accounts/0x{'9' * 64}/transactions")
+        self.assertNotIn("ETag", res.headers)
@@ -17,6 +17,7 @@ TEST_ACCOUNT_ADDRESS_2 = (
     "0x2222222222222222222222222222222222222222222222222222222222222222"
 )
 SMART_LOCK_ENDPOINT = f"/api/v1/accounts/{TEST_ACCOUNT_ADDRESS}/smart-locks"
+ACCESS_PATCH = "spherre.app.service.account.AccountService.get_account_access"
 SERVICE_PATCH = (
     "spherre.app.views.smart_lock.SmartLockService.get_smart_locks_paginated"
 )
@@ -36,6 +37,15 @@ class TestSmartLockView:
         """Create test client."""
         return app.test_client()
 
+    @pytest.fixture(autouse=True)
+    def public_accounts(self):
+        """
+        The tests mock the session the private account gate queries,
+        treat their accounts as public.
+        """
+        with patch(ACCESS_PATCH, return_value=None):
+            yield
+
     def test_get_account_smart_locks_success(self, client):
         """Test successful retrieval of smart locks for an account."""
         # Mock the account existence check and service method
@@ -1,7 +1,10 @@
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
 from spherre.app import create_app
 from spherre.app.extensions import db
 from spherre.app.models.account import Account, Member
@@ -9,6 +12,7 @@ from spherre.app.models.transaction import (
     TransactionStatus,
     TransactionType,
 )
+from spherre.app.service.account import AccountService
 from spherre.app.service.transaction import TransactionService
 
 
@@ -32,6 +36,9 @@ class TestTransactionViews(unittest.TestCase):
         self.account.members.append(self.member)
         self.account.members.append(self.another_member)
         db.session.commit()
+        # the account is private, requests are sent as one of its members
+        token = create_access_token(identity=self.member.address)
+        self.client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
 
         self.current_time = datetime.now()
 
@@ -68,6 +75,22 @@ class TestTransactionViews(unittest.TestCase):
         self.assertEqual(len(data["transactions"]), 2)
         self.assertEqual(data["pagination"]["total"], 2)
 
+    def test_private_account_gate(self):
+        url = f"/api/v1/accounts/{self.account.address}/transactions"
+        anonymous = self.app.test_client()
+        self.assertEqual(anonymous.get(url).status_code, 401)
+        outsider = {"Authorization": f"Bearer {create_access_token('0x' + '3' * 64)}"}
+        res = self.client.get(url, headers=outsider)
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(
+            res.get_json(), {"error": "You are not a member of this account"}
+        )
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # public accounts are open
+        AccountService.toggle_account_privacy(self.account.address)
+        self.assertEqual(anonymous.get(url).status_code, 200)
+
     def test_get_transactions_with_pagination(self):
         for i in range(5):
             self.create_transaction(transaction_id=10 + i)
@@ -208,3 +231,133 @@ class TestTransactionViews(unittest.TestCase):
         data = res.get_json()
         self.assertIn("error", data)
         self.assertIn("Invalid proposer address", data["error"]["code"])
+
+    def test_get_transactions_with_cursor(self):
+        for i in range(5):
+            TransactionService.create_transaction(
+                transaction_id=30 + i,
+                account=self.account,
+                status=TransactionStatus.INITIATED,
+                tx_type=TransactionType.TOKEN_SEND,
+                proposer=self.member,
+                # two transactions share each timestamp to exercise the id tiebreak
+                date_proposed=self.current_time + timedelta(minutes=i // 2),
+            )
+
+        url = f"/api/v1/accounts/{self.account.address}/transactions"
+        res = self.client.get(f"{url}?per_page=2&cursor=")
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertIsNone(data["pagination"]["total"])
+        seen = [tx["transaction_id"] for tx in data["transactions"]]
+        while data["pagination"]["has_next"]:
+            cursor = data["pagination"]["next_cursor"]
+            res = self.client.get(f"{url}?per_page=2&cursor={cursor}")
+            self.assertEqual(res.status_code, 200)
+            data = res.get_json()
+            seen.extend(tx["transaction_id"] for tx in data["transactions"])
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(set(seen), {30, 31, 32, 33, 34})
+        self.assertEqual(seen[0], 34)
+        self.assertEqual(set(seen[1:3]), {32, 33})
+        self.assertEqual(set(seen[3:]), {30, 31})
+
+    def test_get_transactions_cursor_from_page(self):
+        for i in range(4):
+            self.create_transaction(transaction_id=40 + i)
+
+        url = f"/api/v1/accounts/{self.account.address}/transactions"
+        res = self.client.get(f"{url}?per_page=2&sort_by=transaction_id&sort_order=asc")
+        data = res.get_json()
+        self.assertEqual(
+            [tx["transaction_id"] for tx in data["transactions"]], [40, 41]
+        )
+        cursor = data["pagination"]["next_cursor"]
+
+        res = self.client.get(
+            f"{url}?per_page=2&sort_by=transaction_id&sort_order=asc"
+            f"&cursor={cursor}&include_total=true"
+        )
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(
+            [tx["transaction_id"] for tx in data["transactions"]], [42, 43]
+        )
+        self.assertEqual(data["pagination"]["total"], 4)
+        self.assertFalse(data["pagination"]["has_next"])
+        self.assertIsNone(data["pagination"]["next_cursor"])
+
+    def test_get_transactions_pages_without_total(self):
+        for i in range(5):
+            self.create_transaction(transaction_id=60 + i)
+
+        url = f"/api/v1/accounts/{self.account.address}/transactions?per_page=2"
+        pages = []
+        for page in (1, 2, 3):
+            data = self.client.get(f"{url}&page={page}&include_total=false").get_json()
+            pages.append(data["pagination"])
+            self.assertIsNone(data["pagination"]["total"])
+        self.assertEqual([p["has_next"] for p in pages], [True, True, False])
+        self.assertEqual([p["has_prev"] for p in pages], [False, True, True])
+        self.assertIsNotNone(pages[1]["next_cursor"])
+        # no cursor to an empty page after the last one
+        self.assertIsNone(pages[2]["next_cursor"])
+
+        data = self.client.get(f"{url}&page=3&include_total=true").get_json()
+        self.assertEqual(data["pagination"]["total_pages"], 3)
+        self.assertFalse(data["pagination"]["has_next"])
+        self.assertIsNone(data["pagination"]["next_cursor"])
+
+    def test_get_transactions_invalid_cursor(self):
+        url = f"/api/v1/accounts/{self.account.address}/transactions"
+        res = self.client.get(f"{url}?cursor=not-a-cursor")
+        self.assertEqual(res.status_code, 400)
+
+        self.create_transaction(transaction_id=50)
+        self.create_transaction(transaction_id=51)
+        res = self.client.get(f"{url}?per_page=1")
+        cursor = res.get_json()["pagination"]["next_cursor"]
+        # a cursor is bound to the sort it was issued for
+        res = self.client.get(f"{url}?per_page=1&sort_order=asc&cursor={cursor}")
+        self.assertEqual(res.status_code, 400)
+
+    def count_listing_queries(self, address: str, per_page: int) -> int:
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            res = self.client.get(
+                f"/api/v1/accounts/{address}/transactions?per_page={per_page}"
+            )
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.get_json()["transactions"]), per_page)
+        return len(statements)
+
+    def test_get_transactions_query_count_is_constant(self):
+        for i in range(20):
+            transaction = self.create_transaction(transaction_id=100 + i)
+            transaction.approved.append(self.another_member)
+            transaction.rejected.append(self.member)
+            transaction.executor_id = self.another_member.id
+        db.session.commit()
+        address = self.account.address
+        db.session.expunge_all()
+        # warm the account access cache
+        self.count_listing_queries(address, per_page=1)
+
+        small_page = self.count_listing_queries(address, per_page=2)
+        db.session.expunge_all()
+        large_page = self.count_listing_queries(address, per_page=20)
+        self.assertEqual(small_page, large_page)
+
+        res = self.client.get(f"/api/v1/accounts/{address}/transactions?per_page=1")
+        transaction = res.get_json()["transactions"][0]
+        self.assertEqual(transaction["approved"][0]["address"], "0x" + "2" * 64)
+        self.assertEqual(transaction["rejected"][0]["address"], "0x" + "1" * 64)
+        self.assertEqual(transaction["executor"]["address"], "0x" + "2" * 64)
@@ -33,6 +33,10 @@ const WalletSignInModal = () => {
       // Get the public key from the account
       // @ts-expect-error - Accessing signer from account
 
+      // Single use nonce signed in the message, so the signature
+      // cannot be replayed
+      const { nonce } = await SpherreApi.getSignInChallenge()
+
       // Create typed data matching backend's expected format
       const typedDataMessage = {
         domain: {
@@ -46,11 +50,15 @@ const WalletSignInModal = () => {
             { name: 'chainId', type: 'felt' },
             { name: 'version', type: 'felt' },
           ],
-          Message: [{ name: 'agreement', type: 'felt' }],
+          Message: [
+            { name: 'agreement', type: 'felt' },
+            { name: 'nonce', type: 'felt' },
+          ],
         },
         primaryType: 'Message',
         message: {
           agreement: 'i agree to signin to spherre',
+          nonce,
         },
       }
 
@@ -80,6 +88,7 @@ const WalletSignInModal = () => {
       const response = await SpherreApi.signIn({
         signatures,
         public_key: publicKey,
+        nonce,
       })
 
       // Store JWT tokens
@@ -35,9 +35,15 @@ export interface Transaction {
 }
 
 // Auth types
+export interface SignInChallenge {
+  nonce: string
+  expires_in: number
+}
+
 export interface SignInRequest {
   signatures: number[]
   public_key: string
+  nonce: string
 }
 
 export interface SignInResponse {
@@ -51,6 +57,13 @@ export interface SignInResponse {
  */
 export const SpherreApi = {
   // Authentication
+  async getSignInChallenge(): Promise<SignInChallenge> {
+    return ApiUtils.handleResponse(
+      () => apiClient.post('/api/v1/auth/challenge'),
+      'Failed to get sign in challenge',
+    )
+  },
+
   async signIn(data: SignInRequest): Promise<SignInResponse> {
     return ApiUtils.handleResponse(
       () => apiClient.post('/api/v1/auth/signin', data),